@@ -0,0 +1,5 @@
+"""
+Benchmarks. The *_bench.py files are standalone scripts, the suite is run as a module:
+
+    python3 -m benchmarks.suite --output results.json --baseline baseline.json
+"""
@@ -0,0 +1,48 @@
+"""
+Evaluate one formula over 1e3, 1e5 and 1e7 rows: evaluate() per row against
+NumPy batch evaluation (requires numpy)
+
+    python3 benchmarks/batch_bench.py
+"""
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+import numpy as np
+from calc.parse import compile
+
+FORMULAS = [
+    "x^2 + 3*x",
+    "floor(x / stack) + (x % stack) / 100",
+    "sqrt(x^2 + y^2) / (1 + sqrt(x^2 + y^2))",
+]
+
+# evaluate() is timed on at most this many rows and scaled up
+MAX_LOOP_ROWS = 100_000
+
+def main(sizes = (1_000, 100_000, 10_000_000)):
+    print(f"{'formula':42} {'rows':>10} {'per row s':>10} {'batch s':>9} {'speedup':>8}")
+    for formula in FORMULAS:
+        compiled = compile(formula)
+        for n in sizes:
+            arrays = [np.arange(1, n + 1, dtype=float) + k for k in range(len(compiled.variables))]
+
+            loop_rows = min(n, MAX_LOOP_ROWS)
+            columns = [a[:loop_rows].tolist() for a in arrays]
+            start = time.perf_counter()
+            for row in zip(*columns):
+                compiled.evaluate(*row)
+            t_loop = (time.perf_counter() - start) * n / loop_rows
+
+            start = time.perf_counter()
+            compiled.evaluate_batch(*arrays)
+            t_batch = time.perf_counter() - start
+
+            estimated = "*" if loop_rows < n else " "
+            print(f"{formula:42} {n:10} {t_loop:9.3f}{estimated} {t_batch:9.3f} {t_loop / t_batch:7.0f}x")
+    print(f"* extrapolated from {MAX_LOOP_ROWS} rows")
+
+if __name__ == "__main__":
+    main()
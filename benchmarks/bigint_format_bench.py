@@ -0,0 +1,37 @@
+"""
+Time formatting huge int results: str() against the default scientific notation and
+format(exact_ints=True)
+
+    python3 benchmarks/bigint_format_bench.py
+"""
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.format import format
+
+def timed(f, repeat = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(exponents = (20_000, 100_000, 1_000_000)):
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0) # So str() can be timed at all
+    print(f"{'result':12} {'digits':>8} {'str ms':>9} {'exact ms':>9} {'sci ms':>8} {'speedup':>8}")
+    for e in exponents:
+        n = 2 ** e
+        t_str = timed(lambda: str(n))
+        t_exact = timed(lambda: format(n, exact_ints=True))
+        t_sci = timed(lambda: format(n))
+        digits = len(str(n))
+        print(f"{'2^' + str(e):12} {digits:8} {t_str * 1e3:9.1f} {t_exact * 1e3:9.1f} {t_sci * 1e3:8.2f} "
+            f"{t_str / t_sci:7.0f}x")
+
+if __name__ == "__main__":
+    main()
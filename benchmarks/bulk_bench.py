@@ -0,0 +1,38 @@
+"""
+calc_many() throughput with 1, 2, 4 and 8 worker processes
+
+    python3 benchmarks/bulk_bench.py
+"""
+import os, sys
+import random
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.bulk import calc_many
+from calc.parse import set_cache_size
+
+TEMPLATES = ["{a} * {b} + {c}", "sqrt({a}^2 + {b}^2)", "max({a}, {b}, {c}) % 7",
+    "sin({a}) * cos({b}) + [{a}, {b}, {c}] * 2", "floor({a} / stack) + ({a} % stack) / 100"]
+
+def corpus(n, seed = 0):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield rng.choice(TEMPLATES).format(a=rng.randint(1, 10 ** 6), b=rng.randint(1, 1000), c=rng.random())
+
+def main(n = 200000):
+    set_cache_size(0) # Every expression is distinct anyway
+    print(f"cpus: {os.cpu_count()}, expressions: {n}")
+    print(f"{'workers':>8} {'seconds':>8} {'expr/s':>10} {'speedup':>8}")
+    base = None
+    for workers in [1, 2, 4, 8]:
+        start = time.perf_counter()
+        for _ in calc_many(corpus(n), workers=workers, chunksize=1000):
+            pass
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        print(f"{workers:8} {elapsed:8.2f} {n / elapsed:10.0f} {base / elapsed:7.2f}x")
+
+if __name__ == "__main__":
+    main()
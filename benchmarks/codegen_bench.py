@@ -0,0 +1,56 @@
+"""
+Evaluate compiled expressions with the RPN evaluator against generated Python functions
+(compile(expr, native=True), see calc/codegen.py), and with common subexpression
+elimination or fused vector kernels turned off
+
+    python3 benchmarks/codegen_bench.py
+"""
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.codegen import generate
+from calc.parse import compile
+
+FORMULAS = [
+    ("x^2 + 3*x", (7,)),
+    ("floor(x / stack) + (x % stack) / 100", (1000,)),
+    ("sqrt(x^2 + y^2) / (1 + sqrt(x^2 + y^2))", (3, 4)),
+    ("angle3([x, 0, 0], [0, 0, 0], [0, y, 0])", (1, 2)),
+    ("angle([x, y, 1], [y, x, 1]) + angle([x, y, 1], [y, x, 1])^2", (1, 2)),
+    ("[x, y, 1] * 2 + [y, x, 2] * 3 - 1", (1, 2)),
+    ("sqrt([x, " + ", ".join(map(str, range(999))) + "] * 2 + 1) / 3 - x", (5,)),
+    (" + ".join(f"x*{i}" for i in range(200)), (3,)),
+]
+
+def per_call(f, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        f()
+    return (time.perf_counter() - start) / number
+
+def main(number = 20000):
+    print(f"{'formula':45} {'compile us':>11} {'rpn us':>9} {'no cse us':>10} {'no fuse us':>11} {'native us':>10} "
+        f"{'dedup':>6} {'fused':>6} {'speedup':>8}")
+    for formula, values in FORMULAS:
+        rpn = compile(formula)
+        start = time.perf_counter()
+        native = compile(formula, native=True)
+        t_compile = time.perf_counter() - start
+        assert native.generated.native
+        no_cse = generate(rpn.program, cse=False)
+        no_fuse = generate(rpn.program, fuse=False)
+
+        n = max(number // len(rpn.program), 100)
+        t_rpn = per_call(lambda: rpn.evaluate(*values), n)
+        t_no_cse = per_call(lambda: no_cse(values), n)
+        t_no_fuse = per_call(lambda: no_fuse(values), n)
+        t_native = per_call(lambda: native.generated(values), n)
+        name = formula if len(formula) <= 45 else formula[:42] + "..."
+        print(f"{name:45} {t_compile * 1e6:11.1f} {t_rpn * 1e6:9.2f} {t_no_cse * 1e6:10.2f} {t_no_fuse * 1e6:11.2f} "
+            f"{t_native * 1e6:10.2f} {native.generated.deduplicated:6} {native.generated.fused:6} {t_rpn / t_native:7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Compare calc() against evaluating a CompiledExpression repeatedly
+
+    python3 benchmarks/compile_bench.py
+"""
+import os, sys
+import timeit
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.parse import calc, compile, set_cache_size, DEFAULT_CACHE_SIZE
+
+EXPRESSIONS = [
+    "64*27",
+    "shulker*3 + stack*5",
+    "sqrt(2)",
+    "1 + 2 * 3^5 - (4 / 2) % 3",
+    "max(1, max(50), max(-1, -2, -3))",
+    "angle3([0, 1] + [1, 2], [1, 2], [1, 0] + [1, 2])",
+    "sum([1, 2, 3, 4, 5, 6, 7, 8, 9, 10]) * e^(i * pi)",
+    "rand(1, 6) + shulker * 27 + stack * 3",
+]
+
+def main(number = 5000):
+    # Compare against calc() lexing and parsing every time
+    set_cache_size(0)
+    print(f"{'expression':50} {'calc() us':>10} {'evaluate() us':>14} {'speedup':>8} "
+        f"{'folded us':>10} {'speedup':>8} {'tokens':>8}")
+    for expr in EXPRESSIONS:
+        compiled = compile(expr, optimize=False)
+        folded = compile(expr)
+        t_calc = min(timeit.repeat(lambda: calc(expr), number=number, repeat=3)) / number
+        t_eval = min(timeit.repeat(compiled.evaluate, number=number, repeat=3)) / number
+        t_fold = min(timeit.repeat(folded.evaluate, number=number, repeat=3)) / number
+        tokens = f"{len(compiled.program)}->{len(folded.program)}"
+        print(f"{expr:50} {t_calc * 1e6:10.2f} {t_eval * 1e6:14.2f} {t_calc / t_eval:7.1f}x "
+            f"{t_fold * 1e6:10.2f} {t_calc / t_fold:7.1f}x {tokens:>8}")
+    set_cache_size(DEFAULT_CACHE_SIZE)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Generated benchmark corpus, the same for a given seed
+"""
+import random
+
+CHAT_TEMPLATES = [
+    "{a}*{b}", "shulker*{a} + stack*{b}", "sqrt({a})", "{x} / {b}", "max({a}, {b}, {c})",
+    "{a} + {b} * {c}^2 - ({a} / {b}) % {c}", "{a}*stack + {b}", "floor({x} * {b})",
+    "-{a}^2", "0x{h} + 0b101",
+]
+FUNCTION_TEMPLATES = [
+    "atan2({a}, {b}) + log10({a}) * floor({x}) + gcd({a}, {b})",
+    "sin({x}) * cos({x}) + tan({x} / 3) - exp({x} / 10)",
+    "max(min({a}, {b}), {c}) + abs({a}, {b}) + norm({c}, {b}) + ln({a}) + cbrt({b})",
+    "modpow({a}, {b}, {c} + 1) + lcm({a}, {b}) - degrees(radians({a}))",
+    "sum({a}, {b}, {c}, {x}) / prod({a}, {b}) + len(1, 2, 3)",
+]
+COMPLEX_TEMPLATES = [
+    "({a}+{b}i)*({c}-{a}i) + sqrt(-{a})",
+    "e^(i*pi*{x}) + (1 + {a}j)^2",
+    "abs({a} + {b}i) + v2c({a}, {b}) * {x}",
+    "log(-{a}) + asin({a}) + acos({x}i)",
+]
+
+def _fill(template, rng):
+    return template.format(a=rng.randint(1, 1000), b=rng.randint(1, 100), c=rng.randint(2, 50),
+        x=round(rng.uniform(0.1, 10), 3), h=format(rng.randint(1, 4095), "x"))
+
+def generate(seed = 0, scale = 1):
+    """
+    :param seed: Random seed
+    :param scale: Multiplier for the number of expressions in each category
+    :return: Dict of category name: list of expressions
+    """
+    rng = random.Random(seed)
+    corpus = {
+        # Short chat style expressions, the common case for the bot
+        "chat": [_fill(rng.choice(CHAT_TEMPLATES), rng) for _ in range(500 * scale)],
+        # Long flat sums
+        "long_sum": [" + ".join(str(rng.randint(1, 1000)) for _ in range(1000)) for _ in range(5 * scale)],
+        # Deeply nested parens and function calls
+        "deep_nesting": [],
+        # Large vector literals
+        "large_vectors": [],
+        "functions": [_fill(rng.choice(FUNCTION_TEMPLATES), rng) for _ in range(200 * scale)],
+        "complex": [_fill(rng.choice(COMPLEX_TEMPLATES), rng) for _ in range(200 * scale)],
+    }
+    for _ in range(5 * scale):
+        depth = 200
+        corpus["deep_nesting"].append("(" * depth + "1" + "".join(f" + {rng.randint(1, 9)})" for _ in range(depth)))
+        corpus["deep_nesting"].append("sin(" * 50 + "1" + ")" * 50 + " + " + "max(1, " * 50 + "2" + ")" * 50)
+    for _ in range(2 * scale):
+        items = ", ".join(str(rng.randint(-1000, 1000)) for _ in range(5000))
+        corpus["large_vectors"].append(f"[{items}] * 2 + 1")
+        corpus["large_vectors"].append(f"sum([{items}]) + max([{items}])")
+    return corpus
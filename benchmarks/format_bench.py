@@ -0,0 +1,37 @@
+"""
+Time formatting large vector results in full against format(max_length=...) and
+format(max_items=...), which stop formatting once the limit is reached
+
+    python3 benchmarks/format_bench.py
+"""
+import os, sys
+import io
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import vector
+from calc.format import format, write
+
+def timed(f, repeat = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(sizes = (1_000, 100_000, 1_000_000)):
+    print(f"{'items':>9} {'full ms':>9} {'write ms':>9} {'2000 chars ms':>14} {'100 items ms':>13} {'full MB':>8}")
+    for n in sizes:
+        v = vector.Vector([x / 7 for x in range(n)])
+        t_full = timed(lambda: format(v))
+        t_write = timed(lambda: write(v, io.StringIO()))
+        t_length = timed(lambda: format(v, max_length=2000))
+        t_items = timed(lambda: format(v, max_items=100))
+        size = len(format(v)) / 1e6
+        print(f"{n:9} {t_full * 1e3:9.2f} {t_write * 1e3:9.2f} {t_length * 1e3:14.3f} {t_items * 1e3:13.3f} {size:8.1f}")
+
+if __name__ == "__main__":
+    main()
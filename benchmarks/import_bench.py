@@ -0,0 +1,65 @@
+"""
+Cold start: time to import calc.parse, measured with python -X importtime in fresh
+interpreters (the fastest of several runs, with bytecode cached). Exits with status 1
+if it is over the threshold
+
+    python3 benchmarks/import_bench.py --threshold-ms 10
+"""
+import argparse
+import os, sys
+import subprocess
+import tempfile
+
+current = os.path.dirname(os.path.realpath(__file__))
+ROOT = os.path.dirname(current)
+
+def importtime(statement, runs, env):
+    """
+    :param statement: Python code to run, ie "import calc.parse"
+    :param runs: Number of fresh interpreters, the fastest time of each module is kept
+    :return: Dict of module: (self us, cumulative us)
+    """
+    best = {}
+    for _ in range(runs):
+        err = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT, env=env,
+            capture_output=True, text=True, check=True).stderr
+        for line in err.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            name = name.strip()
+            old = best.get(name, (float("inf"), float("inf")))
+            best[name] = (min(old[0], int(self_us)), min(old[1], int(cumulative_us)))
+    return best
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Time importing calc.parse")
+    parser.add_argument("--module", default="calc.parse", help="Module to import (default calc.parse)")
+    parser.add_argument("--runs", type=int, default=20, help="Fresh interpreters to run (default 20)")
+    parser.add_argument("--threshold-ms", type=float, default=None, help="Fail if the import takes longer")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pycache:
+        # Bytecode is cached like in a normal install, even if PYTHONDONTWRITEBYTECODE is set
+        env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+        env["PYTHONPYCACHEPREFIX"] = pycache
+        statement = f"import {args.module}"
+        importtime(statement, 1, env) # Write the bytecode
+        baseline = importtime("pass", args.runs, env)
+        times = importtime(statement, args.runs, env)
+
+    added = {name: t for name, t in times.items() if name not in baseline}
+    print(f"{'self us':>8} {'total us':>9}  module (imported by {statement!r}, excluding interpreter startup)")
+    for name, (self_us, cumulative_us) in sorted(added.items(), key=lambda x: -x[1][0])[:args.top]:
+        print(f"{self_us:8} {cumulative_us:9}  {name}")
+    total_ms = times[args.module][1] / 1000
+    print(f"{args.module}: {total_ms:.2f} ms")
+
+    if args.threshold_ms is not None and total_ms > args.threshold_ms:
+        print(f"REGRESSION: import took {total_ms:.2f} ms, threshold is {args.threshold_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Time the Tokenizer on growing inputs, the time per char should stay flat since it
+dispatches on the first char of each token
+
+    python3 benchmarks/lexer_bench.py
+"""
+import os, sys
+import timeit
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.lexer import Tokenizer
+
+def inputs(n):
+    return {
+        "chat": "shulker*3 + stack*5 - sqrt(2)",
+        f"sum of {n} terms": " + ".join(str(i) for i in range(n)),
+        f"vector of {n} floats": "[" + ", ".join(f"{i}.5e-3" for i in range(n)) + "]",
+        f"{n} function calls": " * ".join("max(1, -2)" for _ in range(n // 5)),
+    }
+
+def tokenize(expr):
+    t = Tokenizer(expr)
+    t.tokenize()
+    return t.tokens
+
+def main(sizes = (200, 2000, 20000), number = 5):
+    print(f"{'input':25} {'chars':>8} {'ms':>10} {'ns/char':>9}")
+    for n in sizes:
+        for name, expr in inputs(n).items():
+            t = min(timeit.repeat(lambda: tokenize(expr), number=number, repeat=3)) / number
+            print(f"{name:25} {len(expr):8} {t * 1e3:10.3f} {t / len(expr) * 1e9:9.1f}")
+
+if __name__ == "__main__":
+    main()
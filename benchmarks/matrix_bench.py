@@ -0,0 +1,67 @@
+"""
+Time matmul(), det(), inv() and solve() at 3x3, 100x100 and 1000x1000 in pure Python and
+NumPy, and a 3x3 product written as sums of dot() calls
+
+    python3 benchmarks/matrix_bench.py
+"""
+import os, sys
+import random
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import matrix, nputil
+from calc.matrix import Matrix
+from calc.parse import compile
+
+EXPRESSIONS = ["matmul(a, b)", "det(a)", "inv(a)", "solve(a, b)"]
+
+# Pure Python at this size would take minutes
+MAX_PYTHON_SIZE = 200
+
+def timed(f, repeat = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def dot_sums():
+    """matmul() of two 3x3 matrices the way it had to be written before matrices"""
+    rows = ", ".join("[" + ", ".join(f"dot([a{i}1, a{i}2, a{i}3], [b1{j}, b2{j}, b3{j}])" for j in (1, 2, 3)) + "]"
+        for i in (1, 2, 3))
+    return compile(f"[{rows}]")
+
+def main(sizes = (3, 100, 1000)):
+    random.seed(0)
+    print(f"{'expression':14} {'size':>10} {'python ms':>10} {'numpy ms':>10}")
+    threshold = matrix.NUMPY_THRESHOLD
+    for expr in EXPRESSIONS:
+        compiled = compile(expr)
+        for n in sizes:
+            # Scaled so det() stays finite at 1000x1000
+            a = Matrix([[random.gauss(0, 1) / n ** 0.5 for _ in range(n)] for _ in range(n)])
+            b = Matrix([[random.gauss(0, 1) / n ** 0.5 for _ in range(n)] for _ in range(n)])
+            args = (a, b) if "b" in expr else (a,)
+            matrix.NUMPY_THRESHOLD = 10 ** 9
+            t_python = timed(lambda: compiled.evaluate(*args)) if n <= MAX_PYTHON_SIZE else None
+            matrix.NUMPY_THRESHOLD = 1
+            t_numpy = timed(lambda: compiled.evaluate(*args)) if nputil.numpy() else None
+            matrix.NUMPY_THRESHOLD = threshold
+            python = f"{t_python * 1e3:10.3f}" if t_python is not None else f"{'-':>10}"
+            numpy = f"{t_numpy * 1e3:10.3f}" if t_numpy is not None else f"{'-':>10}"
+            print(f"{expr:14} {f'{n}x{n}':>10} {python} {numpy}")
+
+    values = [random.randint(-9, 9) for _ in range(18)]
+    a = Matrix([values[0:3], values[3:6], values[6:9]])
+    b = Matrix([values[9:12], values[12:15], values[15:18]])
+    by_dots = dot_sums()
+    by_matmul = compile("matmul(a, b)")
+    t_dots = timed(lambda: by_dots.evaluate(*values), 1000)
+    t_matmul = timed(lambda: by_matmul.evaluate(a, b), 1000)
+    print(f"\n3x3 product: dot() sums {t_dots * 1e6:.1f} us, matmul() {t_matmul * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Memory per token and per calc() call, measured with tracemalloc
+
+    python3 benchmarks/memory_bench.py
+"""
+import os, sys
+import tracemalloc
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import lexer
+from calc.parse import calc, shunting_yard, set_cache_size, DEFAULT_CACHE_SIZE
+
+CORPUS = [
+    "64*27", "shulker*3 + stack*5", "sqrt(2)", "1 + 2 * 3^5 - (4 / 2) % 3",
+    "max(1, max(50), max(-1, -2, -3))", "angle3([0, 1] + [1, 2], [1, 2], [1, 0] + [1, 2])",
+    "sum([1, 2, 3, 4, 5, 6, 7, 8, 9, 10]) * e^(i * pi)", "-3^2 + cos(pi) * [1, 2, 3]",
+]
+
+def token_memory(repeat = 200):
+    """
+    :return: (bytes, memory blocks) still allocated per token while the token lists
+        and shunting yard output of the corpus are alive
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = []
+    tokens = 0
+    for _ in range(repeat):
+        for expr in CORPUS:
+            t = lexer.Tokenizer(expr)
+            t.tokenize()
+            kept.append((t.tokens, shunting_yard(t)))
+            tokens += len(t.tokens)
+    stats = tracemalloc.take_snapshot().compare_to(before, "filename")
+    tracemalloc.stop()
+    return sum(s.size_diff for s in stats) / tokens, sum(s.count_diff for s in stats) / tokens
+
+def calc_memory(repeat = 200):
+    """
+    :return: (peak bytes, memory blocks allocated by calc modules) per calc() call, uncached
+    """
+    set_cache_size(0)
+    calc_dir = os.path.join(os.path.dirname(current), "calc")
+    peak = 0
+    tracemalloc.start(1)
+    for _ in range(repeat):
+        for expr in CORPUS:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            calc(expr)
+            peak += tracemalloc.get_traced_memory()[1] - base
+    # Memory blocks allocated by the calc package for one pass over the corpus, kept
+    # alive so they show up in the snapshot
+    tracemalloc.clear_traces()
+    start = tracemalloc.take_snapshot()
+    kept = []
+    for expr in CORPUS:
+        t = lexer.Tokenizer(expr)
+        t.tokenize()
+        kept.append(t)
+        kept.append(shunting_yard(t))
+    stats = tracemalloc.take_snapshot().compare_to(start, "filename")
+    blocks = sum(s.count_diff for s in stats if s.traceback[0].filename.startswith(calc_dir))
+    tracemalloc.stop()
+    set_cache_size(DEFAULT_CACHE_SIZE)
+    n = repeat * len(CORPUS)
+    return peak / n, blocks / len(CORPUS)
+
+def main():
+    size, count = token_memory()
+    print(f"bytes per token (tokens + shunting yard output): {size:.1f}")
+    print(f"memory blocks per token: {count:.2f}")
+    peak, blocks = calc_memory()
+    print(f"peak bytes per uncached calc() call: {peak:.0f}")
+    print(f"memory blocks allocated by calc/ per tokenize + shunting yard: {blocks:.1f}")
+
+if __name__ == "__main__":
+    main()
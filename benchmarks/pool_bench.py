@@ -0,0 +1,41 @@
+"""
+Round trip latency of WorkerPool.calc() against in-process calc()
+
+    python3 benchmarks/pool_bench.py
+"""
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.parse import calc
+from calc.pool import WorkerPool, EvaluationTimeoutError
+
+EXPRESSIONS = ["1 + 2 * 3", "shulker*3 + stack*5", "sum([1, 2, 3, 4]) * sin(pi / 4)", "2^1000"]
+
+def timed(f, expr, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        f(expr)
+    return (time.perf_counter() - start) / n
+
+def main(n = 5000):
+    with WorkerPool(1) as pool:
+        pool.calc("1", 10) # Wait for the worker to start
+        print(f"{'expression':35} {'calc() us':>10} {'pool us':>10} {'overhead us':>12}")
+        for expr in EXPRESSIONS:
+            t_local = timed(calc, expr, n)
+            t_pool = timed(lambda e: pool.calc(e, 10), expr, n)
+            print(f"{expr:35} {t_local * 1e6:10.1f} {t_pool * 1e6:10.1f} {(t_pool - t_local) * 1e6:12.1f}")
+
+        start = time.perf_counter()
+        try:
+            pool.calc("3^(10^8)", 0.1, budget=None)
+        except EvaluationTimeoutError:
+            pass
+        pool.calc("1", 10)
+        print(f"0.1s timeout, kill, restart and next result: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Time tokenizing, shunting yard and evaluation on inputs from 10k to 1M tokens
+
+    python3 benchmarks/scaling_bench.py
+"""
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import lexer
+from calc.parse import shunting_yard, evaluate
+
+def workloads(n):
+    """
+    :param n: Approximate number of tokens
+    :return: Dict of name: expression
+    """
+    return {
+        "long sum": "+".join("1" for _ in range(n // 2)),
+        "deep parens": "(" * (n // 2) + "1" + ")" * (n // 2),
+        "nested sums": "(1+" * (n // 4) + "1" + ")" * (n // 4),
+        "vector literal": "[" + ",".join("1" for _ in range(n // 2)) + "]",
+    }
+
+def time_phases(expr):
+    """
+    :return: Seconds spent tokenizing, in shunting_yard() and evaluating
+    """
+    t0 = time.perf_counter()
+    t = lexer.Tokenizer(expr)
+    t.tokenize()
+    t1 = time.perf_counter()
+    program = shunting_yard(t)
+    t2 = time.perf_counter()
+    evaluate(program)
+    t3 = time.perf_counter()
+    return t1 - t0, t2 - t1, t3 - t2
+
+def main(sizes = (10_000, 100_000, 1_000_000)):
+    print(f"{'workload':16} {'tokens':>9} {'lex s':>8} {'parse s':>8} {'eval s':>8} {'us/token':>9}")
+    for n in sizes:
+        for name, expr in workloads(n).items():
+            lex, parse, ev = time_phases(expr)
+            print(f"{name:16} {n:9} {lex:8.3f} {parse:8.3f} {ev:8.3f} {(lex + parse + ev) / n * 1e6:9.2f}")
+
+if __name__ == "__main__":
+    main()
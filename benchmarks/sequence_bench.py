@@ -0,0 +1,52 @@
+"""
+Time reductions of lazy sequences (calc/sequence.py) against the same reductions of a
+vector holding every item, and measure the peak memory of each. Sums of int ranges use
+a closed form, the others stream the items
+
+    python3 benchmarks/sequence_bench.py
+"""
+import os, sys
+import time
+import tracemalloc
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import vector
+from calc.parse import calc, compile
+
+EXPRESSIONS = [
+    ("sum(range(1, {n}))", "sum(v)"),
+    ("max(range({n}) * 3 - 1)", "max(v * 3 - 1)"),
+    ("sum(range(0, {n} / 2, 0.5))", "sum(v / 2)"),
+    ("sum(sqrt(range({n})))", "sum(sqrt(v))"),
+]
+
+def measured(f):
+    """:return: Seconds and peak bytes allocated calling f"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    f()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main(sizes = (10_000, 1_000_000)):
+    print(f"{'expression':24} {'items':>9} {'lazy ms':>9} {'lazy KiB':>9} {'vector ms':>10} {'vector KiB':>11}")
+    threshold = vector.ARRAY_THRESHOLD
+    vector.ARRAY_THRESHOLD = float("inf") # Compare against list based vectors
+    try:
+        for lazy, eager in EXPRESSIONS:
+            for n in sizes:
+                t_lazy, m_lazy = measured(lambda: calc(lazy.format(n=n), budget=None))
+                # Building the vector is part of what the lazy version avoids
+                compiled = compile(eager)
+                t_eager, m_eager = measured(lambda: compiled.evaluate(vector.Vector(list(range(n)))))
+                print(f"{lazy.format(n='n'):24} {n:9} {t_lazy * 1e3:9.1f} {m_lazy / 1024:9.1f} {t_eager * 1e3:10.1f} "
+                    f"{m_eager / 1024:11.1f}")
+    finally:
+        vector.ARRAY_THRESHOLD = threshold
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Time index and slice expressions on large vectors against copying the items. Slices are
+views of the parent's storage so their time should not grow with the vector length
+
+    python3 benchmarks/slice_bench.py
+"""
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import vector
+from calc.parse import compile
+
+EXPRESSIONS = ["v[5]", "v[1:]", "v[::2]", "v[::-1][10:20]"]
+
+def timed(f, repeat = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(sizes = (1_000, 1_000_000)):
+    print(f"{'expression':16} {'items':>9} {'list us':>9} {'array us':>9} {'copy us':>9}")
+    threshold = vector.ARRAY_THRESHOLD
+    for expr in EXPRESSIONS:
+        compiled = compile(expr)
+        for n in sizes:
+            items = [x + 0.5 for x in range(n)]
+            vector.ARRAY_THRESHOLD = n + 1
+            v = vector.Vector(items)
+            t_list = timed(lambda: compiled.evaluate(v))
+            vector.ARRAY_THRESHOLD = threshold
+            v = vector.Vector(items)
+            t_array = timed(lambda: compiled.evaluate(v))
+            t_copy = timed(lambda: items[1:]) # What a copying slice would cost at least
+            print(f"{expr:16} {n:9} {t_list * 1e6:9.1f} {t_array * 1e6:9.1f} {t_copy * 1e6:9.1f}")
+
+if __name__ == "__main__":
+    main()
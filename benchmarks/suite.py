@@ -0,0 +1,203 @@
+"""
+Benchmark suite: times each phase (tokenize, shunting yard, evaluate, calc, format) on
+every corpus category, and Vector operations, separately. Results are written as JSON
+and compared against a saved baseline, exiting with status 1 on a regression
+
+    python3 -m benchmarks.suite --output baseline.json           # Save a baseline
+    python3 -m benchmarks.suite --baseline baseline.json         # Compare against it
+
+Baselines are only comparable on the same machine and Python version
+"""
+import argparse
+import gc
+import json
+import os, sys
+import platform
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import format as _format
+from calc import lexer, maths, nputil, vector
+from calc.parse import calc, evaluate, shunting_yard, set_cache_size, DEFAULT_CACHE_SIZE
+from benchmarks import corpus as _corpus
+
+VECTOR_SIZES = [3, 1000, 20000]
+
+def best_time(f, repeat, min_time = 0.05):
+    """
+    Like timeit: f is called enough times per run that a run takes at least min_time,
+    with garbage collection off
+    :param f: Function to time
+    :param repeat: Number of runs
+    :return: Seconds per call of the fastest run
+    """
+    def run(number):
+        start = time.perf_counter()
+        for _ in range(number):
+            f()
+        return time.perf_counter() - start
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        number = 1
+        while run(number) < min_time:
+            number *= 2
+        return min(run(number) for _ in range(repeat)) / number
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def _tokenized(expr):
+    t = lexer.Tokenizer(expr)
+    t.tokenize()
+    return t
+
+def bench_category(exprs, repeat):
+    """
+    :param exprs: List of expressions
+    :param repeat: Runs per phase, the fastest is kept
+    :return: Dict of phase: microseconds per expression
+    """
+    tokenizers = [_tokenized(e) for e in exprs]
+    programs = [shunting_yard(t) for t in tokenizers]
+    results = [evaluate(p) for p in programs]
+
+    def tokenize():
+        for e in exprs:
+            lexer.Tokenizer(e).tokenize()
+    def parse():
+        for t in tokenizers:
+            shunting_yard(t)
+    def evaluate_all():
+        for p in programs:
+            evaluate(p)
+    def calc_all():
+        for e in exprs:
+            calc(e, budget=None)
+    def format_all():
+        for r in results:
+            _format.format(r, True)
+
+    phases = {"tokenize": tokenize, "shunting_yard": parse, "evaluate": evaluate_all,
+        "calc": calc_all, "format": format_all}
+    return {name: best_time(f, repeat) / len(exprs) * 1e6 for name, f in phases.items()}
+
+def bench_vectors(size, repeat):
+    """
+    :param size: Number of items
+    :return: Dict of operation: microseconds per operation
+    """
+    a = vector.Vector([float(i % 97) + 0.5 for i in range(size)])
+    b = vector.Vector([float(i % 89) + 1.5 for i in range(size)])
+    sin = maths.FUNCTIONS["sin"]
+    ops = {
+        "add": lambda: a + b,
+        "mul_scalar": lambda: a * 3,
+        "pow": lambda: a ** 2,
+        "dot": lambda: a.dot(b),
+        "abs": lambda: abs(a),
+        "map_sin": lambda: sin([a]),
+        "construct": lambda: vector.Vector(list(range(size))),
+    }
+    return {name: best_time(f, repeat) * 1e6 for name, f in ops.items()}
+
+def calibrate(repeat):
+    """
+    :return: Microseconds for a fixed pure Python workload, used to scale out changes in
+        machine speed between runs
+    """
+    return best_time(lambda: sum(str(i) < "5" for i in range(1000)), repeat) * 1e6
+
+def run_suite(repeat = 5, scale = 1, seed = 0):
+    """
+    :return: Dict with environment info and "results": {group: {phase: microseconds}}
+    """
+    set_cache_size(0) # Time the parser, not the cache
+    try:
+        calibration = calibrate(repeat)
+        results = {}
+        for category, exprs in _corpus.generate(seed, scale).items():
+            results[category] = bench_category(exprs, repeat)
+        for size in VECTOR_SIZES:
+            results[f"vector_{size}"] = bench_vectors(size, repeat)
+        calibration = min(calibration, calibrate(repeat))
+    finally:
+        set_cache_size(DEFAULT_CACHE_SIZE)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": nputil.numpy() is not None,
+        "seed": seed,
+        "scale": scale,
+        "calibration_us": calibration,
+        "results": results
+    }
+
+def compare(results, baseline, tolerance, normalize = True):
+    """
+    :param results: run_suite() output
+    :param baseline: Earlier run_suite() output
+    :param tolerance: Allowed slowdown, ie 0.25 for 25%
+    :param normalize: Scale baseline times by the change in calibration time
+    :return: List of (group, phase, baseline us, new us) that regressed, baseline times scaled
+    """
+    scale = 1
+    if normalize and baseline.get("calibration_us"):
+        scale = results["calibration_us"] / baseline["calibration_us"]
+    regressions = []
+    for group, phases in results["results"].items():
+        for phase, us in phases.items():
+            old = baseline["results"].get(group, {}).get(phase)
+            if old is None:
+                continue
+            old *= scale
+            if us > old * (1 + tolerance):
+                regressions.append((group, phase, old, us))
+    return regressions
+
+def print_results(results, baseline = None):
+    print(f"{'group':16} {'phase':14} {'us':>12} {'baseline':>12} {'change':>8}")
+    for group, phases in results["results"].items():
+        for phase, us in phases.items():
+            old = baseline["results"].get(group, {}).get(phase) if baseline else None
+            if old:
+                print(f"{group:16} {phase:14} {us:12.2f} {old:12.2f} {(us / old - 1) * 100:7.1f}%")
+            else:
+                print(f"{group:16} {phase:14} {us:12.2f}")
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog="python3 -m benchmarks.suite", description="Run the benchmark suite")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing (default 0.25)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per phase, the fastest is kept (default 5)")
+    parser.add_argument("--scale", type=int, default=1, help="Corpus size multiplier (default 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default 0)")
+    parser.add_argument("--no-normalize", action="store_true",
+        help="Compare raw times instead of scaling by the calibration workload")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.repeat, args.scale, args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance, not args.no_normalize)
+        for group, phase, old, us in regressions:
+            print(f"REGRESSION: {group} {phase} {old:.2f}us -> {us:.2f}us ({(us / old - 1) * 100:+.1f}%)", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Evaluate one formula over many inputs: string substitution + calc() against
+compile() once + evaluate() with variables
+
+    python3 benchmarks/variables_bench.py
+"""
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.parse import calc, compile
+
+FORMULAS = [
+    ("x^2 + 3*x", ("x",)),
+    ("floor(x / stack) + (x % stack) / 100", ("x",)),
+    ("sqrt(x^2 + y^2) / (1 + sqrt(x^2 + y^2))", ("x", "y")),
+]
+
+def main(rows = 20000):
+    print(f"{'formula':45} {'substitute us':>14} {'evaluate us':>12} {'speedup':>8}")
+    for formula, names in FORMULAS:
+        inputs = [tuple(i + k for k in range(len(names))) for i in range(rows)]
+
+        start = time.perf_counter()
+        for values in inputs:
+            expr = formula
+            for name, value in zip(names, values):
+                expr = expr.replace(name, f"({value})")
+            calc(expr)
+        t_sub = (time.perf_counter() - start) / rows
+
+        start = time.perf_counter()
+        compiled = compile(formula)
+        for values in inputs:
+            compiled.evaluate(*values)
+        t_eval = (time.perf_counter() - start) / rows
+
+        print(f"{formula:45} {t_sub * 1e6:14.2f} {t_eval * 1e6:12.2f} {t_sub / t_eval:7.1f}x")
+
+if __name__ == "__main__":
+    main()
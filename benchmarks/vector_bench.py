@@ -0,0 +1,42 @@
+"""
+Time vector expressions with 100k+ items, list based Vector against the NumPy
+backed ArrayVector
+
+    python3 benchmarks/vector_bench.py
+"""
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import vector
+from calc.parse import compile
+
+EXPRESSIONS = ["v * 2 + v / 3 - 1", "sin(v) + sqrt(v)", "sum(v^2)", "dot(v, v)", "max(sort(v % 7))"]
+
+def timed(f, repeat = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(sizes = (100_000, 1_000_000)):
+    print(f"{'expression':22} {'items':>9} {'list ms':>9} {'array ms':>9} {'speedup':>8}")
+    threshold = vector.ARRAY_THRESHOLD
+    for expr in EXPRESSIONS:
+        compiled = compile(expr)
+        for n in sizes:
+            items = [x + 0.5 for x in range(n)]
+            vector.ARRAY_THRESHOLD = n + 1
+            v = vector.Vector(items)
+            t_list = timed(lambda: compiled.evaluate(v))
+            vector.ARRAY_THRESHOLD = threshold
+            v = vector.Vector(items)
+            t_array = timed(lambda: compiled.evaluate(v))
+            print(f"{expr:22} {n:9} {t_list * 1e3:9.1f} {t_array * 1e3:9.1f} {t_list / t_array:7.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Evaluate expressions from stdin or a file, one per line
+
+    python3 -m calc queries.txt --mc --format jsonl --workers 4
+    echo "shulker * 3" | python3 -m calc
+"""
+import argparse
+import itertools
+import json
+import sys
+
+from . import budget as _budget
+from . import bulk
+from . import format as _format
+
+# Writers get the result as pieces from format.iter_format() (None on error)
+
+def _write_text(out, n, expr, result, error):
+    if error is not None:
+        out.write(f"Error: {error}\n")
+        return
+    out.writelines(result) # Streamed, large vectors are never joined into one string
+    out.write("\n")
+
+def _write_jsonl(out, n, expr, result, error):
+    row = {"line": n, "expr": expr}
+    if error is not None:
+        row["error"] = error
+    else:
+        row["result"] = "".join(result)
+    out.write(json.dumps(row) + "\n")
+
+def _write_tsv(out, n, expr, result, error):
+    # Columns: line, expression, result, error (one of the last two is empty)
+    expr = expr.replace("\t", " ")
+    result = "".join(result) if result is not None else ""
+    out.write(f"{n}\t{expr}\t{result}\t{error or ''}\n")
+
+WRITERS = {
+    "text": _write_text,
+    "jsonl": _write_jsonl,
+    "tsv": _write_tsv
+}
+
+def _error_message(e):
+    return str(e).replace("\n", " ") or type(e).__name__
+
+def main(argv = None, stdin = None, stdout = None):
+    """
+    Blank lines are skipped, line numbers in the output are those of the input file
+    :param argv: Command line args, defaults to sys.argv[1:]
+    :param stdin: Input stream if no file is given, defaults to sys.stdin
+    :param stdout: Output stream, defaults to a buffered sys.stdout
+    :raises SystemExit: With status 2 if the args are invalid or the file can't be read
+    :return: Exit code, 1 if any line failed and --strict is given
+    """
+    parser = argparse.ArgumentParser(prog="python3 -m calc", description="Evaluate expressions, one per line")
+    parser.add_argument("file", nargs="?", default="-", help="Input file, - for stdin (default)")
+    parser.add_argument("--mc", action="store_true", help="Include Minecraft stacks in results")
+    parser.add_argument("--format", choices=WRITERS.keys(), default="text", help="Output format (default text)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (default 1, in process)")
+    parser.add_argument("--chunksize", type=int, default=256, help="Lines sent to a worker at a time")
+    parser.add_argument("--no-budget", action="store_true", help="Don't limit evaluation cost (see calc/budget.py)")
+    parser.add_argument("--strict", action="store_true", help="Exit with status 1 if any line fails")
+    parser.add_argument("--buffer", type=int, default=1 << 16, help="Output buffer size in bytes")
+    parser.add_argument("--max-length", type=int, help="Shorten vector results to this many characters")
+    parser.add_argument("--max-items", type=int, help="Show at most this many items of vector results")
+    parser.add_argument("--exact", action="store_true",
+        help=f"Show every digit of ints over {_format.MAX_EXACT_DIGITS} digits instead of scientific notation")
+    args = parser.parse_args(argv)
+
+    own_stdout = stdout is None
+    if own_stdout:
+        stdout = open(sys.stdout.fileno(), "w", buffering=args.buffer, closefd=False)
+    write = WRITERS[args.format]
+    budget = None if args.no_budget else _budget.DEFAULT_BUDGET
+    failed = False
+    source = None
+    try:
+        if args.file == "-":
+            source = stdin or sys.stdin
+        else:
+            try:
+                source = open(args.file)
+            except OSError as e: # Same message and exit status as argparse.FileType
+                parser.error(f"can't open '{args.file}': {e.strerror or e}")
+        lines = ((n, line.rstrip("\r\n")) for n, line in enumerate(source, 1))
+        # tee only keeps the lines calc_many() has read ahead of the results
+        numbered, echo = itertools.tee((n, expr) for n, expr in lines if expr.strip())
+        exprs = (expr for _, expr in numbered)
+        results = bulk.calc_many(exprs, workers=args.workers, chunksize=args.chunksize, budget=budget)
+        for (n, expr), result in zip(echo, results):
+            if isinstance(result, Exception):
+                error = _error_message(result)
+            else:
+                try:
+                    write(stdout, n, expr, _format.iter_format(result, args.mc, args.max_length, args.max_items, args.exact), None)
+                    continue
+                except OSError:
+                    raise
+                except Exception as e: # ie str() of a huge int, text output ends the partial line with it
+                    error = _error_message(e)
+            failed = True
+            write(stdout, n, expr, None, error)
+        stdout.flush()
+    except BrokenPipeError: # ie piped into head
+        pass
+    finally:
+        if source is not None and source is not stdin and source is not sys.stdin:
+            source.close()
+        if own_stdout: # Flushes what was written before an error
+            try:
+                stdout.close()
+            except BrokenPipeError:
+                pass
+    return 1 if failed and args.strict else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+asyncio API: calc() and format() run in an executor so they don't block the event loop
+
+    from calc.aio import acalc, aformat
+    result = await acalc("shulker * 3")
+    print(await aformat(result, True))
+
+Identical in-flight acalc() calls share one evaluation, the number of jobs in the
+executor at once can be capped and cancelled calls are dropped from the executor if they
+haven't started yet. An AsyncCalculator can be used from several event loops, each
+has its own concurrency limit and in-flight calls
+
+Whether an expression calls an impure function like rand() is found in the executor
+from its parsed program. Callers that shared the evaluation of an impure expression
+before that was known get their own evaluation, later calls aren't shared
+"""
+import asyncio
+import weakref
+
+from . import cache
+from . import format as _format
+from . import lexer
+from . import optimize
+from . import parse
+
+def _calc_job(key, budget):
+    """
+    Executor job, see parse.calc()
+    :param key: Whitespace stripped expression
+    :return: (False if its program calls an impure function, result)
+    """
+    result = parse.calc(key, budget)
+    pure = all(optimize._token_is_pure(token) for token in parse._get_program(key, budget)) # Cached by calc()
+    return pure, result
+
+class _InFlight(object):
+    """A shared evaluation and how many callers are waiting on it"""
+    __slots__ = ("task", "waiters", "claimed")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+        self.claimed = False # Whether a caller took the result of an impure expression
+
+class _LoopState(object):
+    """Semaphore and in-flight calls of one event loop, asyncio objects can't be shared"""
+    __slots__ = ("semaphore", "in_flight")
+
+    def __init__(self, max_concurrency):
+        self.semaphore = None if max_concurrency is None else asyncio.Semaphore(max_concurrency)
+        self.in_flight = {} # (stripped expression, budget): _InFlight
+
+class AsyncCalculator(object):
+    def __init__(self, executor = None, max_concurrency = None):
+        """
+        :param executor: concurrent.futures.Executor to run calc() and format() in, None for
+            the event loop's default (thread) executor. Evaluating big ints holds the GIL,
+            use a ProcessPoolExecutor so heavy expressions can't stall the loop
+        :param max_concurrency: Max jobs in the executor at once, None for no limit.
+            Other calls wait their turn without holding an executor slot
+        """
+        self._executor = executor
+        self._max_concurrency = max_concurrency
+        self._loops = weakref.WeakKeyDictionary() # Event loop: _LoopState
+        self._impure = cache.LRUCache(parse.DEFAULT_CACHE_SIZE) # Stripped expression: True
+
+    def _state(self):
+        """:return: _LoopState of the running event loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = _LoopState(self._max_concurrency)
+        return state
+
+    async def _run(self, f, *args):
+        loop = asyncio.get_running_loop()
+        semaphore = self._state().semaphore
+        if semaphore is None:
+            return await loop.run_in_executor(self._executor, f, *args)
+        async with semaphore:
+            return await loop.run_in_executor(self._executor, f, *args)
+
+    async def calc(self, expr, budget = parse._MISSING):
+        """
+        Calculate an expression in the executor, see parse.calc()
+        :param expr: Expression to calc, ie "1 + 1"
+        :param budget: budget.Budget, None for no limits. Defaults to parse.get_budget()
+        :return: Numeric answer
+        """
+        if budget is parse._MISSING:
+            budget = parse.get_budget()
+        key = lexer.strip_whitespace(expr)
+        if self._impure.get(key):
+            return (await self._run(_calc_job, key, budget))[1]
+
+        key = (key, budget)
+        in_flight = self._state().in_flight
+        flight = in_flight.get(key)
+        if flight is None:
+            flight = _InFlight(asyncio.ensure_future(self._run(_calc_job, key[0], budget)))
+            in_flight[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(in_flight, key, flight))
+
+        flight.waiters += 1
+        try:
+            # Shielded so one caller being cancelled doesn't cancel the others
+            pure, result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done(): # Last one waiting
+                self._forget(in_flight, key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        if not pure:
+            self._impure.put(key[0], True)
+            if flight.claimed: # Another caller has this result
+                return (await self._run(_calc_job, key[0], budget))[1]
+            flight.claimed = True
+        return result
+
+    @staticmethod
+    def _forget(in_flight, key, flight):
+        if in_flight.get(key) is flight:
+            del in_flight[key]
+
+    async def format(self, result, include_mc_calc = False, max_length = None, max_items = None, exact_ints = False):
+        """
+        Format a result in the executor (large results can be slow to format), see format.format()
+        :return: Formatted string
+        """
+        return await self._run(_format.format, result, include_mc_calc, max_length, max_items, exact_ints)
+
+_default = AsyncCalculator()
+
+def set_executor(executor, max_concurrency = None):
+    """
+    Set the executor used by acalc() and aformat()
+    :param executor: concurrent.futures.Executor, or None for the event loop's default
+    :param max_concurrency: Max jobs in the executor at once, None for no limit
+    """
+    global _default
+    _default = AsyncCalculator(executor, max_concurrency)
+
+async def acalc(expr, budget = parse._MISSING):
+    """
+    Calculate an expression without blocking the event loop, see AsyncCalculator.calc()
+    :param expr: Expression to calc, ie "1 + 1"
+    :return: Numeric answer
+    """
+    return await _default.calc(expr, budget)
+
+async def aformat(result, include_mc_calc = False, max_length = None, max_items = None, exact_ints = False):
+    """
+    Format a result without blocking the event loop, see format.format()
+    :return: Formatted string
+    """
+    return await _default.format(result, include_mc_calc, max_length, max_items, exact_ints)
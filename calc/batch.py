@@ -0,0 +1,149 @@
+"""
+Evaluate one expression over arrays of variable values with NumPy (optional dependency)
+
+    from calc.batch import calc_batch
+    calc_batch("x^2 + 3*x", x=numpy.arange(1000))
+"""
+from . import lexer
+from . import maths
+from . import nputil
+from . import vector
+from .parse import compile, evaluate, _get_n_tokens, _token_owns_start
+
+np = nputil.numpy()
+
+class _NotVectorizable(Exception):
+    """Raised when the program needs per-row evaluation, ie it builds a Vector"""
+    pass
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Batch evaluation requires numpy")
+
+def _per_element(f, args, shape):
+    """
+    Fallback for functions without a NumPy version: call f on each element
+    :param f: maths.Function (or anything taking a list of numbers)
+    :param args: Array arguments, broadcast to shape
+    :param shape: Output shape
+    :return: Array of results
+    """
+    args = [np.broadcast_to(a, shape).ravel().tolist() for a in args]
+    out = []
+    for k in range(int(np.prod(shape))):
+        result = f([a[k] for a in args])
+        if isinstance(result, vector.Vector):
+            raise _NotVectorizable()
+        out.append(result)
+    if len(set(type(x) for x in out)) > 1: # Ie ints and floats from max(), keep each type
+        array = np.empty(len(out), dtype=object)
+        array[:] = out
+        return array.reshape(shape)
+    return np.array(out).reshape(shape)
+
+def _apply(numpy_f, f, args, shape):
+    """
+    :param numpy_f: NumPy version of f taking a list of array args, or None. Returns None
+        or raises TypeError for args it doesn't give the same results as f for
+    :param f: Function taking a list of numbers
+    :param args: Array arguments
+    :param shape: Output shape
+    :return: numpy_f's result, or f applied per element if numpy_f can't handle the args or
+        gives inf / nan, where Python raises or returns them by its own rules
+    """
+    if numpy_f is not None:
+        try:
+            with np.errstate(all="ignore"):
+                val = numpy_f(args)
+        except TypeError: # Ie complex args to floor_divide
+            val = None
+        if val is not None and nputil.is_finite(val):
+            return np.asarray(val)
+    return _per_element(f, args, shape)
+
+def _evaluate_vectorized(program, variables, shape):
+    """
+    Evaluate a program once with arrays in place of numbers
+    :raises _NotVectorizable: If a vector is created
+    :return: Array result
+    """
+    bin_ops, functions = nputil.tables()
+
+    stack = []
+    for token in program:
+        if isinstance(token, lexer.VariableToken):
+            stack.append(variables[token.slot])
+            continue
+        if isinstance(token, lexer.StartToken):
+            stack.append(token)
+            continue
+        if isinstance(token, (lexer.VectorToken, lexer.IndexToken)):
+            raise _NotVectorizable()
+
+        args = _get_n_tokens(stack, token.argc, _token_owns_start(token))
+        if isinstance(token, lexer.BinOpToken):
+            op = bin_ops.get(token.consumed)
+            val = _apply(op and (lambda a: op(*a)), token.eval, args, shape)
+        elif isinstance(token, lexer.MinusOrPlusSignToken):
+            sign = np.asarray(1 if token.consumed == "+" else -1)
+            val = _apply(lambda a: bin_ops["*"](sign, a[0]), token.eval, args, shape)
+        elif isinstance(token, lexer.ConstantOrFunctionToken) and token.is_function:
+            val = _apply(functions.get(token.consumed), maths.FUNCTIONS[token.consumed], args, shape)
+        else: # Numbers, constants and folded values
+            val = token.eval(args)
+            if isinstance(val, vector.Vector):
+                raise _NotVectorizable()
+            val = np.asarray(val)
+        stack.append(val)
+
+    if not len(stack):
+        raise RuntimeError("Failed to evaluate result (missing parentheses?)")
+    return stack[-1]
+
+def _evaluate_rows(program, variables, shape):
+    """
+    Fallback: evaluate the program once per row with Python values
+    :return: Array of results, dtype=object if any result is a Vector
+    """
+    columns = [np.broadcast_to(v, shape).ravel().tolist() for v in variables]
+    results = [evaluate(program, [c[k] for c in columns]) for k in range(int(np.prod(shape)))]
+    if any(isinstance(r, vector.Vector) for r in results):
+        out = np.empty(len(results), dtype=object)
+        for k, r in enumerate(results):
+            out[k] = r
+        return out.reshape(shape)
+    return np.array(results).reshape(shape)
+
+def evaluate_batch(compiled, *args, **kwargs):
+    """
+    Evaluate a compiled expression for every element of its (broadcast) variable arrays.
+    The program is evaluated once with NumPy ufuncs, functions without a NumPy version are
+    applied per element and programs that build vectors are evaluated once per row
+
+    Results and errors are the same as evaluate() row by row: sin() gives complex like
+    cmath.sin(), floor() gives ints, integer results that would overflow int64 use Python
+    ints (dtype=object). Operations NumPy would answer differently, ie log(0) = -inf, are
+    applied per element instead
+
+    :param compiled: CompiledExpression
+    :param args: Variable values (arrays or scalars) in the order of compiled.variables
+    :param kwargs: Variable values by name
+    :return: numpy.ndarray with the broadcast shape of the inputs
+    """
+    _require_numpy()
+    variables = [np.asarray(v) for v in compiled.bind(*args, **kwargs)]
+    shape = np.broadcast_shapes(*[v.shape for v in variables])
+
+    try:
+        result = _evaluate_vectorized(compiled.program, variables, shape)
+    except _NotVectorizable:
+        return _evaluate_rows(compiled.program, variables, shape)
+    return np.broadcast_to(result, shape).copy()
+
+def calc_batch(expr, *args, **kwargs):
+    """
+    Compile an expression and evaluate it over arrays, see evaluate_batch()
+    :param expr: Expression with variables, ie "x^2 + y"
+    :return: numpy.ndarray of results
+    """
+    return evaluate_batch(compile(expr), *args, **kwargs)
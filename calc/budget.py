@@ -0,0 +1,209 @@
+"""
+Evaluation cost limits, so input like 9^9^9 is rejected quickly instead of running for
+minutes. Integer results are estimated before the operation is run, see Budget.charge()
+"""
+import math
+
+from . import lexer
+from . import maths
+from . import matrix
+from . import sequence
+from . import vector
+
+# A 2^20 bit (~315k digit) int takes about 0.1s to compute
+DEFAULT_MAX_BITS = 1 << 20
+DEFAULT_MAX_VECTOR_LENGTH = 100000
+DEFAULT_MAX_STEPS = 1000000
+
+class BudgetExceededError(RuntimeError):
+    """Raised when an expression would go over its Budget"""
+    pass
+
+def _int_bound(x):
+    """
+    :param x: Number, Vector or Matrix
+    :return: Largest absolute value of the ints in x, or 0 if there are none.
+        Floats and complex numbers are ignored since they overflow instead of growing
+    """
+    if isinstance(x, int):
+        return abs(x)
+    if isinstance(x, vector.ArrayVector):
+        a = x._array
+        if a.dtype.kind in "iu":
+            return max(abs(int(a.max())), abs(int(a.min())))
+        return 0
+    if isinstance(x, sequence.Arithmetic):
+        return x.int_bound()
+    if isinstance(x, vector.Vector): # Iterated so lazy sequences aren't stored
+        return max((abs(i) for i in x if isinstance(i, int)), default=0)
+    if isinstance(x, matrix.Matrix):
+        return max((abs(i) for row in x.rows for i in row if isinstance(i, int)), default=0)
+    return 0
+
+def _pow_bits(args):
+    a, b = args
+    base = _int_bound(a)
+    exponent = b if isinstance(b, int) else _int_bound(b)
+    if base <= 1 or exponent <= 0:
+        return 0
+    try:
+        # Bit length of base ** exponent, the same as Budget._check_value() gives for the result
+        return math.floor(math.log2(base) * exponent) + 1
+    except OverflowError:
+        return math.inf
+
+def _mul_bits(args):
+    bounds = [_int_bound(x) for x in args]
+    if not all(bounds):
+        return 0
+    return sum(b.bit_length() for b in bounds)
+
+def _sum_bits(args):
+    return sum(_int_bound(x).bit_length() for x in args)
+
+def _exp2_bits(args):
+    exponent = args[0] if isinstance(args[0], int) else _int_bound(args[0])
+    return max(exponent + 1, 0)
+
+def _modpow_bits(args):
+    # The result is reduced modulo the modulus, the time it takes is charged as steps
+    return _int_bound(args[2]).bit_length()
+
+# modpow() work units (see _modpow_steps()) that take about as long as one evaluation step
+_MODPOW_UNITS_PER_STEP = 300
+
+def _modpow_steps(args):
+    """
+    :return: Steps modpow(base, exponent, modulus) takes: a multiplication and reduction
+        of modulus sized ints per exponent bit, quadratic in the modulus' 30 bit digits
+    """
+    exponent, modulus = _int_bound(args[1]), _int_bound(args[2])
+    digits = modulus.bit_length() // 30 + 1
+    return exponent.bit_length() * (digits ** 2 + 20) // _MODPOW_UNITS_PER_STEP
+
+# Estimated result bits for each operation, from its args
+_BIN_OP_BITS = {
+    "**": _pow_bits,
+    "^": _pow_bits,
+    "*": _mul_bits
+}
+_FUNCTION_BITS = {
+    "prod": _sum_bits,
+    "lcm": _sum_bits,
+    "exp2": _exp2_bits,
+    "modpow": _modpow_bits
+}
+
+def _item_steps(token, arg):
+    """
+    :param arg: Vector or Matrix arg of token
+    :return: Number of items of arg the token goes through
+    """
+    if isinstance(arg, matrix.Matrix):
+        return arg.size
+    if isinstance(arg, sequence.Arithmetic):
+        # Operators and 1 argument functions give lazy sequences, items are charged when
+        # they are used. Reductions with a closed form don't go through the items at all
+        if isinstance(token, (lexer.BinOpToken, lexer.MinusOrPlusSignToken)):
+            return 0
+        if isinstance(token, lexer.ConstantOrFunctionToken) and token.is_function:
+            f = maths.FUNCTIONS[token.consumed]
+            if (f.argc == 1 and f.numeric) or (f.argc == -1 and arg.closed_form(token.consumed) is not None):
+                return 0
+    return len(arg)
+
+class Budget(object):
+    def __init__(self, max_bits = DEFAULT_MAX_BITS, max_vector_length = DEFAULT_MAX_VECTOR_LENGTH,
+            max_steps = DEFAULT_MAX_STEPS):
+        """
+        Limits for evaluating one expression. Any limit can be None for no limit
+
+        :param max_bits: Max estimated bit length of an int result of ^, **, *, prod, lcm,
+            exp2 or modpow
+        :param max_vector_length: Max number of items in a vector literal or lazy sequence
+            result (see sequence.py)
+        :param max_steps: Max evaluation steps, each token is 1 step plus 1 per item of
+            each vector it is applied to. modpow() also takes steps for the time its
+            exponent and modulus sizes need
+        """
+        self.max_bits = max_bits
+        self.max_vector_length = max_vector_length
+        self.max_steps = max_steps
+
+    def check_program(self, program):
+        """
+        Reject a program before evaluating it if it is too long
+        :param program: RPN program from parse.shunting_yard()
+        :raises BudgetExceededError: If the program has more than max_steps tokens
+        """
+        if self.max_steps is not None and len(program) > self.max_steps:
+            raise BudgetExceededError(f"Expression is too long ({len(program)} tokens, limit is {self.max_steps})")
+
+    def charge(self, steps, token, args):
+        """
+        Check that evaluating a token is within budget, before it is evaluated
+        :param steps: Steps used so far
+        :param token: Token about to be evaluated
+        :param args: Its args
+        :raises BudgetExceededError: If any limit would be exceeded
+        :return: Steps used including this token
+        """
+        steps += 1
+        if not isinstance(token, lexer.IndexToken): # Indexes and slices never copy the vector
+            for arg in args:
+                if isinstance(arg, (vector.Vector, matrix.Matrix)):
+                    steps += _item_steps(token, arg)
+        if isinstance(token, lexer.ValueToken) and isinstance(token.value, sequence.Mapped):
+            steps += len(token.value) # Its ints are checked below by going through the items
+        if isinstance(token, lexer.ConstantOrFunctionToken) and token.consumed == "modpow" and len(args) == 3:
+            steps += _modpow_steps(args)
+        if self.max_steps is not None and steps > self.max_steps:
+            raise BudgetExceededError(f"Expression takes more than {self.max_steps} steps to evaluate")
+
+        if isinstance(token, lexer.VectorToken):
+            self._check_vector_length(len(args))
+            return steps
+        if isinstance(token, lexer.ValueToken): # Folded ahead of time, possibly with a larger budget
+            self._check_value(token.value)
+            return steps
+        if self.max_bits is None:
+            return steps
+
+        estimate = None
+        if isinstance(token, lexer.BinOpToken):
+            estimate = _BIN_OP_BITS.get(token.consumed)
+        elif isinstance(token, lexer.ConstantOrFunctionToken) and token.is_function:
+            estimate = _FUNCTION_BITS.get(token.consumed)
+            if token.argc == -1 and len(args) == 1 and isinstance(args[0], (vector.Vector, matrix.Matrix)):
+                args = args[0] # Vector items or matrix rows are the args, see maths.Function
+        if estimate is not None:
+            bits = estimate(args)
+            if bits > self.max_bits:
+                err = f"Result of '{token.consumed}' is too large (about {bits:.3g} bits, limit is {self.max_bits})"
+                raise BudgetExceededError(err)
+        return steps
+
+    def _check_vector_length(self, n):
+        if self.max_vector_length is not None and n > self.max_vector_length:
+            raise BudgetExceededError(f"Vector is too long ({n} items, limit is {self.max_vector_length})")
+
+    def check_result(self, value):
+        """
+        Check the result of an expression. Lazy sequences can be longer than max_vector_length
+        while they are only reduced, but not as results since they are stored or printed
+        :raises BudgetExceededError: If value is a lazy sequence longer than max_vector_length
+        """
+        if isinstance(value, sequence.Sequence):
+            self._check_vector_length(len(value))
+
+    def _check_value(self, value):
+        if isinstance(value, vector.Vector) and not isinstance(value, sequence.Sequence):
+            self._check_vector_length(len(value))
+        bits = _int_bound(value).bit_length()
+        if self.max_bits is not None and bits > self.max_bits:
+            raise BudgetExceededError(f"Value is too large ({bits} bits, limit is {self.max_bits})")
+
+    def __repr__(self):
+        return f"Budget(max_bits={self.max_bits}, max_vector_length={self.max_vector_length}, max_steps={self.max_steps})"
+
+DEFAULT_BUDGET = Budget()
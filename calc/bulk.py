@@ -0,0 +1,116 @@
+"""
+Evaluate many independent expressions across processes
+
+    from calc.bulk import calc_many
+    for expr, result in zip(exprs, calc_many(exprs, workers=4)):
+        ...
+"""
+import collections
+import itertools
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import parse
+
+def _calc_chunk(exprs, budget):
+    """
+    :param exprs: List of expressions
+    :param budget: budget.Budget or None
+    :return: List of results, with the exception in place of the result for failed expressions
+    """
+    results = []
+    for expr in exprs:
+        try:
+            results.append(parse.calc(expr, budget=budget))
+        except Exception as e:
+            results.append(e)
+    return results
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _submit(executor, chunk, budget):
+    """:return: Future of _calc_chunk(), failed with BrokenProcessPool if the executor is broken"""
+    try:
+        return executor.submit(_calc_chunk, chunk, budget)
+    except BrokenProcessPool as e: # Retried by _next_results() like chunks running when it broke
+        future = Future()
+        future.set_exception(e)
+        return future
+
+def _replace(executor, workers):
+    """:return: New ProcessPoolExecutor in place of a broken one"""
+    executor.shutdown(wait=False)
+    return ProcessPoolExecutor(workers)
+
+def _next_results(executor, workers, pending, budget):
+    """
+    Yield the results of the first pending chunk. If a worker process died (ie killed for
+    using too much memory) the executor is replaced and the chunk is retried one expression
+    at a time, so only the expressions that kill a worker get BrokenProcessPool as their result
+    :param executor: ProcessPoolExecutor the pending chunks were submitted to
+    :param workers: Number of processes for a new executor
+    :param pending: Deque of (chunk, future), chunks that didn't finish are resubmitted
+    :param budget: budget.Budget or None
+    :return: Executor to use from now on
+    """
+    chunk, future = pending.popleft()
+    try:
+        results = future.result()
+    except BrokenProcessPool:
+        executor = _replace(executor, workers)
+        results = []
+        for expr in chunk:
+            try:
+                results += executor.submit(_calc_chunk, [expr], budget).result()
+            except BrokenProcessPool as e:
+                results.append(e)
+                executor = _replace(executor, workers)
+        for i, (other, future) in enumerate(pending):
+            if not (future.done() and future.exception() is None): # Failed with the old executor
+                pending[i] = (other, _submit(executor, other, budget))
+    yield from results
+    return executor
+
+def calc_many(expressions, workers = None, chunksize = 256, budget = parse._MISSING, max_pending = None):
+    """
+    Calculate expressions in worker processes. Results are yielded lazily in input order and
+    only a bounded number of chunks are in flight, so iterables of any length can be used.
+    Exceptions raised by an expression are yielded in place of its result, expressions that
+    kill a worker process give BrokenProcessPool and the other expressions are still evaluated
+
+    :param expressions: Iterable of expression strings
+    :param workers: Number of processes, defaults to os.cpu_count(). 1 evaluates in this process
+    :param chunksize: Expressions sent to a worker at a time
+    :param budget: budget.Budget, None for no limits. Defaults to parse.get_budget()
+    :param max_pending: Max chunks in flight, defaults to 2 per worker
+    :return: Generator of results
+    """
+    if budget is parse._MISSING:
+        budget = parse.get_budget()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in _chunks(expressions, chunksize):
+            yield from _calc_chunk(chunk, budget)
+        return
+
+    max_pending = max_pending or 2 * workers
+    pending = collections.deque() # (chunk, future)
+    executor = ProcessPoolExecutor(workers)
+    try:
+        for chunk in _chunks(expressions, chunksize):
+            if len(pending) >= max_pending:
+                executor = yield from _next_results(executor, workers, pending, budget)
+            pending.append((chunk, _submit(executor, chunk, budget)))
+        while pending:
+            executor = yield from _next_results(executor, workers, pending, budget)
+    finally: # Also when the generator is closed early
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown()
@@ -0,0 +1,380 @@
+"""
+Compile RPN programs to Python functions. The program is turned into Python source with
+one statement per operation that uses the operators and maths.FUNCTIONS callables
+directly, so evaluating it doesn't go through parse.evaluate()'s stack loop
+
+    from calc.parse import compile
+    expr = compile("sqrt(x^2 + y^2)", native=True)
+    expr.evaluate(3, 4)
+
+Repeated pure subexpressions, ie the second sqrt(x^2 + y^2) in
+sqrt(x^2 + y^2) / (1 + sqrt(x^2 + y^2)), are only evaluated once: an operation whose
+source matches an earlier one reuses its result. Operands are already deduplicated names,
+so matching source is matching structure
+
+Chains of element wise operations on vectors, ie [a, b, c] * 2 + [d, e, f] * 3 - 1, are
+fused into one kernel that computes each item of the result in a single pass instead of
+building a Vector per operator. Kernels only run on list based Vectors of one length and
+numbers, anything else (ie ArrayVectors, which NumPy already handles, or an error) runs
+the unfused operations so results and errors are the same. A kernel runs its operations
+where the last one was, so operations that are evaluated in between and could raise (ie
+[x, 1] / y + x // y, where x // y would raise first) end the chain to keep the order errors
+are raised in
+
+Programs that can't be turned into equivalent source (ie wrong argument counts, which
+parse.evaluate() reports when evaluated) are run with parse.evaluate() instead
+"""
+import builtins
+import itertools
+import math
+import numbers
+
+from . import lexer
+from . import maths
+from . import matrix
+from . import nputil
+from . import parse
+from . import vector
+
+# Python operators for maths.BIN_OPS, same results as the lambdas there
+_OPERATORS = {"**": "**", "^": "**", "//": "//", "/": "/", "*": "*", "+": "+", "-": "-", "%": "%"}
+
+_START = object()
+
+# Max nesting of operations in one fused kernel, deeper chains are split into several
+# kernels so the item expression stays within the Python parser's nesting limit
+_MAX_KERNEL_DEPTH = 32
+
+class _CannotGenerate(Exception):
+    """The program can't be turned into source that behaves the same"""
+    pass
+
+def _literal(value):
+    """
+    :return: Python literal for value, or None if it has to be bound as a global instead
+    """
+    if type(value) is int and abs(value) < 1 << 64:
+        s = repr(value)
+    elif type(value) is float and math.isfinite(value):
+        s = repr(value)
+    else:
+        return None
+    return f"({s})" if s.startswith("-") else s # -2 ** x is -(2 ** x)
+
+def _is_name(operand):
+    return operand[0].isalpha() or operand[0] == "_"
+
+def _fusable(operands):
+    """
+    :param operands: Values of a kernel's operands
+    :return: Whether the kernel can run: at least one list based Vector, all of the same
+        length and small enough to stay list based, and numbers
+    """
+    n = None
+    for x in operands:
+        if type(x) is vector.Vector:
+            if n is None:
+                n = len(x.items)
+            elif len(x.items) != n:
+                return False
+        elif isinstance(x, vector.Vector) or not isinstance(x, numbers.Number):
+            return False
+    # Unfused results this long would be ArrayVectors, which have NumPy semantics
+    return n is not None and (n < vector.ARRAY_THRESHOLD or nputil.numpy() is None)
+
+def _items(x):
+    """:return: Iterable of x's items for a kernel, repeating numbers"""
+    return x.items if type(x) is vector.Vector else itertools.repeat(x)
+
+class _Builder(object):
+    """Source lines and the globals they use, operands are Python expressions (str)"""
+
+    def __init__(self, cse = True, fuse = True):
+        """
+        :param cse: Reuse the results of repeated pure operations
+        :param fuse: Fuse element wise operations on vectors into kernels
+        """
+        self.lines = [] # [local name, expression]
+        self.namespace = {"_literal": matrix.literal, "_from_list": vector._from_list,
+            "_fusable": _fusable, "_items": _items}
+        self.deduplicated = 0 # Operations replaced by an earlier result
+        self.fused = 0 # Operations merged into kernels
+        self._cse = cse
+        self._fuse = fuse
+        self._pure = {} # Source of a pure operation: local name of its result
+        self._variables = {} # Slot: local name
+        self._bound = {} # id(value): global name
+        self._constants = 0
+
+        # For fusing: local name of each element wise operation: (format string for one
+        # item, operands), the operands known to be vectors and how often each is used
+        self._element_wise = {}
+        self._vectors = set()
+        self._uses = {}
+        self._user = {} # Local name: operation that last used it
+        self._safe = set() # Local names of operations that can't raise
+        self._index = {} # Local name: index in lines, set when fusing
+
+    def bind(self, value, name = None):
+        """
+        :param name: Global name to use, defaults to a numbered one
+        :return: Global name holding value
+        """
+        if id(value) not in self._bound:
+            if name is None:
+                name = f"_k{self._constants}"
+                self._constants += 1
+            self.namespace[name] = value
+            self._bound[id(value)] = name
+        return self._bound[id(value)]
+
+    def constant(self, value):
+        literal = _literal(value)
+        if literal is not None:
+            return literal
+        name = self.bind(value)
+        if isinstance(value, (vector.Vector, matrix.Matrix)):
+            # Copied on every call, see lexer.ValueToken.eval()
+            copy = self.emit(f"{name}.copy()", [name], is_vector=isinstance(value, vector.Vector))
+            self._safe.add(copy)
+            return copy
+        return name
+
+    def variable(self, slot):
+        if slot not in self._variables:
+            self._variables[slot] = f"x{slot}"
+        return self._variables[slot]
+
+    def emit(self, expr, args = (), pure = True, is_vector = False):
+        """
+        :param expr: Python expression
+        :param args: Operands used by expr
+        :param pure: Whether evaluating expr again would give the same result
+        :param is_vector: Whether the result is always a Vector
+        :return: Local name its value is assigned to
+        """
+        if pure and self._cse:
+            if expr in self._pure:
+                self.deduplicated += 1
+                return self._pure[expr]
+        name = f"t{len(self.lines)}"
+        self.lines.append([name, expr])
+        if pure:
+            self._pure[expr] = name
+        if is_vector:
+            self._vectors.add(name)
+        for arg in args:
+            self._uses[arg] = self._uses.get(arg, 0) + 1
+            self._user[arg] = name
+        return name
+
+    def element_wise(self, expr, item, args):
+        """
+        Emit an operation that is applied to each item of vector operands
+        :param expr: Python expression
+        :param item: Format string giving one item of the result from items of args
+        :param args: Operands
+        :return: Local name its value is assigned to
+        """
+        is_vector = any(arg in self._vectors for arg in args)
+        name = self.emit(expr, args, is_vector=is_vector)
+        if is_vector and name == self.lines[-1][0]:
+            self._element_wise[name] = (item, args)
+        return name
+
+    def _kernel_nodes(self, name, nodes, operands, depth = 0):
+        """
+        Collect the operations fused into the kernel for name
+        :param nodes: Set of local names, filled in
+        :param operands: List of the kernel's operands, filled in
+        :return: (Expression for one item of name's result, index in lines of the first
+            operation fused into it)
+        """
+        item, args = self._element_wise[name]
+        parts = []
+        first = self._index[name]
+        # Later args first: an arg is only fused if nothing that could raise is evaluated
+        # between it and the operations already in the kernel
+        for arg in reversed(args):
+            if arg in self._element_wise and self._uses[arg] == 1 and self._user[arg] == name \
+                    and depth < _MAX_KERNEL_DEPTH and self._only_safe(self._index[arg] + 1, first):
+                part, first = self._kernel_nodes(arg, nodes, operands, depth + 1)
+                parts.append(part)
+            elif _is_name(arg):
+                if arg not in operands:
+                    operands.append(arg)
+                parts.append(f"e{operands.index(arg)}")
+            else: # Literal
+                parts.append(arg)
+        nodes.add(name)
+        return "(" + item.format(*reversed(parts)) + ")", first
+
+    def _only_safe(self, start, stop):
+        """:return: Whether none of lines[start:stop] can raise"""
+        return all(name in self._safe for name, _ in self.lines[start:stop])
+
+    def _fuse_kernels(self, result):
+        """
+        Replace chains of element wise operations with calls to kernels
+        :return: List of kernel function sources
+        """
+        self._uses[result] = self._uses.get(result, 0) + 1
+        self._index = {name: i for i, (name, _) in enumerate(self.lines)}
+
+        # Roots are found from the end, so each operation goes in the kernel of its last user
+        roots = {}
+        fused = set()
+        for name, _ in reversed(self.lines):
+            if name in self._element_wise and name not in fused:
+                nodes, operands = set(), []
+                item, _ = self._kernel_nodes(name, nodes, operands)
+                if len(nodes) >= 2:
+                    roots[name] = (item, nodes, operands)
+                    fused |= nodes
+
+        kernels = []
+        lines = []
+        for name, expr in self.lines:
+            if name not in fused:
+                lines.append([name, expr])
+            elif name in roots:
+                # The main function only calls the kernel, which runs the fused operations
+                # itself if it can't fuse. Their operands are all computed before the root
+                item, nodes, operands = roots[name]
+                unfused = [line for line in self.lines if line[0] in nodes]
+                kernel = f"_kernel{len(kernels)}"
+                params = ", ".join(operands)
+                if len(operands) == 1:
+                    loop = f"for e0 in _items({params})"
+                else:
+                    items = ", ".join(f"e{i}" for i in range(len(operands)))
+                    loop = f"for {items} in zip({', '.join(f'_items({x})' for x in operands)})"
+                body = [
+                    f"if _fusable([{params}]):",
+                    "    try:",
+                    f"        return _from_list([{item} {loop}])",
+                    "    except Exception:",
+                    "        pass # Raise the same error as the unfused operations",
+                ] + [f"{n} = {e}" for n, e in unfused] + [f"return {name}"]
+                kernels.append(f"def {kernel}({params}):\n" + "".join(f"    {line}\n" for line in body))
+                lines.append([name, f"{kernel}({params})"])
+                self.fused += len(nodes)
+        self.lines = lines
+        return kernels
+
+    def source(self, result):
+        kernels = self._fuse_kernels(result) if self._fuse else []
+        head = [f"x{slot} = v[{slot}]" for slot in sorted(self._variables)]
+        body = head + [f"{name} = {expr}" for name, expr in self.lines] + [f"return {result}"]
+        return "".join(kernels) + "def _evaluate(v):\n" + "".join(f"    {line}\n" for line in body)
+
+def _operation(builder, token, args):
+    """
+    :param args: Operands of the token's args
+    :return: Operand of the token's result
+    """
+    if isinstance(token, lexer.BinOpToken):
+        a, b = args
+        op = _OPERATORS.get(token.consumed)
+        if op is None:
+            return builder.emit(f"{builder.bind(maths.BIN_OPS[token.consumed])}({a}, {b})", args)
+        return builder.element_wise(f"{a} {op} {b}", f"{{}} {op} {{}}", args)
+    if isinstance(token, lexer.MinusOrPlusSignToken):
+        sign = 1 if token.consumed == "+" else -1
+        return builder.element_wise(f"{sign} * {args[0]}", f"{sign} * {{}}", args)
+    if isinstance(token, lexer.ConstantOrFunctionToken) and token.is_function:
+        function = maths.FUNCTIONS[token.consumed]
+        f = builder.bind(function, "_f_" + token.consumed)
+        call = f"{f}([{', '.join(args)}])"
+        if function.argc == 1 and function.pure and function.numeric and function.elementwise:
+            # Function.__call__ maps f.f over the items of a vector argument
+            item = f"{builder.bind(function.f, '_item_' + token.consumed)}([{{}}])"
+            return builder.element_wise(call, item, args)
+        return builder.emit(call, args, function.pure)
+    if isinstance(token, lexer.VectorToken):
+        # A Matrix if the items are vectors, kernels check their operands before running
+        return builder.emit(f"_literal([{', '.join(args)}])", args, is_vector=True)
+    if token.argc == 0: # Numbers, constants and folded values
+        try:
+            return builder.constant(token.eval([]))
+        except Exception:
+            raise _CannotGenerate() # Raise when evaluated instead
+    return builder.emit(f"{builder.bind(token)}.eval([{', '.join(args)}])", args, False)
+
+def _generate_source(program, builder):
+    """
+    Consumes arguments exactly like parse.evaluate() does
+    :param builder: _Builder to add the program to
+    :raises _CannotGenerate: If the program would not evaluate cleanly
+    :return: Result operand
+    """
+    stack = []
+    for token in program:
+        if isinstance(token, lexer.VariableToken):
+            stack.append(builder.variable(token.slot))
+            continue
+        if isinstance(token, lexer.StartToken):
+            stack.append(_START)
+            continue
+
+        n = token.argc
+        args = []
+        while ((n >= 0 and len(args) < n) or n == -1) and len(stack) and stack[-1] is not _START:
+            args.append(stack.pop())
+        if len(args) != n and n >= 0:
+            raise _CannotGenerate()
+        if parse._token_owns_start(token) and n != 0 and len(stack) and stack[-1] is _START:
+            stack.pop()
+        args.reverse()
+        stack.append(_operation(builder, token, args))
+
+    if len(stack) != 1 or stack[0] is _START:
+        raise _CannotGenerate()
+    return stack[0]
+
+class GeneratedProgram(object):
+    def __init__(self, program, cse = True, fuse = True):
+        """
+        Use generate() instead of constructing this directly
+        :param program: RPN program from shunting_yard()
+        :param cse: Evaluate repeated pure subexpressions once
+        :param fuse: Fuse element wise vector operations into kernels
+        """
+        self.program = tuple(program)
+        self.deduplicated = 0 # Operations removed by common subexpression elimination
+        self.fused = 0 # Operations merged into element wise kernels
+        builder = _Builder(cse, fuse)
+        try:
+            result = _generate_source(self.program, builder)
+        except _CannotGenerate:
+            self.source = None
+            self.function = lambda variables: parse.evaluate(self.program, variables)
+        else:
+            self.source = builder.source(result)
+            self.deduplicated = builder.deduplicated
+            self.fused = builder.fused
+            namespace = builder.namespace
+            exec(builtins.compile(self.source, "<calc codegen>", "exec"), namespace)
+            self.function = namespace["_evaluate"]
+
+    @property
+    def native(self):
+        """False if the program is run with parse.evaluate() instead of generated code"""
+        return self.source is not None
+
+    def __call__(self, variables = ()):
+        """
+        :param variables: Variable values, indexed by VariableToken.slot
+        :return: Result of the program
+        """
+        return self.function(variables)
+
+def generate(program, cse = True, fuse = True):
+    """
+    :param program: RPN program from shunting_yard(), ideally constant folded
+    :param cse: Evaluate repeated pure subexpressions once, impure functions like rand()
+        are always called every time they appear
+    :param fuse: Fuse chains of element wise vector operations into single pass kernels
+    :return: GeneratedProgram, a callable taking the variable values like parse.evaluate()
+    """
+    return GeneratedProgram(program, cse, fuse)
@@ -1,13 +1,73 @@
+import itertools
 import numbers
 import math
+import time
+from . import matrix
+from . import metrics
 from . import vector
 
 FORMAT_STR = "{:.15g}"
 IS_ZERO_PREC = 1e-15
+ELLIPSIS = "…"
 
-def format_number(result) -> str:
+# Items formatted per piece by iter_format() when there are no limits
+_CHUNK_SIZE = 1024
+
+# Ints with more digits than this are shown in scientific notation unless exact output is
+# asked for, converting them to decimal takes quadratic time (and str() refuses by default)
+MAX_EXACT_DIGITS = 4300
+
+_LOG10_2 = 0.30102999566398120
+_LOG2_10 = 3.3219280948873623
+_PIECE_BITS = 8192 # Ints converted with str() by _exact_str(), about 2466 digits
+
+def _has_more_digits(n, digits):
+    """:return: Whether abs(n) has more than digits decimal digits, without converting it"""
+    n = abs(n)
+    bits = n.bit_length()
+    if bits < digits * _LOG2_10 - 1: # n < 2^bits <= 10^digits
+        return False
+    if bits > digits * _LOG2_10 + 2: # n >= 2^(bits - 1) > 10^digits
+        return True
+    return n >= 10 ** digits
+
+def _scientific(n):
+    """
+    :param n: Int with more than 17 digits
+    :return: n rounded to 15 significant digits in scientific notation like FORMAT_STR,
+        ie 9.99002093014385e+30102. Only the leading digits are computed, which costs
+        a division by a power of 10 instead of a full decimal conversion
+    """
+    from decimal import Decimal
+
+    sign = 1 if n < 0 else 0
+    n = abs(n)
+    k = max(int((n.bit_length() - 1) * _LOG10_2) - 17, 0) # Keeps at least 18 digits
+    q, r = divmod(n >> k, 5 ** k) # n // 10^k
+    sticky = r or n & ((1 << k) - 1) # Whether any digit after q is not 0, for rounding
+    leading = q * 10 + (1 if sticky else 0)
+    mantissa, exponent = FORMAT_STR.format(Decimal((sign, tuple(map(int, str(leading))), k - 1))).split("e")
+    if "." in mantissa: # Decimal keeps trailing 0s, floats don't
+        mantissa = mantissa.rstrip("0").rstrip(".")
+    return f"{mantissa}e{exponent}"
+
+def _exact_str(n, width = 0):
+    """
+    :param n: Non negative int
+    :param width: Min number of digits, padded with 0s
+    :return: str(n) for any size of int, split into pieces str() accepts
+    """
+    if n.bit_length() <= _PIECE_BITS:
+        return str(n).zfill(width)
+    k = int(n.bit_length() * _LOG10_2) // 2
+    high, low = divmod(n, 10 ** k)
+    return _exact_str(high, width - k) + _exact_str(low, k)
+
+def format_number(result, exact_ints = False) -> str:
     """
     :param result: A numeric type to be formatted
+    :param exact_ints: Show every digit of ints with more than MAX_EXACT_DIGITS digits
+        instead of scientific notation
     :return: string result
     """
     if isinstance(result, complex):
@@ -20,22 +80,137 @@ def format_number(result) -> str:
                 .replace("1j", "j") \
                 .replace("-1j", "-j")
 
-    if isinstance(result, int): # Ints don't get rounded
-        return str(result)
+    if isinstance(result, int): # Ints don't get rounded unless they are huge
+        if result.bit_length() < MAX_EXACT_DIGITS * 3 or not _has_more_digits(result, MAX_EXACT_DIGITS):
+            return str(result)
+        if exact_ints:
+            return "-" * (result < 0) + _exact_str(abs(result))
+        return _scientific(result)
 
     if abs(result) < IS_ZERO_PREC:
         result = 0
     return FORMAT_STR.format(result)
 
-def format(result, include_mc_calc = False) -> str:
+def format(result, include_mc_calc = False, max_length = None, max_items = None, exact_ints = False) -> str:
     """
     :param result: Result from calc(), either numeric or a vector
     :param include_mc_calc: Whether to interpret results in stacks of 64 for Minecraft
+    :param max_length: Max length of a formatted vector or matrix, None for no limit. Items
+        (matrix rows) that don't fit are left out and counted instead, ie [1, 2, 3, … 999997 more].
+        The count is left out if it doesn't fit either ("[…]"), below 3 characters only "…" is shown
+    :param max_items: Max vector items or matrix rows to format, None for no limit
+    :param exact_ints: Show every digit of ints with more than MAX_EXACT_DIGITS digits,
+        by default they are rounded to scientific notation (which is much faster)
     :return: Formatted string
     """
-    if isinstance(result, vector.Vector):
-        contents = ", ".join([format_number(i) for i in result.items])
-        return f"[{contents}]"
+    return _timed(lambda: "".join(iter_format(result, include_mc_calc, max_length, max_items, exact_ints)))
+
+def write(result, out, include_mc_calc = False, max_length = None, max_items = None, exact_ints = False):
+    """
+    Write a formatted result to a file-like object as it is formatted, without building
+    the whole string, see format()
+    :param out: Object with a write(str) method, ie sys.stdout
+    :return: Number of characters written
+    """
+    def _write():
+        written = 0
+        for piece in iter_format(result, include_mc_calc, max_length, max_items, exact_ints):
+            out.write(piece)
+            written += len(piece)
+        return written
+    return _timed(_write)
+
+def _timed(f):
+    """:return: f(), recorded as the format phase if metrics are enabled"""
+    if metrics.enabled:
+        start = time.perf_counter()
+        try:
+            return f()
+        except Exception as e:
+            metrics.record_error(e)
+            raise
+        finally:
+            metrics.record_phase("format", time.perf_counter() - start)
+    return f()
+
+def _elided(remaining, first, room = None):
+    """
+    :param room: Characters left for the end, None for no limit
+    :return: End of a vector with remaining items left out, without the count if it doesn't fit
+    """
+    separator = "" if first else ", "
+    end = f"{separator}{ELLIPSIS} {remaining} more]"
+    if room is not None and len(end) > room:
+        end = f"{separator}{ELLIPSIS}]"
+    return end
+
+def iter_format(result, include_mc_calc = False, max_length = None, max_items = None, exact_ints = False):
+    """
+    Format a result in pieces, see format(). Vector items (matrix rows) are only formatted
+    once they are needed, so formatting stops as soon as max_length or max_items is reached
+    :return: Generator of strings that join to the formatted result
+    """
+    if isinstance(result, matrix.Matrix):
+        items = result.rows
+        def format_item(row):
+            return "[" + ", ".join([format_number(x, exact_ints) for x in row]) + "]"
+    elif isinstance(result, vector.Vector):
+        items = result
+        def format_item(x):
+            return format_number(x, exact_ints)
+    else:
+        yield _format(result, include_mc_calc, exact_ints)
+        return
+
+    if max_length is None and max_items is None:
+        items = iter(items)
+        yield "["
+        chunk = [format_item(i) for i in itertools.islice(items, _CHUNK_SIZE)]
+        yield ", ".join(chunk)
+        while len(chunk) == _CHUNK_SIZE:
+            chunk = [format_item(i) for i in itertools.islice(items, _CHUNK_SIZE)]
+            if chunk:
+                yield ", " + ", ".join(chunk)
+        yield "]"
+        return
+
+    n = len(result)
+    if max_length is not None and max_length < 3: # No room for "[…]"
+        yield ELLIPSIS[:max_length]
+        return
+    length = 1
+    items = iter(items)
+    yield "["
+    for k, item in enumerate(items):
+        if max_items is not None and k >= max_items:
+            yield _elided(n - k, k == 0, None if max_length is None else max_length - length)
+            return
+        piece = format_item(item)
+        piece = piece if k == 0 else ", " + piece
+        # The marker for the items after this one (or the closing bracket) must still fit
+        end = 1 if k == n - 1 else len(_elided(n - k - 1, False))
+        if max_length is not None and length + len(piece) + end > max_length:
+            # The last few items may fit without a marker, formatting them stops
+            # after max_length characters
+            tail, tail_length = [piece], len(piece)
+            if max_items is None or n <= max_items:
+                for item in items:
+                    if length + tail_length + 1 > max_length:
+                        break
+                    tail.append(", " + format_item(item))
+                    tail_length += len(tail[-1])
+            if len(tail) == n - k and length + tail_length + 1 <= max_length:
+                yield from tail
+                break
+            yield _elided(n - k, k == 0, max_length - length)
+            return
+        length += len(piece)
+        yield piece
+    yield "]"
+
+def _format(result, include_mc_calc, exact_ints = False):
+    if isinstance(result, (vector.Vector, matrix.Matrix)):
+        return "".join(iter_format(result, exact_ints=exact_ints))
     elif isinstance(result, numbers.Number):
         mc_str = ""
 
@@ -54,5 +229,5 @@ def format(result, include_mc_calc = False) -> str:
                 stacks_left_over = "" if stacks_left_over == 0 else f"{stacks_left_over}s"
                 mc_str = f" ({stacks}s{items} / {shulkers}sh {stacks_left_over}{items})".replace(" )", ")")
 
-        return format_number(result) + mc_str
+        return format_number(result, exact_ints) + mc_str
     return str(result)
@@ -1,92 +1,241 @@
-import string
 from abc import abstractmethod
 
 from . import maths
+from . import matrix
 from . import vector
 
+# Same as string.whitespace, spelled out so string (and re) aren't imported
+_WHITESPACE = str.maketrans("", "", " \t\n\r\x0b\x0c")
+
+def strip_whitespace(s) -> str:
+    """
+    :param s: Expression string
+    :return: s with all whitespace removed, as seen by the tokenizer
+    """
+    return s.translate(_WHITESPACE)
+
 class Tokenizer(object):
-    def __init__(self, s):
+    def __init__(self, s, allow_variables = False):
         """
         :param string: String to tokenize
+        :param allow_variables: Tokenize unknown constants as variables instead of raising
         """
         # Remove all whitespace:
-        self.string = s.translate(str.maketrans("", "", string.whitespace))
+        self.string = strip_whitespace(s)
         self.tokens = []
         self.itr = 0
+        self.allow_variables = allow_variables
+        self.variables = {} # Variable name: slot, in order of first appearance
         self.buffer = {}
+        for matchType in MATCHABLE_TOKENS:
+            self.buffer[matchType.lkey] = 0
+            self.buffer[matchType.rkey] = 0
+
+        # Tracked as tokens are added so the scanners never have to search self.tokens
+        self._last_math = None # Last token that isn't a paren, bracket or START
+        self._open = [] # Types of the unclosed matchable tokens, innermost last
 
     def tokenize(self):
-        TOKENS = [ # Token scan() calls, in order of evaluation
-            CommaToken, ParenToken, VectorToken, ConstantOrFunctionToken,
-            MinusOrPlusSignToken, BinOpToken, AbstractNumberToken
-        ]
-        while self.itr < len(self.string):
-            found = False
-            for token in TOKENS:
-                token, i = token.scan(self)
-                if token:
-                    self.itr = i
-                    self.tokens.append(token)
-                    found = True
-                    break
-            if not found:
-                raise RuntimeError(f"Unknown input at char {self.itr}: '{self.string[self.itr]}'")
-            
-        # Magic hack to fix stuff like -3^2 = 9:
-        i = 0
-        while i < len(self.tokens) - 1:
-            token = self.tokens[i]
-            if isinstance(token, NumberToken) and token.consumed.startswith("-") and \
-                    isinstance(self.tokens[i + 1], BinOpToken) and self.tokens[i + 1].consumed in ["**", "^"]:
-                token.consumed = token.consumed[1:] # Remove the - in the number
-                self.tokens.insert(i, MinusOrPlusSignToken("-")) # Insert a - operator before
-            i += 1
-
-        for matchType in [ParenToken, VectorToken]:
-            if self.buffer[f"l{matchType.name}"] > self.buffer[f"r{matchType.name}"]:
+        """
+        Single pass tokenizer, dispatches on the current character to the only
+        token types that can start with it (see _DISPATCH)
+        """
+        s = self.string
+        n = len(s)
+        tokens = self.tokens
+        while self.itr < n:
+            c = s[self.itr]
+            scan = _DISPATCH.get(c)
+            if scan is None:
+                scan = Tokenizer._scan_identifier if c.isalpha() else Tokenizer._scan_number
+            token, i = scan(self, c)
+            if token is None:
+                raise RuntimeError(f"Unknown input at char {self.itr}: '{c}'")
+
+            # Magic hack to fix stuff like -3^2 = 9:
+            if isinstance(token, BinOpToken) and token.consumed in ["**", "^"] and \
+                    isinstance(tokens[-1], NumberToken) and tokens[-1].consumed.startswith("-"):
+                number = tokens[-1]
+                number.consumed = number.consumed[1:] # Remove the - in the number
+                tokens[-1] = MinusOrPlusSignToken("-") # Insert a - operator before
+                tokens.append(number)
+
+            self.itr = i
+            self._push(token)
+
+        self._check_balanced()
+
+    def _push(self, token):
+        """
+        Append a token and update the open brackets and last math token
+        :param token: Token to add
+        """
+        self.tokens.append(token)
+        if isinstance(token, MatchableToken):
+            if token.is_left:
+                self._open.append(type(token))
+            elif self._open:
+                self._open.pop()
+        if not isinstance(token, (AbstractDummyToken, MatchableToken)):
+            self._last_math = token
+
+    def _check_balanced(self):
+        for matchType in MATCHABLE_TOKENS:
+            if self.buffer[matchType.lkey] > self.buffer[matchType.rkey]:
                 err = f"Mismatched {matchType.name}: Missing closing '{matchType.right_sym}'"
                 raise RuntimeError(err)
 
-    def next_char(self, i) -> str:
+    def _scan_comma(self, c):
+        if self.in_index():
+            raise RuntimeError(f"Unexpected ',' in index at position {self.itr}")
+        return CommaToken(c), self.itr + 1
+
+    def _scan_colon(self, c):
+        if not self.in_index():
+            return None, self.itr
+        return ColonToken(c), self.itr + 1
+
+    def _scan_matchable(self, c):
+        matchType = self.matchable_type(c)
+        if c == matchType.left_sym:
+            self.buffer[matchType.lkey] += 1
+            # Cannot have right before a left, ie )( or )[
+            if self.tokens and isinstance(self.tokens[-1], MatchableToken) and not self.tokens[-1].is_left \
+                    and not matchType.postfix:
+                raise RuntimeError(f"Unexpected '{c}' at position {self.itr}")
+        else:
+            # Cannot have more right parens than left (running left to right)
+            if self.buffer[matchType.lkey] < self.buffer[matchType.rkey] + 1:
+                raise RuntimeError(f"Extraneous '{c}' at position {self.itr}")
+            self.buffer[matchType.rkey] += 1
+        return matchType(c), self.itr + 1
+
+    def _scan_identifier(self, c):
+        # Function names are alphanumeric, starting with alpha
+        # Constant names are alphanumeric, starting with alpha, and do not end with a (
+        s = self.string
+        j = _skip(s, self.itr + 1, _IDENT_CHARS)
+        is_function = j < len(s) and s[j] == "("
+        return self.identifier_token(s[self.itr:j], is_function), j
+
+    def _scan_operator(self, c):
+        s = self.string
+        i = self.itr
+
+        # +/- sign, ie the - in -(1+2): previous math token must be a binop or function
+        # (or nothing at all, or the start of an index) and next char cannot be a digit
+        if c in "+-":
+            ltoken = self._last_math
+            if (not self.tokens or isinstance(ltoken, BinOpToken) or
+                    (isinstance(ltoken, ConstantOrFunctionToken) and ltoken.is_function) or
+                    _starts_index_part(self.tokens[-1])) \
+                    and not (i + 1 < len(s) and s[i + 1].isdigit()):
+                return MinusOrPlusSignToken(c), i + 1
+
+        if self.tokens and _is_operand(self.tokens[-1]):
+            for op in _BIN_OPS_BY_FIRST_CHAR.get(c, ()):
+                if s.startswith(op, i):
+                    return BinOpToken(op), i + len(op)
+        return self._scan_number(c)
+
+    def _scan_number(self, c):
         """
-        Get the char in string at index i + 1
-        Returns 1 wide space string if out of bounds
-        :return: Next character or 1 wide space string
+        Regular (1, -1.5e-5, 2i), hex (0xBEEF) and bin (0b101) numbers, with an optional
+        leading + or -
         """
-        if i < 0 or i >= len(self.string) - 1:
-            return " "
-        return self.string[i + 1]
-
-    def last_non_dummy_token(self):
+        # Cannot have 2 number tokens in a row, ie 0b02 is not 0b0 and 2
+        if self.tokens and isinstance(self.tokens[-1], AbstractNumberToken):
+            return None, self.itr
+        if not (c.isdigit() or c in "+-"): # Numbers can start with +- or a digit
+            return None, self.itr
+
+        s = self.string
+        n = len(s)
+        start = self.itr
+        i = start + 1 if c in "+-" else start
+
+        # Case: hex or bin number
+        for prefix, digits, numberType in _PREFIXED_NUMBERS:
+            if s.startswith(prefix, i):
+                end = _skip(s, i + 2, digits)
+                if end - 1 >= start + 2:
+                    return numberType(s[start:end]), end
+                return None, start
+
+        # Else: regular number. j is the index of the last consumed char
+        j = i
+        decimal_point = e_count = sign_count = False
+        while True:
+            j = _skip(s, j + 1, _DIGITS) - 1
+            if j + 1 >= n:
+                break
+            c = s[j + 1]
+            if c.isdigit():
+                pass
+            elif c in "+-" and e_count and not sign_count: # + or - allowed in exponent, ie 1e+2
+                sign_count = True
+            elif c == "e" and not e_count: # Only 1 "e" is allowed
+                e_count = True
+            elif c == "." and not decimal_point: # Only 1 decimal point is allowed
+                decimal_point = True
+            else:
+                break
+            j += 1
+        if j + 1 < n and s[j + 1] in "ij": # Imaginary
+            j += 1
+        if i != j or (i < n and s[i].isdigit()): # Single digit or non-zero length
+            return NumberToken(s[start:j + 1]), j + 1
+        return None, start
+
+    def matchable_type(self, c):
         """
-        :return: Last non-dummy token, or None if none are found
+        :param c: Paren or square bracket
+        :return: Matchable token type for c: IndexToken for a [ right after an operand (ie v[0])
+            and for the ] closing it, else the ParenToken or VectorToken
         """
-        for token in self.tokens[::-1]:
-            if not isinstance(token, AbstractDummyToken):
-                return token
-        return None
-    
-    def last_math_token(self):
+        if c == IndexToken.left_sym and self.tokens and _is_operand(self.tokens[-1]):
+            return IndexToken
+        if c == IndexToken.right_sym:
+            for matchType in reversed(self._open):
+                if matchType.left_sym == IndexToken.left_sym:
+                    return matchType
+        return _MATCHABLE_BY_SYM[c]
+
+    def in_index(self):
         """
-        :return: Last math token (excludes paren and syntax, includes operators and numbers),
-            or None if none are found
+        :return: Whether the innermost unclosed matchable token is an index, where : is
+            allowed and , is not
         """
-        for token in self.tokens[::-1]:
-            if not isinstance(token, AbstractDummyToken) and not isinstance(token, MatchableToken):
-                return token
-        return None
-
+        return bool(self._open) and self._open[-1] is IndexToken
 
+    def identifier_token(self, name, is_function):
+        """
+        :param name: Function, constant or variable name
+        :param is_function: Whether name is followed by a (
+        :return: VariableToken if name is not a known constant and variables are allowed,
+            else ConstantOrFunctionToken
+        """
+        if self.allow_variables and not is_function and name not in maths.CONSTANTS:
+            if name not in self.variables:
+                self.variables[name] = len(self.variables)
+            return VariableToken(name, self.variables[name])
+        return ConstantOrFunctionToken(name, is_function)
 
 class AbstractToken(object):
-    def __init__(self, consumed, argc = 0):
+    # Tokens are created for nearly every input char, so instances only store their
+    # contents. Per type metadata is kept on the class:
+    #   argc: Expected number of args for eval(), or -1 for unlimited
+    #   precedence: Shunting yard precedence, higher = first
+    __slots__ = ("consumed",)
+    argc = 0
+    precedence = 999999
+
+    def __init__(self, consumed):
         """
         :param consumed: Token contents, ie a num token might contain "1.5e-5" and a binop token
             might contain "+"
-        :param argc: Expected number of args for eval(), or -1 for unlimited
         """
         self.consumed = consumed
-        self.argc = argc
 
     @abstractmethod
     def eval(self, args):
@@ -96,157 +245,157 @@ class AbstractToken(object):
         """
         pass
 
-    @staticmethod
-    @abstractmethod
-    def scan(tokenizer):
-        """
-        Scan a string and consume greedily until you reach the next token type
-        Return the new token, or None if not applicable, and
-        start index of the next token (if new token is not None)
-        
-        For example, suppose this was a binary operator token, used like this: "A&&B" (Where &&
-        is the binary logical AND operator), and string="A&&B" and start_index=1, we would do:
-
-            self.consumed = "&&"
-            return 3
-        
-        Where 3 corresponds to the index of the "B" (start of the next token)
-
-        :param tokenizer: Class to tokenizer. tokenizer.itr will contain start
-            index (inclusive) of this token
-        :return: AbstractToken | None, next token index
-        """
-
     def __str__(self):
         return f" {self.consumed} "
 
 """A binary operator, ie '+'"""
 class BinOpToken(AbstractToken):
-    def __init__(self, consumed):
-        super().__init__(consumed, 2)
+    __slots__ = ()
+    argc = 2
+
+    @property
+    def precedence(self):
+        return maths.BIN_OPS_PRECEDENCE[self.consumed]
 
     def eval(self, args):
         a, b = args
         return maths.BIN_OPS[self.consumed](a, b)
 
-    @staticmethod
-    def scan(tokenizer):
-        binOpTokens = sorted(maths.BIN_OPS.keys(), key=lambda x: -len(x))
-
-        # A binOp token cannot be the first token and must be in a list of defined operators
-        # The previous token must be in this list: ), ], number, constant
-        def is_valid(token):
-            if token == None:
-                return False
-            is_constant = isinstance(token, ConstantOrFunctionToken) and not token.is_function
-            is_right_paren = isinstance(token, ParenToken) and not token.is_left
-            is_right_vector = isinstance(token, VectorToken) and not token.is_left
-            return isinstance(token, AbstractNumberToken) or is_right_paren or is_right_vector or is_constant
-
-        if is_valid(tokenizer.last_non_dummy_token()):
-            for op in binOpTokens:
-                if tokenizer.string[tokenizer.itr:tokenizer.itr + len(op)] == op:
-                    return BinOpToken(op), tokenizer.itr + len(op)
-        return None, tokenizer.itr
-
 """A comma"""
 class CommaToken(AbstractToken):
-    @staticmethod
-    def scan(tokenizer):
-        if tokenizer.string[tokenizer.itr] == ",":
-            return CommaToken(","), tokenizer.itr + 1
-        return None, tokenizer.itr
+    __slots__ = ()
+
+"""A colon between the parts of a slice, ie v[1:5]"""
+class ColonToken(AbstractToken):
+    __slots__ = ()
 
 class AbstractDummyToken(AbstractToken):
-    pass
+    __slots__ = ()
 
-"""A dummy start token for function and vector arguments. Added directly by the parser"""
+"""
+A dummy start token for function and vector arguments. Added directly by the parser,
+which shares the single START instance between all programs
+"""
 class StartToken(AbstractDummyToken):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("START")
 
     def eval(self, args):
         return self
 
+"""A precomputed value, ie a constant subexpression folded by optimize.fold_constants()"""
+class ValueToken(AbstractToken):
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    @property
+    def consumed(self):
+        # Only built when needed, str() of a huge int is slow or raises ValueError
+        if isinstance(self.value, int) and self.value.bit_length() > 4096:
+            return f"<{self.value.bit_length()} bit int>"
+        return str(self.value)
+
+    def eval(self, args):
+        # Vectors and matrices can be changed by whoever gets them, so each evaluation gets
+        # its own copy like it would if the value had not been folded
+        if isinstance(self.value, (vector.Vector, matrix.Matrix)):
+            return self.value.copy()
+        return self.value
+
 class MatchableToken(AbstractToken):
-    def __init__(self, consumed, left_sym, right_sym):
-        super().__init__(consumed, -1)
-        self.is_left = consumed == left_sym
-        self.is_right = consumed == right_sym
-        assert self.is_left != self.is_right
-        self.left_sym = left_sym
-        self.right_sym = right_sym
-
-    @staticmethod
-    def scan(tokenizer, type):
+    # Subclasses set these class attributes:
+    #   name: Unique key for symbol name, ie "paren"
+    #   lkey, rkey: Tokenizer.buffer keys for left and right counts, ie "lparen"
+    #   left_sym: Left symbol, ie '[' (len 1)
+    #   right_sym: Right symbol, ie ']' (len 1)
+    __slots__ = ("is_left",)
+    argc = -1
+    postfix = False # Opens right after an operand, ie the [ in v[0]
+
+    def __init__(self, consumed):
         """
-        A generic scan for paren like symbols
-        :param tokenizer: Tokenizer
-        :param type: Class to create, assumes constructor (consumed, is_left)
-            Must have a static name, left_sym and right_sym property
-                name: Unique key for symbol name, ie "paren"
-                left_sym: Left symbol, ie '[' (len 1)
-                right_sym: Right symbol, ie ']' (len 1)
-        :return: constructed token, next itr
+        :param consumed: type(self).left_sym or right_sym
         """
-        key, left_sym, right_sym = type.name, type.left_sym, type.right_sym
-        lkey = f"l{key}"
-        rkey = f"r{key}"
-
-        # Ensure buffer keys:
-        if not lkey in tokenizer.buffer.keys():
-            tokenizer.buffer[lkey] = 0
-        if not rkey in tokenizer.buffer.keys():
-            tokenizer.buffer[rkey] = 0
-
-        c = tokenizer.string[tokenizer.itr]
-        if c in [left_sym, right_sym]:
-            if c == left_sym:
-                tokenizer.buffer[lkey] += 1
-                # Cannot have right before a left, ie )( or )[    
-                if len(tokenizer.tokens) and isinstance(tokenizer.tokens[-1], MatchableToken) and \
-                        not tokenizer.tokens[-1].is_left:
-                    raise RuntimeError(f"Unexpected '{left_sym}' at position {tokenizer.itr}")
-            if c == right_sym:
-                # Cannot have more right parens than left (running left to right)
-                if tokenizer.buffer[lkey] < tokenizer.buffer[rkey] + 1:
-                    raise RuntimeError(f"Extraneous '{right_sym}' at position {tokenizer.itr}")
-                tokenizer.buffer[rkey] += 1
-
-            return type(c), tokenizer.itr + 1
-        return None, tokenizer.itr
+        super().__init__(consumed)
+        self.is_left = consumed == self.left_sym
+        assert self.is_left or consumed == self.right_sym
+
+    @property
+    def is_right(self):
+        return not self.is_left
 
 """A paren"""
 class ParenToken(MatchableToken):
+    __slots__ = ()
     left_sym = "("
     right_sym = ")"
     name = "paren"
-
-    def __init__(self, consumed):
-        super().__init__(consumed, "(", ")")
-
-    @staticmethod
-    def scan(tokenizer):
-        return MatchableToken.scan(tokenizer, ParenToken)
+    lkey = "lparen"
+    rkey = "rparen"
 
 """A vector (square brackets)"""
 class VectorToken(MatchableToken):
+    __slots__ = ()
     left_sym = "["
     right_sym = "]"
     name = "vector"
+    lkey = "lvector"
+    rkey = "rvector"
+
+    def eval(self, args):
+        return matrix.literal(args) # A Matrix if the items are vectors
+
+"""
+Square brackets right after an operand: an index (v[0]) or slice (v[1:5], v[::2]).
+The parser sets which slice parts are given, only those are args
+"""
+class IndexToken(MatchableToken):
+    __slots__ = ("parts", "argc")
+    left_sym = "["
+    right_sym = "]"
+    name = "index"
+    lkey = "lvector" # Counted with vectors, they share brackets
+    rkey = "rvector"
+    postfix = True
 
     def __init__(self, consumed):
-        super().__init__(consumed, "[", "]")
+        super().__init__(consumed)
+        self.parts = [] # Whether each of index / start, stop, step is given
+        self.argc = 2
 
-    def eval(self, args):
-        return vector.Vector(args)
+    @property
+    def is_slice(self):
+        return len(self.parts) > 1
 
-    @staticmethod
-    def scan(tokenizer):
-        return MatchableToken.scan(tokenizer, VectorToken)
+    def eval(self, args):
+        target = args[0]
+        if not isinstance(target, (vector.Vector, matrix.Matrix)):
+            raise RuntimeError(f"Cannot index '{type(target).__name__}', only vectors and matrices can be indexed")
+        values = iter(args[1:])
+        bounds = [next(values) if given else None for given in self.parts]
+        for bound in bounds:
+            if bound is not None and not isinstance(bound, int):
+                raise RuntimeError(f"Vector indices must be ints, got '{type(bound).__name__}'")
+
+        if not self.is_slice:
+            if not -len(target) <= bounds[0] < len(target):
+                kind = "matrix" if isinstance(target, matrix.Matrix) else "vector"
+                raise RuntimeError(f"Index {bounds[0]} out of range for {kind} of length {len(target)}")
+            return target[bounds[0]]
+        start, stop, step = bounds + [None] * (3 - len(bounds))
+        if step == 0:
+            raise RuntimeError("Slice step cannot be 0")
+        return target.slice(start, stop, step)
 
 """A constant or function"""
 class ConstantOrFunctionToken(AbstractToken):
+    # argc depends on the function so it is stored per instance
+    __slots__ = ("is_function", "argc")
+
     def __init__(self, consumed, is_function):
         argc = 0
         if is_function and consumed not in maths.FUNCTIONS.keys():
@@ -257,7 +406,8 @@ class ConstantOrFunctionToken(AbstractToken):
         if is_function:
             argc = maths.FUNCTIONS[consumed].argc
 
-        super().__init__(consumed, argc)
+        super().__init__(consumed)
+        self.argc = argc
         self.is_function = is_function
 
     def eval(self, args):
@@ -265,137 +415,49 @@ class ConstantOrFunctionToken(AbstractToken):
             return maths.CONSTANTS[self.consumed]
         return maths.FUNCTIONS[self.consumed](args)
 
-    @staticmethod
-    def scan(tokenizer):
-        c = tokenizer.string[tokenizer.itr]
+"""A variable, its value is looked up by slot when evaluated (see parse.evaluate)"""
+class VariableToken(ConstantOrFunctionToken):
+    __slots__ = ("slot",)
 
-        # Function names are alphanumeric, starting with alpha
-        # Constant names are alphanumeric, starting with alpha, and do not end with a (
-        if c.isalpha():
-            j = tokenizer.itr
-            while tokenizer.next_char(j) in string.ascii_letters + string.digits + "_":
-                j += 1
-            is_function = tokenizer.next_char(j) == "("
-            return ConstantOrFunctionToken(tokenizer.string[tokenizer.itr:j + 1], is_function), j + 1
-        return None, tokenizer.itr
+    def __init__(self, consumed, slot):
+        AbstractToken.__init__(self, consumed)
+        self.argc = 0
+        self.is_function = False
+        self.slot = slot
+
+    def eval(self, args):
+        raise RuntimeError(f"No value for variable '{self.consumed}'")
 
 """A +/- but not in front of a number (ie the - in -(1+2))"""
 class MinusOrPlusSignToken(AbstractToken):
-    def __init__(self, consumed):
-        super().__init__(consumed, 1)
+    __slots__ = ()
+    argc = 1
+    precedence = maths.BIN_OPS_PRECEDENCE["^"] - 0.01 # +/- above multiplication, but less than power
 
     def eval(self, args):
         return (1 if self.consumed == "+" else -1) * args[0]
 
-    @staticmethod
-    def scan(tokenizer):
-        c = tokenizer.string[tokenizer.itr]
-
-        # Conditions:
-        # - previous token (disregarding parens) must be a binop or func op
-        # - next token cannot be a digit
-        ltoken = tokenizer.last_math_token()
-        if c in "+-" and (
-                    len(tokenizer.tokens) == 0 or \
-                    isinstance(ltoken, BinOpToken) or \
-                    (isinstance(ltoken, ConstantOrFunctionToken) and ltoken.is_function)
-                ) \
-                and not tokenizer.next_char(tokenizer.itr).isdigit():
-            return MinusOrPlusSignToken(c), tokenizer.itr + 1
-        return None, tokenizer.itr
-    
 class AbstractNumberToken(AbstractToken):
-    @staticmethod
-    def scan(tokenizer):
-        c = tokenizer.string[tokenizer.itr]
-        i = tokenizer.itr
-        s = tokenizer.string
-
-        # Cannot have 2 number tokens in a row, ie 0b02 is not 0b0 and 2
-        if len(tokenizer.tokens) and isinstance(tokenizer.tokens[-1], AbstractNumberToken):
-            return None, tokenizer.itr
-
-        if c in "ij" and tokenizer.next_char(i) not in string.ascii_letters + string.digits:
-            return NumberToken("i"), tokenizer.itr + 1
-
-        if c.isdigit() or c in "+-": # Numbers can start with +- or a digit
-            if c in "+-":
-                i += 1
-
-            # Case: hex number
-            if s[i:i + 2] == "0x":
-                i += 1
-                while tokenizer.next_char(i) in string.hexdigits:
-                    i += 1
-                if i >= tokenizer.itr + 2:
-                    return HexNumberToken(s[tokenizer.itr:i + 1]), i + 1
-                return None, tokenizer.itr
-
-            # Case: bin number
-            if s[i:i + 2] == "0b":
-                i += 1
-                while tokenizer.next_char(i) in "01":
-                    i += 1
-                if i >= tokenizer.itr + 2:
-                    return BinNumberToken(s[tokenizer.itr:i + 1]), i + 1
-                return None, tokenizer.itr
-
-            # Else: regular number
-            counts = {
-                "decimal_point" : 0,
-                "e_count": 0,
-                "+-count": 0
-            }
-            j = i
-
-            def enforce_valid_number(j, counts):
-                c = tokenizer.next_char(j)
-
-                # + or - allowed in exponent, ie 1e+2 or 1e-2
-                if c in "+-" and counts["e_count"] > 0 and counts["+-count"] == 0:
-                    counts["+-count"] += 1
-                    return True
-
-                # Only 1 "e" is allowed
-                if c == "e" and counts["e_count"] == 0:
-                    counts["e_count"] += 1
-                    return True
-
-                # Only 1 decimal point is allowed before the e
-                if c == "." and counts["decimal_point"] == 0:
-                    counts["decimal_point"] += 1
-                    return True
-                return False
-
-            while tokenizer.next_char(j).isdigit() or enforce_valid_number(j, counts):
-                j += 1
-            if tokenizer.next_char(j) in "ij": # Imaginary
-                j += 1
-            if i != j or s[i].isdigit(): # Single digit or non-zero length
-                return NumberToken(s[tokenizer.itr:j + 1]), j + 1
-            return None, tokenizer.itr
-        return None, tokenizer.itr
+    __slots__ = ()
 
 """A number in this format: 0x[A-F0-9]+"""
 class HexNumberToken(AbstractNumberToken):
+    __slots__ = ()
+
     def eval(self, args):
         return int(self.consumed[2:], 16)
 
-    @staticmethod
-    def scan(tokenizer):
-        raise NotImplementedError("Call AbstractNumber.scan() instead")
-
 """A number in this format: 0b[01]+"""
 class BinNumberToken(AbstractNumberToken):
+    __slots__ = ()
+
     def eval(self, args):
         return int(self.consumed[2:], 2)
 
-    @staticmethod
-    def scan(tokenizer):
-        raise NotImplementedError("Call AbstractNumber.scan() instead")
-
 """A number, ie -1.5e-5"""
 class NumberToken(AbstractNumberToken):
+    __slots__ = ()
+
     def eval(self, args):
         if self.consumed.endswith("i") or self.consumed.endswith("j"):
             return complex(self.consumed.replace("i", "j"))
@@ -403,6 +465,65 @@ class NumberToken(AbstractNumberToken):
             return float(self.consumed)
         return int(self.consumed)
 
-    @staticmethod
-    def scan(tokenizer):
-        raise NotImplementedError("Call AbstractNumber.scan() instead")
+def _is_operand(token):
+    """
+    A binOp token cannot be the first token and must be in a list of defined operators
+    The previous token must be in this list: ), ], number, constant
+    """
+    if token == None:
+        return False
+    is_constant = isinstance(token, ConstantOrFunctionToken) and not token.is_function
+    is_right_paren = isinstance(token, ParenToken) and not token.is_left
+    is_right_vector = isinstance(token, (VectorToken, IndexToken)) and not token.is_left
+    return isinstance(token, AbstractNumberToken) or is_right_paren or is_right_vector or is_constant
+
+def _starts_index_part(token):
+    """:return: Whether token is the [ of an index or a : in one, which a sign can follow"""
+    return isinstance(token, ColonToken) or (isinstance(token, IndexToken) and token.is_left)
+
+
+# Shared by every program, START tokens carry no state
+START = StartToken()
+
+# Matchable token types, see Tokenizer._scan_matchable()
+MATCHABLE_TOKENS = [ParenToken, VectorToken]
+
+def _skip(s, i, chars):
+    """
+    :return: Index of the first char of s at or after i that is not in chars
+    """
+    n = len(s)
+    while i < n and s[i] in chars:
+        i += 1
+    return i
+
+_DIGITS = "0123456789"
+_HEX_DIGITS = _DIGITS + "abcdefABCDEF"
+_ALPHANUMERIC = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ" + _DIGITS
+_IDENT_CHARS = _ALPHANUMERIC + "_"
+_PREFIXED_NUMBERS = [ # Prefix, digits, token type
+    ("0x", _HEX_DIGITS, HexNumberToken),
+    ("0b", "01", BinNumberToken)
+]
+
+# Longest operators first so ie "**" is matched before "*"
+_BIN_OPS_BY_LENGTH = sorted(maths.BIN_OPS.keys(), key=lambda x: -len(x))
+_BIN_OPS_BY_FIRST_CHAR = {}
+for _op in _BIN_OPS_BY_LENGTH:
+    _BIN_OPS_BY_FIRST_CHAR.setdefault(_op[0], []).append(_op)
+
+_MATCHABLE_BY_SYM = {}
+for _type in MATCHABLE_TOKENS:
+    _MATCHABLE_BY_SYM[_type.left_sym] = _type
+    _MATCHABLE_BY_SYM[_type.right_sym] = _type
+
+# First character -> Tokenizer scan method. Letters not in the table are identifiers,
+# anything else is tried as a number
+_DISPATCH = {",": Tokenizer._scan_comma, ":": Tokenizer._scan_colon}
+for _c in _DIGITS:
+    _DISPATCH[_c] = Tokenizer._scan_number
+for _c in list(_BIN_OPS_BY_FIRST_CHAR) + ["+", "-"]:
+    if not _c.isalpha():
+        _DISPATCH[_c] = Tokenizer._scan_operator
+for _c in _MATCHABLE_BY_SYM:
+    _DISPATCH[_c] = Tokenizer._scan_matchable
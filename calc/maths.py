@@ -1,33 +1,44 @@
 import cmath
 import math
-from functools import reduce
-import operator
 import numbers
-import random
 
+from . import matrix
 from . import vector
 
 class Function(object):
-    def __init__(self, f, argc):
+    def __init__(self, f, argc, pure = True, numeric = True, elementwise = True):
         """
         :param f: Function to call, (a, b, c...) -> num or other
         :param argc: Number of arguments the function takes
+        :param pure: False if the result can differ for the same arguments (ie rand), these
+            are never evaluated ahead of time
+        :param numeric: False if numeric arguments can give a non-numeric result (ie c2v), these
+            are never fused into element wise kernels (see codegen.py)
+        :param elementwise: False if a 1 argument function takes vectors and matrices whole
+            (ie det) instead of being applied to every item
         """
         self.argc = argc
         self.f = f
+        self.pure = pure
+        self.numeric = numeric
+        self.elementwise = elementwise
 
     def __call__(self, args):
-        if len(args) == 1 and isinstance(args[0], vector.Vector):
+        if len(args) == 1 and isinstance(args[0], matrix.Matrix) and self.argc == 1 and self.elementwise:
+            return args[0].map(self)
+        if len(args) == 1 and isinstance(args[0], vector.Vector) and self.elementwise:
             # If there is only 1 vector argument, and the function takes
             # a single argument, the function is applied to every element
             # of the argument, ie sin([0, 1]) -> [sin(0), sin(1)]
             if self.argc == 1:
-                return vector.Vector([self.f([x]) for x in args[0]])
+                return args[0].map(self)
             
             # If there is only one vector argument, and the function is vararg, the vector
             # is taken to be the args to the function
             if self.argc == -1:
-                return self.f(args[0].items)
+                return args[0].reduce(self)
+        if len(args) == 1 and isinstance(args[0], matrix.Matrix) and self.argc == -1:
+            return args[0].reduce(self)
 
         return self.f(args)
 
@@ -43,6 +54,7 @@ def _angle3(args):
     return _angle([a - center, b - center])
 
 def _rand(args):
+    import random # Deferred, random is slow to import and rarely used
     if not all([isinstance(x, int) for x in args]):
         raise RuntimeError("Bounds for rand() must be int, use urand() for floats")
     if len(args) == 2:
@@ -54,6 +66,7 @@ def _rand(args):
     raise RuntimeError("Too many arguments, expected 0 to 2, got " + str(len(args)))
 
 def _urand(args):
+    import random
     if not all([isinstance(x, int) or isinstance(x, float) for x in args]):
         raise RuntimeError("Bounds for urand() must be int or float")
     if len(args) == 2:
@@ -91,6 +104,14 @@ def _v2c(args):
         return v[0]
     return complex(v[0], v[1])
 
+def _range(args):
+    from . import sequence # Not imported at the top since sequence.Sequence subclasses vector.Vector
+    return sequence.range_(args)
+
+def _linspace(args):
+    from . import sequence
+    return sequence.linspace(args)
+
 FUNCTIONS = {
     "sin": Function(lambda args: cmath.sin(args[0]), 1),
     "cos": Function(lambda args: cmath.cos(args[0]), 1),
@@ -125,7 +146,7 @@ FUNCTIONS = {
     "max": Function(lambda args: max(args), -1),
     "min": Function(lambda args: min(args), -1),
     "sum": Function(lambda args: sum(args), -1),
-    "prod": Function(lambda args: reduce(operator.mul, args, 1), -1),
+    "prod": Function(lambda args: math.prod(args), -1),
 
     # Vector functions
     "angle": Function(_angle, 2),
@@ -133,14 +154,25 @@ FUNCTIONS = {
     "sort": Function(lambda args: vector.Vector(sorted(args)), -1),
     "rsort": Function(lambda args: vector.Vector(sorted(args, reverse=True)), -1),
     "len": Function(lambda args: len(args), -1),
-    "c2v": Function(_c2v, 1),
+    "c2v": Function(_c2v, 1, numeric=False),
     "v2c": Function(_v2c, -1),
     "dot": Function(_dot, 2),
     "cross": Function(_cross, 2),
 
+    # Matrix functions
+    "matmul": Function(lambda args: matrix.matmul(args[0], args[1]), 2, numeric=False),
+    "transpose": Function(lambda args: matrix.transpose(args[0]), 1, numeric=False, elementwise=False),
+    "det": Function(lambda args: matrix.det(args[0]), 1, numeric=False, elementwise=False),
+    "inv": Function(lambda args: matrix.inv(args[0]), 1, numeric=False, elementwise=False),
+    "solve": Function(lambda args: matrix.solve(args[0], args[1]), 2, numeric=False),
+
+    # Lazy sequences
+    "range": Function(_range, -1, numeric=False),
+    "linspace": Function(_linspace, 3, numeric=False),
+
     # Rand
-    "rand": Function(_rand, -1),
-    "urand": Function(_urand, -1)
+    "rand": Function(_rand, -1, pure=False),
+    "urand": Function(_urand, -1, pure=False)
 }
 
 CONSTANTS = {
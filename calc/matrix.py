@@ -0,0 +1,442 @@
+"""
+Matrices, created by vector literals of vectors of one length (ie [[1, 2], [3, 4]]).
+Element wise operators work like they do for vectors, matmul(), transpose(), det(), inv()
+and solve() are in maths.FUNCTIONS
+
+Matrices with at least NUMPY_THRESHOLD rows or columns run in NumPy if it is installed.
+Smaller ones run in pure Python, where det() of an int matrix is exact (Bareiss)
+"""
+import numbers
+import operator
+
+from . import maths
+from . import nputil
+from . import vector
+
+# Matrices at least this large in either dimension use NumPy for matmul(), det(), inv()
+# and solve(), below it the NumPy call overhead is more than the Python loops
+NUMPY_THRESHOLD = 32
+
+class Matrix(object):
+    __slots__ = ("_rows", "_array")
+
+    def __init__(self, rows):
+        """
+        Construct a matrix
+        :param rows: Non empty list of rows, each a non empty list of numbers of the same length
+        """
+        if len(rows) == 0 or len(rows[0]) == 0:
+            raise RuntimeError("Number of rows and columns cannot be empty")
+        for row in rows:
+            if len(row) != len(rows[0]):
+                raise RuntimeError(f"Matrix rows must have the same length ({len(rows[0])} and {len(row)})")
+            if not all([isinstance(x, numbers.Number) for x in row]):
+                raise RuntimeError("Non-numeric type in matrix")
+        self._rows = rows
+        self._array = None
+
+    @property
+    def rows(self):
+        """Items as a list of rows, each a list of Python numbers"""
+        if self._rows is None:
+            self._rows = self._array.tolist()
+        return self._rows
+
+    @property
+    def shape(self):
+        """(rows, columns)"""
+        if self._rows is None:
+            return self._array.shape
+        return len(self._rows), len(self._rows[0])
+
+    @property
+    def size(self):
+        rows, columns = self.shape
+        return rows * columns
+
+    def array(self):
+        """
+        :return: 2D numeric NumPy array of the items (cached), or None if NumPy is not installed
+            or the items don't fit in an int64 / float64 / complex128
+        """
+        if self._array is None:
+            np = nputil.numpy()
+            if np is None:
+                return None
+            try:
+                array = np.asarray(self._rows)
+            except (ValueError, TypeError, OverflowError):
+                return None
+            if array.dtype.kind not in "biufc":
+                return None
+            self._array = array.astype(int) if array.dtype.kind == "b" else array
+        return self._array
+
+    @staticmethod
+    def _element_wise_op(a, b, sym, opname):
+        """
+        :param a: First parameter, a number or matrix
+        :param b: 2nd parameter, a number or matrix
+        :param sym: Operator in maths.BIN_OPS, ie '+'
+        :param opname: Operator name, ie 'addition'
+        :return: New matrix with result
+        """
+        if not all([isinstance(x, Matrix) or _is_number(x) for x in (a, b)]):
+            raise RuntimeError(f"Cannot perform {opname} between type '{type(a)}' and '{type(b)}'")
+        if isinstance(a, Matrix) and isinstance(b, Matrix) and a.shape != b.shape:
+            raise RuntimeError(f"Cannot perform {opname}: Matrix shapes differ ({_shape(a)} and {_shape(b)})")
+
+        if (a if isinstance(a, Matrix) else b).size >= vector.ARRAY_THRESHOLD:
+            x, y = _operand(a), _operand(b)
+            result = nputil.tables()[0][sym](x, y) if x is not None and y is not None else None
+            if result is not None:
+                return _from_array(result)
+
+        # Arithmetic on checked numbers gives numbers, so the results aren't checked again
+        op = maths.BIN_OPS[sym]
+        if not isinstance(a, Matrix): # num + mat
+            return _from_rows([[op(a, x) for x in row] for row in b.rows])
+        if not isinstance(b, Matrix): # mat + num
+            return _from_rows([[op(x, b) for x in row] for row in a.rows])
+        return _from_rows([[op(x, y) for x, y in zip(row_a, row_b)] for row_a, row_b in zip(a.rows, b.rows)])
+
+    def __str__(self):
+        rows = ", ".join(["[" + ", ".join([str(x) for x in row]) + "]" for row in self.rows])
+        return f"[{rows}]"
+    def __len__(self):
+        return self.shape[0]
+    def __reduce__(self): # Needed for pickle since the array is only a cache
+        return Matrix, (self.rows,)
+    def __add__(self, other):
+        return self._element_wise_op(self, other, '+', 'addition')
+    def __radd__(self, other):
+        return self._element_wise_op(other, self, '+', 'addition')
+    def __sub__(self, other):
+        return self._element_wise_op(self, other, '-', 'subtraction')
+    def __rsub__(self, other):
+        return self._element_wise_op(other, self, '-', 'subtraction')
+    def __mul__(self, other):
+        return self._element_wise_op(self, other, '*', 'multiplication')
+    def __rmul__(self, other):
+        return self._element_wise_op(other, self, '*', 'multiplication')
+    def __pow__(self, other):
+        return self._element_wise_op(self, other, '^', 'exponentiation')
+    def __rpow__(self, other):
+        return self._element_wise_op(other, self, '^', 'exponentiation')
+    def __truediv__(self, other):
+        return self._element_wise_op(self, other, '/', 'division')
+    def __rtruediv__(self, other):
+        return self._element_wise_op(other, self, '/', 'division')
+    def __floordiv__(self, other):
+        return self._element_wise_op(self, other, '//', 'integer division')
+    def __rfloordiv__(self, other):
+        return self._element_wise_op(other, self, '//', 'integer division')
+    def __mod__(self, other):
+        return self._element_wise_op(self, other, '%', 'modular division')
+    def __rmod__(self, other):
+        return self._element_wise_op(other, self, '%', 'modular division')
+    def __getitem__(self, key):
+        """:return: Row key as a Vector"""
+        return vector._from_list(self.rows[key])
+    def __iter__(self):
+        return map(vector._from_list, self.rows)
+
+    def copy(self):
+        """:return: Matrix with the same items that doesn't share storage with this one"""
+        if self._rows is None:
+            return _from_array(self._array.copy())
+        return _from_rows([list(row) for row in self._rows])
+
+    def slice(self, start, stop, step):
+        """
+        :return: Matrix of the rows in the slice, the rows themselves are not copied
+        """
+        rows = self.rows[start:stop:step]
+        if not rows:
+            raise RuntimeError("Slice of matrix is empty")
+        return _from_rows(rows)
+
+    def map(self, f):
+        """
+        :param f: maths.Function taking 1 argument
+        :return: Matrix of f applied to every item
+        """
+        return Matrix([[f.f([x]) for x in row] for row in self.rows])
+
+    def reduce(self, f):
+        """
+        :param f: maths.Function taking any number of arguments
+        :return: f called with the rows (as vectors) as its arguments, like a vector of vectors
+            and len(), ie sum() of the rows is a vector of column sums
+        """
+        return f.f(list(self))
+
+
+def _is_number(x):
+    return isinstance(x, numbers.Number) and not isinstance(x, vector.Vector)
+
+def _shape(m):
+    rows, columns = m.shape
+    return f"{rows}x{columns}"
+
+def _from_rows(rows):
+    """
+    Construct a Matrix without checking the items again
+    :param rows: Non empty list of non empty rows of numbers, all the same length
+    """
+    m = object.__new__(Matrix)
+    m._rows = rows
+    m._array = None
+    return m
+
+def _from_array(array):
+    """
+    :param array: NumPy array result
+    :return: Matrix for 2D, Vector for 1D or a number for 0D arrays
+    """
+    if array.ndim == 0:
+        return array.item()
+    if array.ndim == 1:
+        return vector._from_array(array)
+    if array.dtype == object: # ie big ints
+        return _from_rows(array.tolist())
+    m = object.__new__(Matrix)
+    m._rows = None
+    m._array = array
+    return m
+
+def _operand(x):
+    """:return: NumPy array for a matrix or number, else None"""
+    if isinstance(x, Matrix):
+        return x.array()
+    array = nputil.numpy().asarray(x)
+    return array.astype(int) if array.dtype.kind == "b" else array
+
+def literal(items):
+    """
+    Value of a vector literal
+    :param items: Evaluated items, ie [1, 2] or [[1, 2], [3, 4]]
+    :return: Matrix if every item is a vector, else a Vector
+    """
+    if items and all([isinstance(x, vector.Vector) for x in items]):
+        rows = [x.items for x in items]
+        for row in rows:
+            if len(row) != len(rows[0]):
+                raise RuntimeError(f"Matrix rows must have the same length ({len(rows[0])} and {len(row)})")
+        return _from_rows(rows)
+    return vector.Vector(items)
+
+def _use_numpy(*operands):
+    """
+    :param operands: Matrices and vectors
+    :return: Their NumPy arrays if any of them is large enough for NumPy to be faster and
+        all can be converted, else None
+    """
+    if nputil.numpy() is None:
+        return None
+    if max([max(x.shape) if isinstance(x, Matrix) else len(x) for x in operands]) < NUMPY_THRESHOLD:
+        return None
+    arrays = []
+    for x in operands:
+        if isinstance(x, Matrix):
+            arrays.append(x.array())
+        else:
+            arrays.append(x._array if isinstance(x, vector.ArrayVector) else vector._to_array(x.items))
+    return None if any([a is None for a in arrays]) else arrays
+
+def _check_args(name, args, types):
+    for arg in args:
+        if not isinstance(arg, types):
+            kinds = "Matrix" if types is Matrix else "Matrix or Vector"
+            raise RuntimeError(f"{name}() arguments must be {kinds}, got '{type(arg).__name__}'")
+
+def _check_square(name, m):
+    rows, columns = m.shape
+    if rows != columns:
+        raise RuntimeError(f"{name}() needs a square matrix, got {_shape(m)}")
+
+def _bound(array):
+    """:return: Largest absolute item of a NumPy array as a float"""
+    np = nputil.numpy()
+    return float(np.abs(array).max())
+
+def matmul(a, b):
+    """
+    Matrix product. A Vector on the left is a row, on the right a column
+    :param a: Matrix or Vector
+    :param b: Matrix or Vector
+    :return: Matrix, or Vector if either is a Vector, or a number if both are
+    """
+    _check_args("matmul", [a, b], (Matrix, vector.Vector))
+    rows_a = a.rows if isinstance(a, Matrix) else [a.items]
+    rows_b = b.rows if isinstance(b, Matrix) else [[x] for x in b.items]
+    if len(rows_a[0]) != len(rows_b):
+        raise RuntimeError(f"Cannot matmul: {len(rows_a[0])} columns and {len(rows_b)} rows differ")
+
+    arrays = _use_numpy(a, b)
+    if arrays is not None:
+        x, y = arrays
+        # Int results that could overflow int64 are left to Python ints
+        if not (nputil.is_int(x) and nputil.is_int(y)) or \
+                _bound(x) * _bound(y) * len(rows_b) < nputil.INT_SAFE_LIMIT:
+            return _from_array(nputil.numpy().matmul(x, y))
+
+    columns = list(zip(*rows_b))
+    out = [[sum(map(operator.mul, row, column)) for column in columns] for row in rows_a]
+    if isinstance(b, vector.Vector):
+        out = [row[0] for row in out]
+        return out[0] if isinstance(a, vector.Vector) else vector._from_list(out)
+    return vector._from_list(out[0]) if isinstance(a, vector.Vector) else _from_rows(out)
+
+def transpose(m):
+    """
+    :param m: Matrix, or a Vector which is taken as a row
+    :return: Transposed Matrix
+    """
+    _check_args("transpose", [m], (Matrix, vector.Vector))
+    if isinstance(m, vector.Vector):
+        return _from_rows([[x] for x in m.items])
+    if m._rows is None:
+        return _from_array(m._array.T) # NumPy view
+    return _from_rows([list(column) for column in zip(*m.rows)])
+
+def _linalg(f, *arrays):
+    """:return: f(*arrays) from numpy.linalg, raising RuntimeError if the matrix is singular"""
+    np = nputil.numpy()
+    try:
+        with np.errstate(all="ignore"): # ie det() overflowing to inf, like Python floats
+            return f(*arrays)
+    except np.linalg.LinAlgError:
+        raise RuntimeError("Matrix is singular")
+
+def _pivot(rows, k):
+    """
+    Swap the row with the largest item in column k (from row k down) into row k
+    :return: Whether rows were swapped, -1 if the column is all 0 (singular)
+    """
+    best = max(range(k, len(rows)), key=lambda i: abs(rows[i][k]))
+    if rows[best][k] == 0:
+        return -1
+    if best != k:
+        rows[k], rows[best] = rows[best], rows[k]
+        return True
+    return False
+
+def _det_bareiss(rows):
+    """Determinant of a square int matrix without fractions, so the result is exact"""
+    rows = [list(row) for row in rows]
+    n = len(rows)
+    sign = 1
+    previous = 1
+    for k in range(n - 1):
+        if rows[k][k] == 0: # Swap a row with a non 0 item up
+            swap = next((i for i in range(k + 1, n) if rows[i][k] != 0), None)
+            if swap is None:
+                return 0
+            rows[k], rows[swap] = rows[swap], rows[k]
+            sign = -sign
+        pivot = rows[k][k]
+        for i in range(k + 1, n):
+            row, factor = rows[i], rows[i][k]
+            for j in range(k + 1, n):
+                row[j] = (row[j] * pivot - rows[k][j] * factor) // previous
+        previous = pivot
+    return sign * rows[n - 1][n - 1]
+
+def det(m):
+    """
+    :param m: Square Matrix
+    :return: Determinant, exact for small int matrices
+    """
+    _check_args("det", [m], Matrix)
+    _check_square("det", m)
+    arrays = _use_numpy(m)
+    if arrays is not None:
+        return _linalg(nputil.numpy().linalg.det, arrays[0]).item()
+    if all([isinstance(x, int) for row in m.rows for x in row]):
+        return _det_bareiss(m.rows)
+
+    # Gaussian elimination with partial pivoting
+    rows = [list(row) for row in m.rows]
+    n = len(rows)
+    result = 1
+    for k in range(n):
+        swapped = _pivot(rows, k)
+        if swapped == -1:
+            return 0
+        if swapped:
+            result = -result
+        pivot = rows[k][k]
+        result *= pivot
+        for i in range(k + 1, n):
+            factor = rows[i][k] / pivot
+            if factor:
+                rows[i] = [x - factor * y for x, y in zip(rows[i], rows[k])]
+    return result
+
+def _gauss_jordan(rows, rhs):
+    """
+    Solve rows * x = rhs in place with Gauss-Jordan elimination and partial pivoting.
+    All int input is solved exactly with fractions, the results are ints or floats
+    :param rows: Square list of rows, copied by the caller
+    :param rhs: List of right hand side rows (as many as rows), copied by the caller
+    :return: x as a list of rows
+    """
+    n = len(rows)
+    exact = all([isinstance(x, int) for row in rows + rhs for x in row])
+    if exact:
+        from fractions import Fraction # Deferred, fractions is slow to import
+        rows[:] = [[Fraction(x) for x in row] for row in rows]
+        rhs[:] = [[Fraction(x) for x in row] for row in rhs]
+
+    for k in range(n):
+        best = max(range(k, n), key=lambda i: abs(rows[i][k]))
+        if rows[best][k] == 0:
+            raise RuntimeError("Matrix is singular")
+        rows[k], rows[best] = rows[best], rows[k]
+        rhs[k], rhs[best] = rhs[best], rhs[k]
+
+        pivot = rows[k][k]
+        rows[k] = [x / pivot for x in rows[k]]
+        rhs[k] = [x / pivot for x in rhs[k]]
+        for i in range(n):
+            factor = rows[i][k]
+            if i != k and factor:
+                rows[i] = [x - factor * y for x, y in zip(rows[i], rows[k])]
+                rhs[i] = [x - factor * y for x, y in zip(rhs[i], rhs[k])]
+    if exact:
+        return [[int(x) if x.denominator == 1 else float(x) for x in row] for row in rhs]
+    return rhs
+
+def inv(m):
+    """
+    :param m: Square Matrix
+    :return: Inverse Matrix
+    """
+    _check_args("inv", [m], Matrix)
+    _check_square("inv", m)
+    arrays = _use_numpy(m)
+    if arrays is not None:
+        return _from_array(_linalg(nputil.numpy().linalg.inv, arrays[0]))
+    n = len(m)
+    identity = [[1 if i == j else 0 for j in range(n)] for i in range(n)]
+    return _from_rows(_gauss_jordan([list(row) for row in m.rows], identity))
+
+def solve(a, b):
+    """
+    :param a: Square Matrix
+    :param b: Vector or Matrix with as many items / rows as a has rows
+    :return: x where matmul(a, x) = b, a Vector or Matrix like b
+    """
+    _check_args("solve", [a], Matrix)
+    _check_args("solve", [b], (Matrix, vector.Vector))
+    _check_square("solve", a)
+    if len(b) != len(a):
+        raise RuntimeError(f"Cannot solve: {len(a)} rows and {len(b)} values differ")
+
+    arrays = _use_numpy(a, b)
+    if arrays is not None:
+        return _from_array(_linalg(nputil.numpy().linalg.solve, *arrays))
+    rhs = [list(row) for row in b.rows] if isinstance(b, Matrix) else [[x] for x in b.items]
+    x = _gauss_jordan([list(row) for row in a.rows], rhs)
+    return _from_rows(x) if isinstance(b, Matrix) else vector._from_list([row[0] for row in x])
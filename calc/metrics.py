@@ -0,0 +1,212 @@
+"""
+Opt-in runtime metrics for calc() and format(): phase latency histograms, token count
+and result vector length distributions, error counts and how often each function
+appears in the programs of calculated expressions
+
+    from calc import metrics
+    metrics.enable()
+    ...
+    print(metrics.export_prometheus())
+
+When disabled (the default) calc() and format() only check metrics.enabled
+"""
+import threading
+
+from . import lexer
+
+enabled = False
+
+PHASES = ["tokenize", "parse", "evaluate", "format"]
+LATENCY_BUCKETS = [1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 10]
+SIZE_BUCKETS = [2 ** k for k in range(0, 21, 2)] # 1, 4, 16 ... ~1M
+
+# Distinct error message classes kept, further ones are counted as "other"
+MAX_ERROR_CLASSES = 100
+
+_lock = threading.Lock()
+
+class Histogram(object):
+    def __init__(self, buckets):
+        """
+        :param buckets: Sorted upper bounds, a +Inf bucket is added
+        """
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # Not cumulative, last is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self):
+        h = Histogram(self.buckets)
+        h.counts = list(self.counts)
+        h.sum = self.sum
+        h.count = self.count
+        return h
+
+class _Metrics(object):
+    def __init__(self):
+        self.phases = {phase: Histogram(LATENCY_BUCKETS) for phase in PHASES}
+        self.tokens = Histogram(SIZE_BUCKETS)
+        self.vector_lengths = Histogram(SIZE_BUCKETS)
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = {} # (exception type, message class): count
+        self.function_occurrences = {} # Function name: occurrences in calculated programs
+
+_metrics = _Metrics()
+
+def enable():
+    """Start recording metrics"""
+    global enabled
+    enabled = True
+
+def disable():
+    """Stop recording metrics, recorded values are kept"""
+    global enabled
+    enabled = False
+
+def reset():
+    """Clear all recorded metrics"""
+    global _metrics
+    with _lock:
+        _metrics = _Metrics()
+
+_patterns = None
+
+def _compiled():
+    """
+    :return: (quoted, number) patterns, compiled on first use so importing calc doesn't import re
+    """
+    global _patterns
+    if _patterns is None:
+        import re
+        _patterns = (re.compile(r"'[^']*'"), re.compile(r"\d+(\.\d+)?(e[+-]?\d+)?"))
+    return _patterns
+
+def error_class(e):
+    """
+    :param e: Exception
+    :return: Its message with quoted names and numbers replaced, so ie "Unknown function 'foo'"
+        and "Unknown function 'bar'" are counted together
+    """
+    quoted, number = _compiled()
+    return number.sub("N", quoted.sub("'?'", str(e)))
+
+def function_names(program):
+    """
+    :param program: Constant folded program from parse._get_program()
+    :return: Names of the functions it calls, once per function token. Calls folded into
+        constants are not in the program, and functions of vectors are called per item
+        but counted once
+    """
+    return [token.consumed for token in program
+        if isinstance(token, lexer.ConstantOrFunctionToken) and token.is_function]
+
+def record_phase(phase, seconds):
+    with _lock:
+        _metrics.phases[phase].observe(seconds)
+
+def record_calc(cache_hit, tokens):
+    """
+    :param cache_hit: Whether calc() found the program in the cache
+    :param tokens: Token count, None if not tokenized (cache hit)
+    """
+    with _lock:
+        _metrics.calls += 1
+        if cache_hit:
+            _metrics.cache_hits += 1
+        if tokens is not None:
+            _metrics.tokens.observe(tokens)
+
+def record_function_occurrences(names):
+    """
+    :param names: Names of the functions in one calc() program, see function_names()
+    """
+    with _lock:
+        for name in names:
+            _metrics.function_occurrences[name] = _metrics.function_occurrences.get(name, 0) + 1
+
+def record_vector(length):
+    with _lock:
+        _metrics.vector_lengths.observe(length)
+
+def record_error(e):
+    key = (type(e).__name__, error_class(e))
+    with _lock:
+        if key not in _metrics.errors and len(_metrics.errors) >= MAX_ERROR_CLASSES:
+            key = (type(e).__name__, "other")
+        _metrics.errors[key] = _metrics.errors.get(key, 0) + 1
+
+def snapshot():
+    """
+    :return: Dict copy of all metrics: "phases" (phase: Histogram), "tokens" and
+        "vector_lengths" (Histogram), "calls", "cache_hits", "errors" ((type, message class): count)
+        and "function_occurrences" (name: occurrences in calculated programs)
+    """
+    with _lock:
+        m = _metrics
+        return {
+            "phases": {phase: h.copy() for phase, h in m.phases.items()},
+            "tokens": m.tokens.copy(),
+            "vector_lengths": m.vector_lengths.copy(),
+            "calls": m.calls,
+            "cache_hits": m.cache_hits,
+            "errors": dict(m.errors),
+            "function_occurrences": dict(m.function_occurrences)
+        }
+
+def _label_value(s):
+    return s.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_label_value(str(v))}"' for k, v in labels.items()) + "}"
+
+def _histogram_lines(name, h, labels = None):
+    labels = labels or {}
+    lines = []
+    total = 0
+    for bound, count in zip(h.buckets + ["+Inf"], h.counts):
+        total += count
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {total}")
+    lines.append(f"{name}_sum{_labels(labels)} {h.sum}")
+    lines.append(f"{name}_count{_labels(labels)} {h.count}")
+    return lines
+
+def export_prometheus(snap = None):
+    """
+    :param snap: snapshot() to export, defaults to a new snapshot
+    :return: Metrics in the Prometheus text exposition format
+    """
+    snap = snap or snapshot()
+    lines = [
+        "# HELP calc_phase_seconds Time spent in each phase of calc() and format()",
+        "# TYPE calc_phase_seconds histogram"
+    ]
+    for phase, h in snap["phases"].items():
+        lines += _histogram_lines("calc_phase_seconds", h, {"phase": phase})
+    lines += ["# HELP calc_tokens Tokens per tokenized expression", "# TYPE calc_tokens histogram"]
+    lines += _histogram_lines("calc_tokens", snap["tokens"])
+    lines += ["# HELP calc_vector_length Length of vector results", "# TYPE calc_vector_length histogram"]
+    lines += _histogram_lines("calc_vector_length", snap["vector_lengths"])
+
+    lines += ["# HELP calc_calls_total calc() calls", "# TYPE calc_calls_total counter",
+        f"calc_calls_total {snap['calls']}"]
+    lines += ["# HELP calc_cache_hits_total calc() calls that found the program in the cache",
+        "# TYPE calc_cache_hits_total counter", f"calc_cache_hits_total {snap['cache_hits']}"]
+    lines += ["# HELP calc_errors_total Errors by exception type and message class", "# TYPE calc_errors_total counter"]
+    for (type_name, message), count in sorted(snap["errors"].items()):
+        lines.append(f"calc_errors_total{_labels({'type': type_name, 'message': message})} {count}")
+    lines += ["# HELP calc_function_occurrences_total Occurrences of each function in calculated programs",
+        "# TYPE calc_function_occurrences_total counter"]
+    for name, count in sorted(snap["function_occurrences"].items()):
+        lines.append(f"calc_function_occurrences_total{_labels({'function': name})} {count}")
+    return "\n".join(lines) + "\n"
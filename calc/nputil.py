@@ -0,0 +1,306 @@
+"""
+Optional NumPy support shared by vector.ArrayVector and batch. NumPy is only imported
+the first time it is needed
+"""
+import math
+
+# Integer results at least this large are redone with Python ints (dtype=object)
+# so they don't silently overflow int64
+INT_SAFE_LIMIT = 2.0 ** 62
+
+_np = None
+_imported = False
+_tables = None
+_function_names = None
+
+def numpy():
+    """
+    :return: The numpy module, or None if it is not installed
+    """
+    global _np, _imported
+    if not _imported:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError: # Optional dependency
+            _np = None
+        _imported = True
+    return _np
+
+def is_int(a):
+    return a.dtype.kind in "iu"
+
+def int_checked(op):
+    """
+    :param op: NumPy ufunc (a, b) -> array
+    :return: op that falls back to Python ints if an integer result would overflow int64
+    """
+    np = numpy()
+    def f(a, b):
+        a, b = np.asarray(a), np.asarray(b)
+        if is_int(a) and is_int(b):
+            with np.errstate(all="ignore"):
+                approx = op(a.astype(float), b.astype(float))
+            if not np.all(np.abs(approx) < INT_SAFE_LIMIT):
+                a, b = a.astype(object), b.astype(object)
+        return op(a, b)
+    return f
+
+def power(a, b):
+    """
+    a ** b with Python's rules for negative and fractional exponents. None if Python would
+    give results of different types, ie ints raised to both negative (float result) and
+    non negative (int result) exponents
+    """
+    np = numpy()
+    a, b = np.asarray(a), np.asarray(b)
+    if a.dtype.kind not in "iufc" or b.dtype.kind not in "iufc":
+        return None # Mixed Python numbers, left to Python
+    if np.any((a == 0) & ((b.real < 0) | (b.imag != 0))):
+        raise ZeroDivisionError("0.0 to a negative or complex power")
+    if a.dtype.kind in "iuf" and b.dtype.kind in "iuf":
+        if is_int(a) and is_int(b) and np.any(b < 0):
+            if not np.all(b < 0):
+                return None
+            a = a.astype(float)
+        complex_result = (a < 0) & (b != np.floor(b)) # Ie (-8) ** (1/3) is complex
+        if np.any(complex_result):
+            if not np.all(complex_result):
+                return None
+            a = a.astype(complex)
+    if a.dtype.kind == "c" or b.dtype.kind == "c":
+        return complex_power(a, b)
+    return int_checked(np.power)(a, b)
+
+def _complex_product(ar, ai, br, bi):
+    return ar * br - ai * bi, ar * bi + ai * br
+
+def _complex_quotient(ar, ai, br, bi):
+    """Same steps as Python's complex division, so signed zeros (branch cuts) match"""
+    np = numpy()
+    real_larger = np.abs(br) >= np.abs(bi)
+    with np.errstate(all="ignore"):
+        ratio = np.where(real_larger, bi / br, br / bi)
+        denom = np.where(real_larger, br + bi * ratio, br * ratio + bi)
+        real = np.where(real_larger, ar + ai * ratio, ar * ratio + ai) / denom
+        imag = np.where(real_larger, ai - ar * ratio, ai * ratio - ar) / denom
+    return real, imag
+
+def complex_power(a, b):
+    """
+    a ** b for complex a or b with the same steps as Python's complex power: repeated
+    squaring for integer exponents up to 100, else polar form. Zero bases are checked by
+    power()
+    """
+    np = numpy()
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=complex), np.asarray(b, dtype=complex))
+    ar, ai, br, bi = a.real, a.imag, b.real, b.imag
+
+    # Small integer exponents
+    n = np.where((bi == 0) & (br == np.floor(br)) & (np.abs(br) <= 100), br, 0).astype(int)
+    m = np.abs(n)
+    rr, ri = np.ones(a.shape), np.zeros(a.shape)
+    pr, pi = ar, ai
+    for bit in range(7): # 100 < 2^7
+        use = (m >> bit) & 1 == 1
+        qr, qi = _complex_product(rr, ri, pr, pi)
+        rr, ri = np.where(use, qr, rr), np.where(use, qi, ri)
+        pr, pi = _complex_product(pr, pi, pr, pi)
+    negative = n <= 0 # Python divides 1 by x ** 0 too
+    qr, qi = _complex_quotient(np.ones(a.shape), np.zeros(a.shape), rr, ri)
+    rr, ri = np.where(negative, qr, rr), np.where(negative, qi, ri)
+
+    # Other exponents
+    with np.errstate(all="ignore"):
+        vabs = np.hypot(ar, ai)
+        length = vabs ** br
+        at = np.arctan2(ai, ar)
+        phase = at * br
+        length = np.where(bi != 0, length / np.exp(at * bi), length)
+        phase = np.where(bi != 0, phase + bi * np.log(vabs), phase)
+        zero = (br == 0) & (bi == 0)
+        pr = np.where(zero, 1.0, np.where(vabs == 0, 0.0, length * np.cos(phase)))
+        pi = np.where(zero, 0.0, np.where(vabs == 0, 0.0, length * np.sin(phase)))
+
+    small = (bi == 0) & (br == np.floor(br)) & (np.abs(br) <= 100)
+    result = np.empty(a.shape, dtype=complex) # Adding 1j * imag would turn -0.0 into 0.0
+    result.real = np.where(small, rr, pr)
+    result.imag = np.where(small, ri, pi)
+    return result
+
+def nonzero_divisor(op):
+    """
+    :param op: Division ufunc (a, b) -> array
+    :return: op that raises ZeroDivisionError like Python instead of returning inf / nan
+    """
+    np = numpy()
+    def f(a, b):
+        if np.any(np.asarray(b) == 0):
+            raise ZeroDivisionError("division by zero")
+        return op(a, b)
+    return f
+
+def positive_domain(op):
+    """
+    :param op: Function that is only real for positive input (ie log2)
+    :return: op that returns None if the input is out of domain, so the caller can fall
+        back to the math version and raise the same error
+    """
+    np = numpy()
+    def f(a):
+        if a.dtype.kind in "iuf" and np.all(a > 0):
+            return op(a)
+        return None
+    return f
+
+def is_finite(a):
+    """:return: Whether a has no inf or nan items"""
+    a = numpy().asarray(a)
+    return a.dtype.kind not in "fc" or bool(numpy().isfinite(a).all())
+
+def unary(op, kinds = "iufc"):
+    """
+    :param op: NumPy function of one array
+    :param kinds: Array dtype kinds op gives the same results as the maths version for
+    :return: Function of an args list, None for other kinds (ie Python ints, dtype=object)
+        and for inf / nan results, where the maths version raises or follows its own rules
+    """
+    np = numpy()
+    def f(args):
+        a = np.asarray(args[0])
+        if a.dtype.kind not in kinds:
+            return None
+        with np.errstate(all="ignore"):
+            result = op(a)
+        return result if is_finite(result) else None
+    return f
+
+def as_complex(op):
+    """
+    :param op: NumPy function of one array
+    :return: op computed in complex, like the cmath functions which always return complex
+    """
+    return lambda a: op(a.astype(complex))
+
+def integral(op):
+    """
+    :param op: Rounding function, ie np.floor
+    :return: op giving ints like math.floor(), None if they don't fit in an int64
+    """
+    np = numpy()
+    def f(a):
+        result = op(a)
+        if not (is_finite(result) and np.all(np.abs(result) < INT_SAFE_LIMIT)):
+            return None
+        return result.astype(np.int64)
+    return f
+
+def real_reduce(op):
+    """
+    :param op: Reducing ufunc, ie np.maximum
+    :return: Function of an args list, None for complex args since max() / min() raise for
+        them, and for ints mixed with floats since max() / min() keep the winner's type
+    """
+    np = numpy()
+    def f(args):
+        args = np.broadcast_arrays(*args)
+        kinds = {"f" if a.dtype.kind == "f" else "i" if a.dtype.kind in "iu" else None for a in args}
+        if len(kinds) != 1 or None in kinds:
+            return None
+        return op.reduce(args)
+    return f
+
+def checked_reduce(op, start):
+    """
+    :param op: Binary function of two arrays, ie int_checked(np.add)
+    :param start: Result for no args
+    :return: Function of an args list folding op over them
+    """
+    np = numpy()
+    def f(args):
+        result = np.asarray(start)
+        for a in args:
+            result = op(result, a)
+        return result
+    return f
+
+def tables():
+    """
+    :return: NumPy versions of maths.BIN_OPS and maths.FUNCTIONS. Operators take two arrays,
+        function entries take a list of array args (applied element wise), both return None
+        if they can't give the same results as the maths versions
+    """
+    global _tables
+    if _tables is not None:
+        return _tables
+
+    np = numpy()
+    def norm(args):
+        if any(np.asarray(x).dtype == object for x in args):
+            return None
+        with np.errstate(all="ignore"):
+            result = np.sqrt(sum(np.abs(x).astype(float) ** 2 for x in args)).astype(complex)
+        return result if is_finite(result) else None
+
+    bin_ops = {
+        "**": power,
+        "^": power,
+        "//": nonzero_divisor(np.floor_divide),
+        "/": nonzero_divisor(np.true_divide),
+        "*": int_checked(np.multiply),
+        "+": int_checked(np.add),
+        "-": int_checked(np.subtract),
+        "%": nonzero_divisor(np.mod)
+    }
+    # Same result types as maths.FUNCTIONS: the cmath ones give complex, the math ones
+    # only take real numbers and floor() / ceil() give ints
+    complex_functions = {
+        "sin": np.sin,
+        "cos": np.cos,
+        "tan": np.tan,
+        "asin": np.arcsin,
+        "acos": np.arccos,
+        "atan": np.arctan,
+        "sqrt": np.sqrt,
+        "log": np.log,
+        "ln": np.log,
+    }
+    real_functions = {
+        "degrees": np.degrees,
+        "radians": np.radians,
+        "ceil": integral(np.ceil),
+        "floor": integral(np.floor),
+        "log2": positive_domain(np.log2),
+        "lg": positive_domain(np.log2),
+        "log10": positive_domain(np.log10),
+    }
+    functions = {
+        "cbrt": unary(lambda a: power(a, 1 / 3)),
+        "exp": unary(lambda a: power(math.e, a)),
+        "exp2": unary(lambda a: power(2, a)),
+    }
+    functions.update({name: unary(as_complex(f)) for name, f in complex_functions.items()})
+    functions.update({name: unary(f, "iuf") for name, f in real_functions.items()})
+    functions.update({
+        "atan2": lambda args: np.arctan2(args[0], args[1]) if all(a.dtype.kind in "iuf" for a in args) else None,
+        "abs": norm,
+        "norm": norm,
+        "max": real_reduce(np.maximum),
+        "min": real_reduce(np.minimum),
+        "sum": checked_reduce(int_checked(np.add), 0),
+        "prod": checked_reduce(int_checked(np.multiply), 1),
+        "len": lambda args: np.asarray(len(args)),
+    })
+    _tables = bin_ops, functions
+    return _tables
+
+def function_name(f):
+    """
+    :param f: maths.Function
+    :return: Its name in maths.FUNCTIONS, or None
+    """
+    global _function_names
+    if _function_names is None:
+        from . import maths
+        _function_names = {function: name for name, function in maths.FUNCTIONS.items()}
+    return _function_names.get(f)
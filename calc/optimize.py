@@ -0,0 +1,79 @@
+from . import budget as _budget
+from . import lexer
+from . import maths
+
+# Stack entry values that are not known before evaluation
+_UNKNOWN = object()
+_START = object()
+
+def _token_is_pure(token):
+    """
+    :return: Whether evaluating the token twice with the same args gives the same result
+    """
+    if isinstance(token, lexer.ConstantOrFunctionToken) and token.is_function:
+        return maths.FUNCTIONS[token.consumed].pure
+    return True
+
+def _token_owns_start(token):
+    """Same as parse._token_owns_start()"""
+    return (isinstance(token, lexer.ConstantOrFunctionToken) and token.is_function) or \
+        isinstance(token, lexer.VectorToken)
+
+def fold_constants(program, budget = _budget.DEFAULT_BUDGET):
+    """
+    Evaluate every pure subexpression that does not depend on evaluation time
+    input and replace it with a single ValueToken. Subexpressions that raise or would go
+    over the budget are left as they are, so they are checked again when evaluated
+
+    Consumes arguments exactly like parse.evaluate() does, if the program would fail
+    with the wrong number of arguments it is returned unchanged
+
+    :param program: Out stack from shunting_yard()
+    :param budget: budget.Budget limiting the work done while folding, None for no limits
+    :return: Folded program (list of tokens)
+    """
+    # The folded program is built in one list. Each stack entry is (start, value): the
+    # tokens from out[start] to the next entry's start produce one value on the evaluation
+    # stack, and that value (or _UNKNOWN / _START)
+    out = []
+    stack = []
+    steps = 0
+
+    for token in program:
+        if isinstance(token, lexer.StartToken):
+            stack.append((len(out), _START))
+            out.append(token)
+            continue
+
+        n = token.argc
+        args = []
+        while ((n >= 0 and len(args) < n) or n == -1) and len(stack) and stack[-1][1] is not _START:
+            args.append(stack.pop())
+        if len(args) != n and n >= 0:
+            return list(program)
+        args.reverse()
+
+        start = args[0][0] if args else len(out)
+        if _token_owns_start(token) and n != 0 and len(stack) and stack[-1][1] is _START:
+            start = stack.pop()[0]
+        out.append(token)
+
+        value = _UNKNOWN
+        if isinstance(token, lexer.VariableToken):
+            pass
+        elif _token_is_pure(token) and all(arg is not _UNKNOWN for _, arg in args):
+            try:
+                values = [arg for _, arg in args]
+                if budget is not None:
+                    steps = budget.charge(steps, token, values)
+                value = token.eval(values)
+            except Exception:
+                pass # Raise when evaluated instead
+
+        if value is _UNKNOWN or value is None:
+            stack.append((start, _UNKNOWN))
+        else:
+            del out[start:] # Each token is removed at most once, so folding stays linear
+            stack.append((start, value))
+            out.append(lexer.ValueToken(value))
+    return out
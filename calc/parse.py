@@ -1,5 +1,25 @@
+import time
+
+from . import budget as _budget
+from . import cache
 from . import lexer
-from . import maths
+from . import metrics as _metrics
+from . import optimize as _optimize
+from . import vector
+
+DEFAULT_CACHE_SIZE = 256
+
+# Parsed programs used by calc(), keyed on the whitespace stripped expression.
+# Only programs are cached, never results, so impure functions like rand() are
+# still evaluated on every call
+_program_cache = cache.LRUCache(DEFAULT_CACHE_SIZE)
+
+# Budget used by calc() and parse() unless one is passed in, see set_budget()
+_default_budget = _budget.DEFAULT_BUDGET
+
+# Placeholder for arguments that were not given, ie variables without a value
+# in CompiledExpression.evaluate()
+_MISSING = object()
 
 def _token_is_left_paren(t):
     return isinstance(t, lexer.ParenToken) and t.is_left
@@ -9,8 +29,16 @@ def _token_is_constant(t):
     return isinstance(t, lexer.ConstantOrFunctionToken) and not t.is_function
 def _token_is_left_vector(t):
     return isinstance(t, lexer.VectorToken) and t.is_left
+def _token_is_left_index(t):
+    return isinstance(t, lexer.IndexToken) and t.is_left
 def _is_left_matchable(t):
     return isinstance(t, lexer.MatchableToken) and t.is_left
+def _ends_empty_index_part(prev):
+    """Whether the index part ending after prev is empty, ie the start in v[:5]"""
+    return isinstance(prev, lexer.ColonToken) or _token_is_left_index(prev)
+def _token_owns_start(t):
+    """Function calls and vectors consume their arguments up to their START token"""
+    return _token_is_function(t) or isinstance(t, lexer.VectorToken)
 
 def shunting_yard(tokenizer):
     """
@@ -50,25 +78,14 @@ def shunting_yard(tokenizer):
             raise RuntimeError(mismatch_error_msg)
         return op_stack.pop()
     
-    def _precedence(token):
-        """
-        Return precedence of token, higher = first
-        :param token:
-        :return: Precedence
-        """
-        if isinstance(token, lexer.BinOpToken):
-            return maths.BIN_OPS_PRECEDENCE[token.consumed]
-        if isinstance(token, lexer.MinusOrPlusSignToken):
-            return maths.BIN_OPS_PRECEDENCE["^"] - 0.01 # +/- above multiplication, but less than power
-        return 999999
-
     # Shunting yard algorithm
+    prev = None
     for token in tokenizer.tokens:
         if isinstance(token, lexer.AbstractNumberToken) or _token_is_constant(token):
             out_stack.append(token)
 
         elif _token_is_function(token) or isinstance(token, lexer.MinusOrPlusSignToken):
-            while len(op_stack) and _precedence(token) <= _precedence(op_stack[-1]) \
+            while len(op_stack) and token.precedence <= op_stack[-1].precedence \
                     and not _is_left_matchable(op_stack[-1]):
                 out_stack.append(op_stack.pop())
             op_stack.append(token)
@@ -77,7 +94,7 @@ def shunting_yard(tokenizer):
             # Note: assumes all math operators are left-associative
             while \
                     len(op_stack) and not _is_left_matchable(op_stack[-1]) and \
-                    _precedence(token) <= _precedence(op_stack[-1]):
+                    token.precedence <= op_stack[-1].precedence:
                 out_stack.append(op_stack.pop())
             op_stack.append(token)
 
@@ -86,22 +103,36 @@ def shunting_yard(tokenizer):
             while not _is_left_matchable(op_stack[-1]):
                 out_stack.append(op_stack.pop())
 
+        elif _token_is_left_index(token):
+            # Binds tighter than any operator, the indexed operand is already on the out stack
+            op_stack.append(token)
+
+        elif isinstance(token, lexer.ColonToken):
+            while not _is_left_matchable(op_stack[-1]):
+                out_stack.append(op_stack.pop())
+            op_stack[-1].parts.append(not _ends_empty_index_part(prev))
+
+        elif isinstance(token, lexer.IndexToken): # Right index
+            left = _match_right_close(_token_is_left_index, mismatch_error(type(token)))
+            left.parts.append(not _ends_empty_index_part(prev))
+            if left.parts == [False]:
+                raise RuntimeError("Empty index '[]'")
+            if len(left.parts) > 3:
+                raise RuntimeError("Too many ':' in slice, expected [start:stop:step]")
+            left.argc = 1 + sum(left.parts)
+            out_stack.append(left) # Add [ to out stack as index operator
+
         elif _is_left_matchable(token): # Left paren or vector
-            out_stack.append(lexer.StartToken())
+            # START is only needed by vectors and function calls, the lexer only allows a
+            # function token right before its (
+            if not isinstance(token, lexer.ParenToken) or _token_is_function(prev):
+                out_stack.append(lexer.START)
             op_stack.append(token)
 
         elif isinstance(token, lexer.ParenToken) and not token.is_left: # Right paren
             _match_right_close(_token_is_left_paren, mismatch_error(type(token)))
             if len(op_stack) and _token_is_function(op_stack[-1]): # Account for func() usage
                 out_stack.append(op_stack.pop())
-            else:
-                # Remove last START token, since not needed (not a function)
-                for i in range(len(out_stack) - 1, -1, -1):
-                    if isinstance(out_stack[i], lexer.ConstantOrFunctionToken) and out_stack[i].is_function:
-                        break
-                    if isinstance(out_stack[i], lexer.StartToken):
-                        out_stack.pop(i)
-                        break
 
         elif isinstance(token, lexer.VectorToken) and not token.is_left: # Right vector
             left = _match_right_close(_token_is_left_vector, mismatch_error(type(token)))
@@ -110,6 +141,7 @@ def shunting_yard(tokenizer):
         else:
             err = f"Unimplemented token: {token}"
             raise RuntimeError(err)
+        prev = token
 
     while len(op_stack):
         if isinstance(token, lexer.MatchableToken) and token.is_left:
@@ -118,53 +150,262 @@ def shunting_yard(tokenizer):
 
     return out_stack
 
-def parse(expr):
+def _get_n_tokens(stack, n, owns_start):
     """
-    :param expr: Expression to parse
-    :return: Result of the expression
+    Attempt tp consume n tokens from the stack. If n == -1 then will
+    consume until a start token is hit. If the number of arguments detected
+    does not match n and n >= 0 this will throw an error
+
+    :param stack: Evaluation stack
+    :param n: Number of tokens to consume, or -1 for vararg functions
+    :param owns_start: Whether to also remove the START token that ends the args
+        (function calls and vectors), operators never remove it
+    :return: Array of args in forward order
     """
-    out_stack = shunting_yard(expr)
-    stack = []
+    args = []
+    while ((n >= 0 and len(args) < n) or n == -1) and len(stack) and not isinstance(stack[-1], lexer.StartToken):
+        t = stack.pop()
+        if not isinstance(t, lexer.StartToken):
+            args.append(t)
 
-    def get_n_tokens(n):
-        """
-        Attempt tp consume n tokens from the stack. If n == -1 then will
-        consume until a start token is hit. If the number of arguments detected
-        does not match n and n >= 0 this will throw an error
+    if len(args) != n and n >= 0:
+        err = f"Invalid number of arguments (expected {n}, got {len(args)})"
+        raise RuntimeError(err)
+    if owns_start and n != 0 and len(stack) and isinstance(stack[-1], lexer.StartToken):
+        stack.pop() # Remove the START token if scanning a function or vector
 
-        :param n: Number of tokens to consume, or -1 for vararg functions
-        :return: Array of args in forward order
-        """
-        args = []
-        while ((n >= 0 and len(args) < n) or n == -1) and len(stack) and not isinstance(stack[-1], lexer.StartToken):
-            t = stack.pop()
-            if not isinstance(t, lexer.StartToken):
-                args.append(t)
-
-        if len(args) != n and n >= 0:
-            err = f"Invalid number of arguments (expected {n}, got {len(args)})"
-            raise RuntimeError(err)
-        if n != 0 and len(stack) and isinstance(stack[-1], lexer.StartToken):
-            stack.pop() # Remove the START token if scanning a function or vector
+    return args[::-1]
 
-        return args[::-1]
+def evaluate(out_stack, variables = (), budget = None):
+    """
+    Evaluate a program produced by shunting_yard()
+    :param out_stack: Out stack (RPN program) from shunting_yard()
+    :param variables: Variable values, indexed by VariableToken.slot
+    :param budget: budget.Budget to enforce, or None for no limits
+    :raises budget.BudgetExceededError: If the budget would be exceeded
+    :return: Result of the expression
+    """
+    stack = []
+    steps = 0
+    if budget is not None:
+        budget.check_program(out_stack)
 
     for token in out_stack:
-        val = token.eval(get_n_tokens(token.argc))
+        if isinstance(token, lexer.VariableToken):
+            stack.append(variables[token.slot])
+            continue
+        args = _get_n_tokens(stack, token.argc, _token_owns_start(token))
+        if budget is not None:
+            steps = budget.charge(steps, token, args)
+        val = token.eval(args)
         if val != None:
             stack.append(val)
 
     if not len(stack):
         raise RuntimeError("Failed to evaluate result (missing parentheses?)")
 
+    if budget is not None:
+        budget.check_result(stack[-1])
     return stack[-1]
 
-def calc(expr):
+def parse(expr, budget = _MISSING):
+    """
+    :param expr: Tokenizer with tokenized expression
+    :param budget: budget.Budget, None for no limits. Defaults to the one set by set_budget()
+    :return: Result of the expression
+    """
+    return evaluate(shunting_yard(expr), budget=_default_budget if budget is _MISSING else budget)
+
+class CompiledExpression(object):
+    def __init__(self, expr, program, variables = (), native = False):
+        """
+        An expression that has already been tokenized and run through the shunting yard,
+        so it can be evaluated repeatedly without lexing or parsing again. Use compile()
+        instead of constructing this directly
+
+        :param expr: Source expression string
+        :param program: Out stack from shunting_yard()
+        :param variables: Variable names, in slot order
+        :param native: Evaluate with a generated Python function (see codegen.py)
+        """
+        self._expr = expr
+        self._program = tuple(program)
+        self._variables = tuple(variables)
+        self._slots = {name: i for i, name in enumerate(self._variables)}
+        self._generated = None
+        if native:
+            from . import codegen
+            self._generated = codegen.generate(self._program)
+
+    @property
+    def expr(self):
+        """Source expression string"""
+        return self._expr
+
+    @property
+    def program(self):
+        """RPN program (tuple of tokens)"""
+        return self._program
+
+    @property
+    def variables(self):
+        """Variable names in order of first appearance, which is also the positional order for evaluate()"""
+        return self._variables
+
+    @property
+    def generated(self):
+        """codegen.GeneratedProgram evaluate() runs, None if not compiled with native=True"""
+        return self._generated
+
+    def evaluate(self, *args, **kwargs):
+        """
+        Evaluate with the given variable values, ie compile("x^2 + y").evaluate(3, y=4)
+        :param args: Variable values in the order of self.variables
+        :param kwargs: Variable values by name
+        :return: Result of the expression
+        """
+        if len(args) != len(self._variables) or kwargs:
+            args = self.bind(*args, **kwargs)
+        if self._generated is not None:
+            return self._generated.function(args)
+        return evaluate(self._program, args)
+
+    def evaluate_batch(self, *args, **kwargs):
+        """
+        Evaluate over arrays of variable values with NumPy, see batch.evaluate_batch()
+        :return: numpy.ndarray of results
+        """
+        from . import batch
+        return batch.evaluate_batch(self, *args, **kwargs)
+
+    def bind(self, *args, **kwargs):
+        """
+        :param args: Variable values in the order of self.variables
+        :param kwargs: Variable values by name
+        :return: List of variable values indexed by slot
+        """
+        if len(args) > len(self._variables):
+            raise RuntimeError(f"Too many variable values (expected {len(self._variables)}, got {len(args)})")
+
+        values = list(args) + [_MISSING] * (len(self._variables) - len(args))
+        for name, value in kwargs.items():
+            slot = self._slots.get(name)
+            if slot is None:
+                raise RuntimeError(f"Unknown variable '{name}'")
+            values[slot] = value
+        for slot, value in enumerate(values):
+            if value is _MISSING:
+                raise RuntimeError(f"Missing value for variable '{self._variables[slot]}'")
+        return values
+
+    def __repr__(self):
+        return f"CompiledExpression({self._expr!r})"
+
+def compile(expr, optimize = True, native = False):
+    """
+    Tokenize and parse an expression once so it can be evaluated many times. Names that
+    are not constants become variables, which are given values in evaluate()
+
+    :param expr: Expression to compile, ie "1 + 1" or "x^2 + y"
+    :param optimize: Fold constant subexpressions ahead of time (see optimize.fold_constants),
+        within the budget set by set_budget()
+    :param native: Generate a Python function for the program instead of evaluating the RPN
+        program each time (see codegen.py). Slower to compile, faster to evaluate
+    :return: CompiledExpression
+    """
+    t = lexer.Tokenizer(expr, allow_variables=True)
+    t.tokenize()
+    program = shunting_yard(t)
+    if optimize:
+        program = _optimize.fold_constants(program, _default_budget)
+    return CompiledExpression(expr, program, t.variables, native)
+
+def _get_program(key, budget, on_parse = None):
+    """
+    :param key: Whitespace stripped expression
+    :param budget: budget.Budget limiting constant folding, or None. Subexpressions it
+        leaves unfolded are evaluated (and checked against the caller's budget) every time
+    :param on_parse: Called with (token count, tokenize seconds, parse seconds) if the
+        program wasn't cached and had to be parsed
+    :return: Its constant folded program, from the cache if it is there
+    """
+    program = _program_cache.get(key)
+    if program is None:
+        start = time.perf_counter()
+        t = lexer.Tokenizer(key)
+        t.tokenize()
+        tokenized = time.perf_counter()
+        program = tuple(_optimize.fold_constants(shunting_yard(t), budget))
+        if on_parse is not None:
+            on_parse(len(t.tokens), tokenized - start, time.perf_counter() - tokenized)
+        _program_cache.put(key, program)
+    return program
+
+def calc(expr, budget = _MISSING):
     """
     Calculate an expression
     :param expr: Expression to calc, ie "1 + 1"
+    :param budget: budget.Budget, None for no limits. Defaults to the one set by set_budget()
+    :raises budget.BudgetExceededError: If the expression is too expensive to evaluate
     :return: Numeric answer
     """
-    t = lexer.Tokenizer(expr)
-    t.tokenize()
-    return parse(t)
+    if budget is _MISSING:
+        budget = _default_budget
+    if _metrics.enabled:
+        return _calc_with_metrics(expr, budget)
+    return evaluate(_get_program(lexer.strip_whitespace(expr), budget), budget=budget)
+
+def _calc_with_metrics(expr, budget):
+    """calc() that records metrics, see metrics.py"""
+    key = lexer.strip_whitespace(expr)
+    program = None
+    parsed = [] # (tokens, tokenize seconds, parse seconds) if the program wasn't cached
+    try:
+        program = _get_program(key, budget, lambda *stats: parsed.append(stats))
+        _metrics.record_function_occurrences(_metrics.function_names(program))
+        if parsed:
+            _metrics.record_phase("tokenize", parsed[0][1])
+            _metrics.record_phase("parse", parsed[0][2])
+
+        start = time.perf_counter()
+        result = evaluate(program, budget=budget)
+        _metrics.record_phase("evaluate", time.perf_counter() - start)
+    except Exception as e:
+        _metrics.record_error(e)
+        raise
+    finally:
+        _metrics.record_calc(program is not None and not parsed, parsed[0][0] if parsed else None)
+    if isinstance(result, vector.Vector):
+        _metrics.record_vector(len(result))
+    return result
+
+def set_budget(budget):
+    """
+    Set the budget calc() and parse() use when none is passed in
+    :param budget: budget.Budget, or None for no limits
+    """
+    global _default_budget
+    _default_budget = budget
+
+def get_budget():
+    """
+    :return: The budget calc() and parse() use when none is passed in
+    """
+    return _default_budget
+
+def set_cache_size(size):
+    """
+    Set the max number of parsed programs calc() keeps
+    :param size: Max number of entries, 0 disables the cache
+    """
+    _program_cache.resize(size)
+
+def clear_cache():
+    """Empty the calc() program cache and reset its counters"""
+    _program_cache.clear()
+
+def cache_info():
+    """
+    :return: CacheInfo(hits, misses, evictions, size, maxsize) for the calc() program cache
+    """
+    return _program_cache.info()
@@ -0,0 +1,189 @@
+"""
+Evaluate expressions in a pool of worker processes with a hard wall clock timeout.
+A budget.Budget can't catch every slow case and a thread can't be interrupted inside
+int.__pow__, but a process can be killed
+
+    from calc.pool import calc_with_timeout
+    calc_with_timeout("3^(10^8)", 1.0, budget=None) # EvaluationTimeoutError after 1s
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+
+from . import parse
+
+class EvaluationTimeoutError(RuntimeError):
+    """Raised when an expression takes longer than its timeout, the worker is replaced"""
+    pass
+
+def _worker_main(conn):
+    """
+    Worker process loop: receive (expr, budget), send back (True, result) or (False, exception)
+    :param conn: Worker end of the Pipe, the worker exits when it receives None
+    """
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        expr, budget = job
+        try:
+            reply = (True, parse.calc(expr, budget=budget))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e: # Result or exception could not be pickled
+            conn.send((False, RuntimeError(f"Failed to send result: {e}")))
+
+class _Worker(object):
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self, timeout):
+        try:
+            self.conn.send(None)
+        except OSError: # Already dead
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+class WorkerPool(object):
+    def __init__(self, size = None, context = None):
+        """
+        Start a pool of worker processes, each of which has calc already imported and keeps
+        its own program cache. Safe to use from multiple threads
+
+        :param size: Number of workers, defaults to os.cpu_count()
+        :param context: multiprocessing context, defaults to multiprocessing.get_context()
+        """
+        self._size = size or os.cpu_count() or 1
+        self._context = context or multiprocessing.get_context()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self._size):
+            self._idle.put(_Worker(self._context))
+
+    @property
+    def size(self):
+        """Number of worker processes"""
+        return self._size
+
+    def calc(self, expr, timeout, budget = parse._MISSING):
+        """
+        Calculate an expression in a worker process, waits for a free worker if all are busy
+        :param expr: Expression to calc, ie "1 + 1"
+        :param timeout: Max seconds the worker may spend evaluating, None for no limit
+        :param budget: budget.Budget, None for no limits. Defaults to parse.get_budget()
+        :raises EvaluationTimeoutError: If the timeout is exceeded, the worker is killed and replaced
+            (if a new worker can't be started the pool shrinks instead, see _replace())
+        :return: Numeric answer, errors raised by calc() are raised here
+        """
+        if budget is parse._MISSING:
+            budget = parse.get_budget()
+        if self._closed:
+            raise RuntimeError("Worker pool is closed")
+
+        worker = self._idle.get()
+        if worker is None: # Put by close() or _replace(), passed on to wake the next waiting caller
+            self._idle.put(None)
+            raise RuntimeError("Worker pool is closed" if self._closed else "Worker pool has no workers left")
+        try:
+            worker.conn.send((expr, budget))
+            if not worker.conn.poll(timeout):
+                worker = self._replace(worker)
+                raise EvaluationTimeoutError(f"Evaluation took longer than {timeout}s")
+            ok, value = worker.conn.recv()
+        except (EOFError, OSError): # Worker died, ie killed for using too much memory
+            worker = self._replace(worker)
+            raise RuntimeError("Worker process exited during evaluation")
+        finally:
+            if worker is not None:
+                self._release(worker)
+
+        if not ok:
+            raise value
+        return value
+
+    def _replace(self, worker):
+        """
+        Kill a worker and start a new one in its place
+        :return: New worker, None if it could not be started. The pool is one worker smaller
+            then, once it has none left callers raise RuntimeError instead of waiting
+        """
+        worker.kill()
+        try:
+            return _Worker(self._context)
+        except Exception: # ie out of memory or processes
+            with self._lock:
+                self._size -= 1
+                if self._size == 0:
+                    self._idle.put(None)
+            return None
+
+    def _release(self, worker):
+        with self._lock:
+            if not self._closed:
+                self._idle.put(worker)
+                return
+        worker.stop(1)
+
+    def close(self, timeout = 1):
+        """
+        Stop idle workers, busy workers are stopped when their current job finishes.
+        Callers waiting for a free worker raise RuntimeError
+        :param timeout: Seconds to wait for each worker to exit before killing it
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.stop(timeout)
+        self._idle.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def _get_default_pool():
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WorkerPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+def calc_with_timeout(expr, timeout, budget = parse._MISSING):
+    """
+    Calculate an expression in a shared WorkerPool (started on first use), see WorkerPool.calc()
+    :param expr: Expression to calc, ie "1 + 1"
+    :param timeout: Max seconds to spend evaluating
+    :raises EvaluationTimeoutError: If the timeout is exceeded
+    :return: Numeric answer
+    """
+    return _get_default_pool().calc(expr, timeout, budget)
@@ -0,0 +1,250 @@
+"""
+Lazy sequences: the results of range(a, b, step) and linspace(a, b, n) are Vectors whose
+items are computed when they are needed instead of being stored. Element wise operators
+and 1 argument functions on them give lazy sequences too, and vararg functions like sum(),
+prod(), max() and min() consume them one item at a time in constant memory
+
+Arithmetic sequences have closed forms for len(), max() and min(), and for sum() if their
+items are ints. Adding, subtracting or multiplying int arithmetic sequences by ints gives
+another arithmetic sequence
+"""
+import itertools
+import math
+import numbers
+import sys
+
+from . import maths
+from . import nputil
+from . import vector
+
+class Sequence(vector.Vector):
+    """
+    A Vector with items computed on demand. Subclasses implement __len__, __iter__,
+    _item() and slice(), .items computes (and keeps) every item
+    """
+    __slots__ = ("_items",)
+
+    def __new__(cls, *args):
+        return object.__new__(cls)
+
+    @property
+    def items(self):
+        """Items as a list, computing all of them"""
+        if self._items is None:
+            self._items = list(self)
+        return self._items
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.items[key]
+        n = len(self)
+        if not -n <= key < n:
+            raise IndexError("Sequence index out of range")
+        return self._item(key + n if key < 0 else key)
+    def __abs__(self):
+        return sum([abs(x ** 2) for x in self]) ** 0.5
+    def __reduce__(self): # Mapped functions can't always be pickled
+        return vector.Vector, (self.items,)
+
+    @staticmethod
+    def _element_wise_op(a, b, sym, opname):
+        """
+        Same as Vector._element_wise_op(), but the result is lazy
+        """
+        for x in (a, b):
+            if not (isinstance(x, vector.Vector) or isinstance(x, numbers.Number)):
+                raise RuntimeError(f"Cannot perform {opname} between type '{type(a)}' and '{type(b)}'")
+        if isinstance(a, vector.Vector) and isinstance(b, vector.Vector) and len(a) != len(b):
+            err = f"Cannot perform {opname}: Vector lengths differ ({len(a)} and {len(b)})"
+            raise RuntimeError(err)
+        result = _transformed(a, b, sym)
+        if result is not None:
+            return result
+        n = len(a) if isinstance(a, vector.Vector) else len(b)
+        return Mapped(maths.BIN_OPS[sym], [a, b], n)
+
+    def map(self, f):
+        """
+        :param f: maths.Function taking 1 argument
+        :return: Lazy sequence of f applied to every item. Functions that don't always give
+            numbers (ie c2v) are applied right away so they raise like they do for vectors
+        """
+        if not f.numeric:
+            return vector.Vector([f.f([x]) for x in self])
+        return Mapped(lambda x: f.f([x]), [self], len(self))
+
+    def reduce(self, f):
+        """
+        :param f: maths.Function taking any number of arguments
+        :return: Its closed form for this sequence if there is one, else f called with the
+            sequence as its arguments (max(), sum() and so on iterate it without storing it)
+        """
+        result = self.closed_form(nputil.function_name(f))
+        if result is not None:
+            return result
+        return f.f(self)
+
+    def closed_form(self, name):
+        """
+        :param name: Vararg function name in maths.FUNCTIONS
+        :return: Its result for this sequence computed without going through the items,
+            or None if there isn't a closed form
+        """
+        return len(self) if name == "len" else None
+
+
+class Arithmetic(Sequence):
+    """start, start + step, start + 2 * step ... (n items)"""
+    __slots__ = ("start", "step", "n")
+
+    def __init__(self, start, step, n):
+        """
+        :param start: First item
+        :param step: Difference between items
+        :param n: Number of items, at least 1
+        """
+        self.start = start
+        self.step = step
+        self.n = n
+        self._items = None
+
+    @property
+    def last(self):
+        return self._item(self.n - 1)
+
+    def is_int(self):
+        return isinstance(self.start, int) and isinstance(self.step, int)
+
+    def int_bound(self):
+        """:return: Largest absolute value of the items if they are ints, else 0 (see budget.py)"""
+        return max(abs(self.start), abs(self.last)) if self.is_int() else 0
+
+    def _item(self, i):
+        return self.start + i * self.step
+
+    def __len__(self):
+        return self.n
+    def __iter__(self):
+        if self.is_int():
+            return iter(range(self.start, self.start + self.n * self.step, self.step) if self.step else
+                itertools.repeat(self.start, self.n))
+        return map(self._item, range(self.n))
+    def __reduce__(self):
+        return Arithmetic, (self.start, self.step, self.n)
+    def copy(self):
+        return Arithmetic(self.start, self.step, self.n)
+
+    def slice(self, start, stop, step):
+        indices = range(self.n)[start:stop:step]
+        if not indices:
+            raise RuntimeError("Slice of vector is empty")
+        return Arithmetic(self._item(indices.start), self.step * indices.step, len(indices))
+
+    def closed_form(self, name):
+        real = all([isinstance(x, (int, float)) for x in (self.start, self.step)])
+        if name in ["max", "min"] and real:
+            return (max if name == "max" else min)(self.start, self.last)
+        if name == "sum" and self.is_int():
+            return self.n * (self.start + self.last) // 2 # n * (first + last) is always even
+        return super().closed_form(name)
+
+
+class Mapped(Sequence):
+    """f applied to the items of its operands, numbers are used for every item"""
+    __slots__ = ("_f", "_operands", "_n")
+
+    def __init__(self, f, operands, n):
+        """
+        :param f: Function taking one item of each operand
+        :param operands: Vectors of length n and numbers
+        :param n: Number of items
+        """
+        self._f = f
+        self._operands = operands
+        self._n = n
+        self._items = None
+
+    def _item(self, i):
+        return self._f(*[x[i] if isinstance(x, vector.Vector) else x for x in self._operands])
+
+    def __len__(self):
+        return self._n
+    def __iter__(self):
+        return map(self._f, *[iter(x) if isinstance(x, vector.Vector) else itertools.repeat(x) for x in self._operands])
+    def copy(self):
+        return Mapped(self._f, self._operands, self._n)
+
+    def slice(self, start, stop, step):
+        operands = [x.slice(start, stop, step) if isinstance(x, vector.Vector) else x for x in self._operands]
+        n = len(range(self._n)[start:stop:step])
+        if n == 0:
+            raise RuntimeError("Slice of vector is empty")
+        return Mapped(self._f, operands, n)
+
+
+def _transformed(a, b, sym):
+    """
+    :return: a sym b as an Arithmetic sequence if it is one and can be computed exactly
+        (int sequences and ints), else None
+    """
+    if sym not in ["+", "-", "*"]:
+        return None
+    if isinstance(a, Arithmetic) and isinstance(b, Arithmetic):
+        if sym == "*" or not (a.is_int() and b.is_int()):
+            return None
+        sign = 1 if sym == "+" else -1
+        return Arithmetic(a.start + sign * b.start, a.step + sign * b.step, a.n)
+
+    seq, number = (a, b) if isinstance(a, Arithmetic) else (b, a)
+    if not (isinstance(seq, Arithmetic) and seq.is_int() and isinstance(number, int)):
+        return None
+    if sym == "*":
+        return Arithmetic(seq.start * number, seq.step * number, seq.n)
+    if sym == "+":
+        return Arithmetic(seq.start + number, seq.step, seq.n)
+    if seq is a: # seq - number
+        return Arithmetic(seq.start - number, seq.step, seq.n)
+    return Arithmetic(number - seq.start, -seq.step, seq.n) # number - seq
+
+def _real(name, args):
+    """:return: args with integral floats as ints, raising if any is not a real number"""
+    for x in args:
+        if isinstance(x, (complex, vector.Vector)) or not isinstance(x, numbers.Number) or not math.isfinite(x):
+            raise RuntimeError(f"{name}() arguments must be finite real numbers")
+    return [int(x) if isinstance(x, float) and x.is_integer() else x for x in args]
+
+def _checked_length(n):
+    if n <= 0:
+        raise RuntimeError("Sequence cannot be empty")
+    if n > sys.maxsize:
+        raise RuntimeError(f"Sequence is too long ({n} items)")
+    return n
+
+def range_(args):
+    """
+    range(stop), range(start, stop) or range(start, stop, step) like Python's range(),
+    floats are allowed
+    :return: Arithmetic sequence
+    """
+    if not 1 <= len(args) <= 3:
+        raise RuntimeError(f"range() takes 1 to 3 arguments, got {len(args)}")
+    args = _real("range", args)
+    start, stop, step = ([0] + args + [1])[-3:] if len(args) == 1 else (args + [1])[:3]
+    if step == 0:
+        raise RuntimeError("range() step cannot be 0")
+    if all([isinstance(x, int) for x in (start, stop, step)]):
+        n = -((start - stop) // step) # Ceiling division
+    else:
+        n = math.ceil((stop - start) / step)
+    return Arithmetic(start, step, _checked_length(n))
+
+def linspace(args):
+    """
+    linspace(start, stop, n): n evenly spaced numbers from start to stop (inclusive)
+    :return: Arithmetic sequence
+    """
+    start, stop, n = _real("linspace", args)
+    if not isinstance(n, int):
+        raise RuntimeError("linspace() count must be an int")
+    n = _checked_length(n)
+    return Arithmetic(start, (stop - start) / (n - 1) if n > 1 else 0, n)
@@ -1,8 +1,29 @@
+import cmath
 import numbers
 
 from . import maths
+from . import nputil
+
+# Vectors with at least this many items are stored in a NumPy array (ArrayVector)
+# if NumPy is installed
+ARRAY_THRESHOLD = 10000
+
+# Ints up to this size are exact as float64, larger ones keep a Vector list based when
+# they are mixed with floats or complex numbers
+FLOAT_EXACT_INT = 2 ** 53
 
 class Vector(object):
+    __slots__ = ("items",)
+
+    def __new__(cls, items):
+        if cls is Vector and len(items) >= ARRAY_THRESHOLD:
+            array = _to_array(items)
+            if array is not None:
+                self = object.__new__(ArrayVector)
+                self._array = array
+                return self
+        return object.__new__(cls)
+
     def __init__(self, items):
         """
         Construct a vector
@@ -16,24 +37,26 @@ class Vector(object):
         self.items = items
 
     @staticmethod
-    def _element_wise_op(a, b, op, opname):
+    def _element_wise_op(a, b, sym, opname):
         """
         :param a: First parameter, a number or vector
         :param b: 2nd parameter, a number or vector
-        :param op: (a, b) -> num where a and b are numbers
+        :param sym: Operator in maths.BIN_OPS, ie '+'
         :param opname: Operator name, ie 'addition'
         :return: New vector with result
         """
+        op = maths.BIN_OPS[sym]
 
+        # Arithmetic on checked numbers gives numbers, so the results aren't checked again
         if isinstance(a, numbers.Number) and isinstance(b, Vector): # num + vec
-            return Vector([op(a, x) for x in b.items])
+            return _from_list([op(a, x) for x in b.items])
         if isinstance(b, numbers.Number) and isinstance(a, Vector): # vec + num
-            return Vector([op(x, b) for x in a.items])
+            return _from_list([op(x, b) for x in a.items])
         if isinstance(a, Vector) and isinstance(b, Vector): # vec + vec
             if len(a) != len(b):
                 err = f"Cannot perform {opname}: Vector lengths differ ({len(a)} and {len(b)})"
                 raise RuntimeError(err)
-            return Vector([op(a[i], b[i]) for i in range(len(a))])
+            return _from_list([op(x, y) for x, y in zip(a.items, b.items)])
 
         err = f"Cannot perform {opname} between type '{type(a)}' and '{type(b)}'"
         raise RuntimeError(err)
@@ -43,39 +66,70 @@ class Vector(object):
         return f"[{items}]"
     def __len__(self):
         return len(self.items)
+    def __reduce__(self): # Needed for pickle since __new__ takes the items
+        return Vector, (self.items,)
     def __add__(self, other):
-        return Vector._element_wise_op(self, other, maths.BIN_OPS['+'], 'addition')
+        return self._element_wise_op(self, other, '+', 'addition')
     def __radd__(self, other):
         return self.__add__(other)
     def __sub__(self, other):
-        return Vector._element_wise_op(self, other, maths.BIN_OPS['-'], 'subtraction')
+        return self._element_wise_op(self, other, '-', 'subtraction')
     def __rsub__(self, other):
-        return Vector._element_wise_op(other, self, maths.BIN_OPS['-'], 'subtraction')
+        return self._element_wise_op(other, self, '-', 'subtraction')
     def __mul__(self, other):
-        return Vector._element_wise_op(other, self, maths.BIN_OPS['*'], 'multiplication')
+        return self._element_wise_op(other, self, '*', 'multiplication')
     def __rmul__(self, other):
         return self.__mul__(other)
     def __pow__(self, other):
-        return Vector._element_wise_op(self, other, maths.BIN_OPS['^'], 'exponentiation')
+        return self._element_wise_op(self, other, '^', 'exponentiation')
     def __rpow__(self, other):
-        return Vector._element_wise_op(other, self, maths.BIN_OPS['^'], 'exponentiation')
+        return self._element_wise_op(other, self, '^', 'exponentiation')
     def __truediv__(self, other):
-        return Vector._element_wise_op(self, other, maths.BIN_OPS['/'], 'division')
+        return self._element_wise_op(self, other, '/', 'division')
     def __rtruediv__(self, other):
-        return Vector._element_wise_op(other, self, maths.BIN_OPS['/'], 'division')
+        return self._element_wise_op(other, self, '/', 'division')
     def __floordiv__(self, other):
-        return Vector._element_wise_op(self, other, maths.BIN_OPS['//'], 'integer division')
+        return self._element_wise_op(self, other, '//', 'integer division')
     def __rfloordiv__(self, other):
-        return Vector._element_wise_op(other, self, maths.BIN_OPS['//'], 'integer division')
+        return self._element_wise_op(other, self, '//', 'integer division')
     def __mod__(self, other):
-        return Vector._element_wise_op(self, other, maths.BIN_OPS['%'], 'modular division')
+        return self._element_wise_op(self, other, '%', 'modular division')
     def __rmod__(self, other):
-        return Vector._element_wise_op(other, self, maths.BIN_OPS['%'], 'modular division')
+        return self._element_wise_op(other, self, '%', 'modular division')
     def __getitem__(self, key):
         return self.items[key]
+    def __iter__(self):
+        return iter(self.items)
     def __abs__(self):
         return sum([abs(x ** 2) for x in self.items]) ** 0.5
 
+    def copy(self):
+        """:return: Vector with the same items that doesn't share storage with this one"""
+        return _from_list(list(self.items))
+
+    def slice(self, start, stop, step):
+        """
+        :param start: First index, None for the default like a Python slice
+        :param stop: Index to stop before, or None
+        :param step: Step between indices, or None
+        :return: VectorView of the items in the slice, sharing this vector's items
+        """
+        return _view(self.items, range(len(self))[start:stop:step])
+
+    def map(self, f):
+        """
+        :param f: maths.Function taking 1 argument
+        :return: Vector of f applied to every item
+        """
+        return Vector([f.f([x]) for x in self.items])
+
+    def reduce(self, f):
+        """
+        :param f: maths.Function taking any number of arguments
+        :return: f called with the items as its arguments
+        """
+        return f.f(self.items)
+
     def dot(self, other):
         if len(other) != len(self):
             err = f"Cannot dot() with vectors of different lengths ({len(self)} and {len(other)})"
@@ -97,3 +151,215 @@ class Vector(object):
             a[2] * b[0] - a[0] * b[2],
             a[0] * b[1] - a[1] * b[0]
         ])
+
+
+def _to_array(items):
+    """
+    :param items: List of items
+    :return: 1D numeric NumPy array of the items, or None if NumPy is not installed or
+        the items are not all numbers that fit in an int64 / float64 / complex128 exactly
+    """
+    np = nputil.numpy()
+    if np is None:
+        return None
+    try:
+        array = np.asarray(items)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if array.ndim != 1 or array.dtype.kind not in "biufc":
+        return None
+    if array.dtype.kind in "fc" and any([isinstance(x, int) and abs(x) > FLOAT_EXACT_INT for x in items]):
+        return None # Ints mixed with floats were converted to float64
+    if array.dtype.kind == "b":
+        array = array.astype(int)
+    return array
+
+def _from_list(items):
+    """
+    Construct a Vector without checking the items again
+    :param items: Non empty list of numbers, ie results of arithmetic on the items of Vectors
+    :return: Vector, or ArrayVector for at least ARRAY_THRESHOLD items like Vector()
+    """
+    if len(items) >= ARRAY_THRESHOLD:
+        return Vector(items)
+    v = object.__new__(Vector)
+    v.items = items
+    return v
+
+def _from_array(array):
+    """
+    :param array: 1D NumPy array result
+    :return: ArrayVector, or a list based Vector if it holds Python objects (ie big ints)
+    """
+    if array.dtype == object:
+        return Vector(array.tolist())
+    v = object.__new__(ArrayVector)
+    v._array = array
+    v._items = None
+    return v
+
+def _view(base, indices):
+    """
+    :param base: Items list to share
+    :param indices: range of the indices into base
+    :return: VectorView of base
+    """
+    if not indices:
+        raise RuntimeError("Slice of vector is empty")
+    v = object.__new__(VectorView)
+    v._base = base
+    v._range = indices
+    v._items = None
+    return v
+
+class VectorView(Vector):
+    """
+    A slice of a list based Vector, created by Vector.slice(). Shares the parent's items list
+    so slicing takes O(1) time, the items are only copied when .items is used
+    """
+    __slots__ = ("_base", "_range", "_items")
+
+    @property
+    def items(self):
+        """Items in the slice as a list"""
+        if self._items is None:
+            r = self._range
+            self._items = self._base[r.start:(r.stop if r.stop >= 0 else None):r.step]
+        return self._items
+
+    def __len__(self):
+        return len(self._range)
+    def __reduce__(self):
+        return Vector, (self.items,)
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.items[key]
+        return self._base[self._range[key]]
+    def __iter__(self):
+        if self._items is not None:
+            return iter(self._items)
+        return map(self._base.__getitem__, self._range)
+
+    def slice(self, start, stop, step):
+        return _view(self._base, self._range[start:stop:step])
+
+def _as_operand(x):
+    """
+    :return: NumPy array for an ArrayVector or number, else None
+    """
+    if isinstance(x, ArrayVector):
+        return x._array
+    if isinstance(x, numbers.Number) and not isinstance(x, Vector):
+        array = nputil.numpy().asarray(x)
+        return array.astype(int) if array.dtype.kind == "b" else array
+    return None
+
+class ArrayVector(Vector):
+    """
+    A Vector stored in a NumPy array, created automatically by Vector() for at least
+    ARRAY_THRESHOLD items. Element wise operators, functions with a NumPy version and
+    common reductions run in NumPy, anything else falls back to the list based Vector code
+
+    Integer results that would overflow int64 fall back to Python ints. Results have the
+    same types as the list based code, ie sin() gives complex items like cmath.sin()
+    """
+    __slots__ = ("_array", "_items")
+
+    def __init__(self, items):
+        if not hasattr(self, "_array"): # Constructed directly instead of by Vector()
+            if len(items) == 0:
+                raise RuntimeError("Number of items cannot be empty")
+            array = _to_array(items)
+            if array is None:
+                raise RuntimeError("Non-numeric type in vector")
+            self._array = array
+        self._items = None
+
+    @property
+    def items(self):
+        """Items as a list of Python numbers"""
+        if self._items is None:
+            self._items = self._array.tolist()
+        return self._items
+
+    @staticmethod
+    def _element_wise_op(a, b, sym, opname):
+        x, y = _as_operand(a), _as_operand(b)
+        if x is None or y is None:
+            return Vector._element_wise_op(a, b, sym, opname)
+        if x.ndim and y.ndim and len(x) != len(y):
+            err = f"Cannot perform {opname}: Vector lengths differ ({len(x)} and {len(y)})"
+            raise RuntimeError(err)
+        result = nputil.tables()[0][sym](x, y)
+        if result is None:
+            return Vector._element_wise_op(a, b, sym, opname)
+        return _from_array(result)
+
+    def __len__(self):
+        return len(self._array)
+    def __reduce__(self):
+        return _from_array, (self._array,)
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.items[key]
+        return self._array[key].item()
+    def __iter__(self):
+        if self._items is not None:
+            return iter(self._items)
+        return self._iter_chunks()
+
+    def _iter_chunks(self, size = 4096):
+        """Items as Python numbers, converted a chunk at a time instead of all at once"""
+        for start in range(0, len(self._array), size):
+            yield from self._array[start:start + size].tolist()
+
+    def copy(self):
+        return _from_array(self._array.copy())
+
+    def slice(self, start, stop, step):
+        view = self._array[start:stop:step] # NumPy slices are views
+        if not len(view):
+            raise RuntimeError("Slice of vector is empty")
+        return _from_array(view)
+    def __abs__(self):
+        np = nputil.numpy()
+        with np.errstate(all="ignore"): # Squared in float64, int64 squares would overflow
+            result = float(np.sqrt(np.sum(np.abs(self._array).astype(float) ** 2)))
+        return result if cmath.isfinite(result) else Vector.__abs__(self)
+
+    def map(self, f):
+        numpy_f = nputil.tables()[1].get(nputil.function_name(f))
+        result = numpy_f([self._array]) if numpy_f and f.argc == 1 else None
+        if result is None:
+            return Vector.map(self, f)
+        return _from_array(result)
+
+    def reduce(self, f):
+        np = nputil.numpy()
+        a = self._array
+        name = nputil.function_name(f)
+        real = a.dtype.kind in "iuf"
+
+        if name == "len":
+            return len(a)
+        if name == "sum" and (not nputil.is_int(a) or np.abs(a).astype(float).sum() < nputil.INT_SAFE_LIMIT):
+            return a.sum().item()
+        if name == "prod" and not nputil.is_int(a):
+            return a.prod().item()
+        if name in ["max", "min"] and real:
+            return (a.max() if name == "max" else a.min()).item()
+        if name in ["abs", "norm"]:
+            return cmath.sqrt(abs(self) ** 2)
+        if name in ["sort", "rsort"] and real:
+            a = np.sort(a)
+            return _from_array(a if name == "sort" else a[::-1].copy())
+        return Vector.reduce(self, f)
+
+    def dot(self, other):
+        if isinstance(other, ArrayVector) and len(other) == len(self):
+            np = nputil.numpy()
+            a, b = self._array, other._array
+            if not (nputil.is_int(a) and nputil.is_int(b)) or \
+                    np.dot(np.abs(a).astype(float), np.abs(b).astype(float)) < nputil.INT_SAFE_LIMIT:
+                return np.dot(a, b).item()
+        return Vector.dot(self, other)
@@ -0,0 +1,115 @@
+import unittest
+import os, sys
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import lexer
+from calc.aio import AsyncCalculator, acalc, aformat
+from calc.budget import BudgetExceededError
+
+class CountingExecutor(ThreadPoolExecutor):
+    """Counts jobs started and the most running at once"""
+    def __init__(self, workers):
+        super().__init__(workers)
+        self.lock = threading.Lock()
+        self.started = self.running = self.peak = 0
+
+    def submit(self, f, *args):
+        def job():
+            with self.lock:
+                self.started += 1
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            try:
+                return f(*args)
+            finally:
+                with self.lock:
+                    self.running -= 1
+        return super().submit(job)
+
+class TestAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_acalc(self):
+        self.assertEqual(await acalc("1 + 1"), 2)
+        self.assertEqual(await aformat(await acalc("[1, 2] * 1.5")), "[1.5, 3]")
+        self.assertEqual(await aformat(100, True), "100 (1s36)")
+        with self.assertRaises(BudgetExceededError):
+            await acalc("9^(9^9)")
+
+    async def test_coalesce(self):
+        executor = CountingExecutor(4)
+        calculator = AsyncCalculator(executor)
+        results = await asyncio.gather(*[calculator.calc("2^100 + 1") for _ in range(10)])
+        self.assertEqual(results, [2 ** 100 + 1] * 10)
+        self.assertEqual(executor.started, 1)
+
+        results = await asyncio.gather(*[calculator.calc("urand()") for _ in range(5)])
+        self.assertEqual(executor.started, 6, "Impure expressions are not shared")
+        results = await asyncio.gather(*[calculator.calc("sum(urand (), 1)") for _ in range(5)])
+        self.assertEqual(executor.started, 11, "Found from the tokens, not the string")
+        results = await asyncio.gather(*[calculator.calc("urand()") for _ in range(3)])
+        self.assertEqual(executor.started, 14, "Known to be impure, not shared")
+        executor.shutdown()
+
+    async def test_parsed_in_executor(self):
+        """The event loop thread never tokenizes, large expressions don't stall it"""
+        threads = set()
+        tokenize = lexer.Tokenizer.tokenize
+        def recording(tokenizer):
+            threads.add(threading.current_thread())
+            return tokenize(tokenizer)
+        executor = CountingExecutor(2)
+        calculator = AsyncCalculator(executor)
+        with mock.patch.object(lexer.Tokenizer, "tokenize", recording):
+            self.assertEqual(await calculator.calc("+".join(["urand() * 0 + 1"] * 1000)), 1000)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+        executor.shutdown()
+
+    async def test_max_concurrency(self):
+        executor = CountingExecutor(4)
+        calculator = AsyncCalculator(executor, max_concurrency=2)
+        await asyncio.gather(*[calculator.calc(f"{i}^100000 % 7") for i in range(8)])
+        self.assertEqual(executor.started, 8)
+        self.assertLessEqual(executor.peak, 2)
+        executor.shutdown()
+
+    async def test_cancel(self):
+        executor = CountingExecutor(1)
+        calculator = AsyncCalculator(executor)
+        blocker = threading.Event()
+        busy = asyncio.get_running_loop().run_in_executor(executor, blocker.wait)
+
+        a = asyncio.ensure_future(calculator.calc("1 + 2"))
+        b = asyncio.ensure_future(calculator.calc("1 + 2"))
+        c = asyncio.ensure_future(calculator.calc("3 + 4"))
+        await asyncio.sleep(0.01)
+        a.cancel() # b still wants the result
+        c.cancel() # Nobody wants it, it should never run
+        await asyncio.sleep(0.01)
+        blocker.set()
+        await busy
+        self.assertEqual(await b, 3)
+        with self.assertRaises(asyncio.CancelledError):
+            await c
+        self.assertEqual(executor.started, 2)
+        executor.shutdown()
+
+class TestAsyncLoops(unittest.TestCase):
+    def test_several_loops(self):
+        """One calculator can be used from several event loops, ie several asyncio.run() calls"""
+        executor = CountingExecutor(2)
+        calculator = AsyncCalculator(executor, max_concurrency=1)
+        async def run():
+            return await asyncio.gather(*[calculator.calc(f"{i} + 1") for i in range(4)])
+        for _ in range(2):
+            self.assertEqual(asyncio.run(run()), [1, 2, 3, 4])
+        self.assertEqual(executor.peak, 1)
+        executor.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
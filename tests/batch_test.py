@@ -0,0 +1,100 @@
+import unittest
+import os, sys
+import random
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.parse import compile
+from calc.batch import calc_batch, np
+
+UNARY = ["sin", "cos", "tan", "asin", "acos", "atan", "degrees", "radians", "ceil", "floor", "sqrt", "cbrt",
+    "exp", "exp2", "log", "ln", "log2", "lg", "log10"]
+VARARG = ["max", "min", "sum", "prod", "abs", "norm"]
+
+def random_expression(rng, depth):
+    """:return: Random expression of x, y, numbers, operators and functions"""
+    if depth == 0 or rng.random() < 0.25:
+        return rng.choice(["x", "y", str(rng.randint(-3, 9)), f"{rng.uniform(-3, 3):.2f}"])
+    k = rng.random()
+    if k < 0.4:
+        op = rng.choice(["+", "-", "*", "/", "//", "%", "^"])
+        return f"({random_expression(rng, depth - 1)} {op} {random_expression(rng, depth - 1)})"
+    if k < 0.7:
+        return f"{rng.choice(UNARY)}({random_expression(rng, depth - 1)})"
+    if k < 0.8:
+        args = f"{random_expression(rng, depth - 1)}, {random_expression(rng, depth - 1)}"
+        return f"{rng.choice(['atan2', 'gcd', 'lcm'])}({args})"
+    if k < 0.9:
+        return f"(1 * -{random_expression(rng, depth - 1)})"
+    args = [random_expression(rng, depth - 1) for _ in range(rng.randint(1, 3))]
+    return f"{rng.choice(VARARG)}({', '.join(args)})"
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestBatchMethods(unittest.TestCase):
+    def assertMatchesEvaluate(self, expr, **arrays):
+        """Batch results should match evaluate() row by row"""
+        compiled = compile(expr)
+        arrays = {name: arrays[name] for name in compiled.variables}
+        result = compiled.evaluate_batch(**arrays)
+        columns = [np.broadcast_to(arrays[name], result.shape).tolist() for name in compiled.variables]
+        expected = [compiled.evaluate(*row) for row in zip(*columns)]
+        self.assertEqual(len(result), len(expected))
+        for a, b in zip(result.tolist(), expected):
+            self.assertAlmostEqual(complex(a), complex(b), msg=expr)
+
+    def test_matches_evaluate(self):
+        x = np.arange(-5, 6)
+        y = np.linspace(0.5, 3, 11)
+        for expr in ["x^2 + 3*x", "x / y - x // y + x % y", "-x^2", "sqrt(x) + cbrt(x)", "sin(x) * cos(y)",
+                "max(x, y, 1) + min(x, y)", "abs(x, y) + sum(x, y, 2) + prod(x, y)", "exp2(x) + log(y)",
+                "atan2(y, x) + degrees(y) + floor(y) + ceil(y)", "gcd(x, 4) + lcm(x, 3) + modpow(x + 6, 2, 5)",
+                "shulker * x + stack", "log2(y) + log10(y)", "x^y", "2^x"]:
+            self.assertMatchesEvaluate(expr, x=x, y=y)
+
+    def test_random_expressions(self):
+        """Batch gives the same values and types as evaluate(), or raises if any row raises"""
+        rng = random.Random(0)
+        x = np.arange(-4, 5)
+        y = np.linspace(-2, 2.5, 9)
+        for _ in range(300):
+            expr = random_expression(rng, 3)
+            compiled = compile(expr)
+            columns = {"x": x.tolist(), "y": y.tolist()}
+            try:
+                expected = [compiled.evaluate(*[columns[name][i] for name in compiled.variables]) for i in range(len(x))]
+            except Exception:
+                expected = None
+            arrays = {name: {"x": x, "y": y}[name] for name in compiled.variables}
+            if expected is None:
+                with self.assertRaises(Exception, msg=expr):
+                    compiled.evaluate_batch(**arrays)
+                continue
+            result = np.broadcast_to(compiled.evaluate_batch(**arrays), x.shape).tolist()
+            for a, b in zip(result, expected):
+                self.assertTrue(a == b or abs(complex(a) - complex(b)) <= 1e-9 * max(1, abs(b)), msg=f"{expr}: {a} != {b}")
+                self.assertEqual(type(a), type(b), msg=expr)
+
+    def test_broadcast_and_constants(self):
+        self.assertEqual(calc_batch("x + y", x=np.arange(3), y=10).tolist(), [10, 11, 12])
+        self.assertEqual(calc_batch("x * 0 + 2 * 3", x=np.arange(3)).tolist(), [6, 6, 6])
+
+    def test_int_overflow(self):
+        """int64 overflow falls back to exact Python ints"""
+        self.assertEqual(calc_batch("2^x", x=np.array([10, 100])).tolist(), [2 ** 10, 2 ** 100])
+        self.assertEqual(calc_batch("x * x", x=np.array([2 ** 40])).tolist(), [2 ** 80])
+
+    def test_errors(self):
+        with self.assertRaises(ZeroDivisionError):
+            calc_batch("1 / x", x=np.arange(3))
+        with self.assertRaises(ValueError):
+            calc_batch("log2(x)", x=np.arange(3)) # Same error as math.log2(0)
+        with self.assertRaises(TypeError):
+            calc_batch("max(x * i, 1)", x=np.arange(3))
+
+    def test_vector_fallback(self):
+        result = calc_batch("x + [1, 2]", x=np.arange(3))
+        self.assertEqual([v.items for v in result], [[1, 2], [2, 3], [3, 4]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import os, sys
+import itertools
+from unittest import mock
+from concurrent.futures.process import BrokenProcessPool
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import parse
+from calc.bulk import calc_many
+from calc.budget import BudgetExceededError
+
+class TestCalcMany(unittest.TestCase):
+    def check(self, workers):
+        exprs = [f"{i} * 2" for i in range(100)] + ["foo(1)", "9^(9^9)", "[1, 2] + 1"]
+        results = list(calc_many(exprs, workers=workers, chunksize=7))
+        self.assertEqual(results[:100], [i * 2 for i in range(100)])
+        self.assertIsInstance(results[100], RuntimeError)
+        self.assertIsInstance(results[101], BudgetExceededError)
+        self.assertEqual(results[102].items, [2, 3])
+
+    def test_in_process(self):
+        self.check(1)
+
+    def test_processes(self):
+        self.check(2)
+
+    def test_bounded(self):
+        """Only a bounded part of an endless iterator is read ahead"""
+        consumed = itertools.count()
+        exprs = (f"{i} + {next(consumed) * 0}" for i in itertools.count())
+        results = calc_many(exprs, workers=2, chunksize=10, max_pending=3)
+        self.assertEqual(list(itertools.islice(results, 25)), list(range(25)))
+        results.close()
+        self.assertLessEqual(next(consumed), 10 * (3 + 3)) # The 3 chunks read + 3 pending
+
+    def test_worker_killed(self):
+        """Only the expression that kills its worker fails, the rest of the batch is evaluated"""
+        calc = parse.calc
+        def crash(expr, budget):
+            if expr == "crash":
+                os._exit(1)
+            return calc(expr, budget)
+        exprs = [f"{i} + 1" for i in range(10)]
+        exprs[3] = exprs[8] = "crash"
+        with mock.patch.object(parse, "calc", crash): # Inherited by the forked workers
+            results = list(calc_many(exprs, workers=2, chunksize=2))
+        for i, result in enumerate(results):
+            if i in [3, 8]:
+                self.assertIsInstance(result, BrokenProcessPool)
+            else:
+                self.assertEqual(result, i + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import os, sys
+import io
+import json
+from unittest import mock
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.__main__ import main
+
+INPUT = "shulker * 3\nfoo(1)\n[1, 2] * 1.5\n"
+
+def run(*argv):
+    out = io.StringIO()
+    code = main(list(argv), stdin=io.StringIO(INPUT), stdout=out)
+    return code, out.getvalue().splitlines()
+
+class TestCli(unittest.TestCase):
+    def test_text(self):
+        self.assertEqual(run(), (0, ["5184", "Error: Unknown function 'foo'", "[1.5, 3]"]))
+        self.assertEqual(run("--mc")[1][0], "5184 (81s / 3sh)")
+
+    def test_max_items(self):
+        self.assertEqual(run("--max-items", "1")[1][2], "[1.5, … 1 more]")
+        self.assertEqual(run("--max-length", "5", "--format", "tsv")[1][2].split("\t")[2], "[…]")
+
+    def test_jsonl(self):
+        code, lines = run("--format", "jsonl", "--workers", "2", "--chunksize", "1")
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(rows[0], {"line": 1, "expr": "shulker * 3", "result": "5184"})
+        self.assertEqual(rows[1], {"line": 2, "expr": "foo(1)", "error": "Unknown function 'foo'"})
+        self.assertEqual(rows[2]["result"], "[1.5, 3]")
+
+    def test_tsv(self):
+        code, lines = run("--format", "tsv", "--strict")
+        self.assertEqual(code, 1)
+        self.assertEqual(lines[1].split("\t"), ["2", "foo(1)", "", "Unknown function 'foo'"])
+
+    def test_missing_file(self):
+        """A file that can't be read is an argument error, not a traceback"""
+        stderr = io.StringIO()
+        with mock.patch("sys.stderr", stderr), self.assertRaises(SystemExit) as cm:
+            run(os.path.join(current, "missing.txt"))
+        self.assertEqual(cm.exception.code, 2)
+        self.assertIn("error: can't open", stderr.getvalue())
+        self.assertIn("No such file or directory", stderr.getvalue())
+
+    def test_blank_lines(self):
+        out = io.StringIO()
+        main(["--format", "jsonl"], stdin=io.StringIO("\n1 + 1\n  \r\n2 + 2\n\n"), stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(rows, [{"line": 2, "expr": "1 + 1", "result": "2"}, {"line": 4, "expr": "2 + 2", "result": "4"}])
+
+    def test_output_flushed_on_error(self):
+        """Lines written before an exception reach stdout"""
+        def lines():
+            yield "1 + 1\n"
+            raise KeyboardInterrupt()
+        read, write = os.pipe()
+        saved = os.dup(sys.stdout.fileno())
+        try:
+            sys.stdout.flush()
+            os.dup2(write, sys.stdout.fileno())
+            with self.assertRaises(KeyboardInterrupt):
+                main(["--chunksize", "1"], stdin=lines())
+        finally:
+            os.dup2(saved, sys.stdout.fileno())
+            os.close(saved)
+            os.close(write)
+        with os.fdopen(read) as f:
+            self.assertEqual(f.read(), "2\n")
+
+if __name__ == '__main__':
+    unittest.main()
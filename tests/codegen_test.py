@@ -0,0 +1,120 @@
+import unittest
+import os, sys
+import random
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+sys.path.append(current)
+
+from calc.lexer import Tokenizer
+from calc.vector import Vector
+from calc.matrix import Matrix
+from calc.parse import compile, evaluate, shunting_yard
+from calc.codegen import generate
+from calc.budget import DEFAULT_BUDGET, BudgetExceededError
+from lexer_test import _test_corpus, EXTRA_CORPUS
+
+def _plain(value):
+    """Vectors and matrices as lists, so results can be compared"""
+    if isinstance(value, Matrix):
+        return value.rows
+    return [_plain(x) for x in value.items] if isinstance(value, Vector) else value
+
+def _outcome(f):
+    """
+    :return: ("ok", repr of the result) or ("error", exception type, message)
+    """
+    random.seed(0) # Same rand() results for both
+    try:
+        return ("ok", repr(_plain(f())))
+    except Exception as e:
+        return ("error", type(e), str(e))
+
+class TestCodegen(unittest.TestCase):
+    def test_matches_evaluate(self):
+        """Generated functions give the same results and errors as parse.evaluate()"""
+        for expr in _test_corpus() + EXTRA_CORPUS:
+            t = Tokenizer(expr, allow_variables=True)
+            try:
+                t.tokenize()
+                program = shunting_yard(t)
+            except Exception:
+                continue
+            variables = [3] * len(t.variables)
+            if _outcome(lambda: evaluate(program, variables, DEFAULT_BUDGET))[1] is BudgetExceededError:
+                continue # Generated code has no budget
+            generated = generate(program)
+            with self.subTest(expr=expr):
+                self.assertEqual(_outcome(lambda: generated(variables)), _outcome(lambda: evaluate(program, variables)))
+
+    def test_native_compile(self):
+        expr = compile("sqrt(x^2 + y^2) / (1 + sqrt(x^2 + y^2))", native=True)
+        self.assertTrue(expr.generated.native)
+        self.assertNotIn(".eval(", expr.generated.source)
+        self.assertAlmostEqual(expr.evaluate(3, 4), 5 / 6)
+        self.assertAlmostEqual(expr.evaluate(y=4, x=3), 5 / 6)
+        self.assertEqual(compile("x * [1, 2] - 1", native=True).evaluate(2).items, [1, 3])
+        self.assertEqual(compile("sin([0, 0])", native=True).evaluate().items, [0, 0])
+        self.assertEqual(compile("-2^x", native=True).evaluate(2), -4)
+        self.assertIsNone(compile("x + 1").generated)
+
+    def test_cse(self):
+        """Repeated pure subexpressions are evaluated once, rand() every time"""
+        expr = compile("sqrt(x^2 + y^2) / (1 + sqrt(x^2 + y^2))", native=True)
+        self.assertEqual(expr.generated.deduplicated, 4) # x^2, y^2, +, sqrt
+        self.assertEqual(expr.generated.source.count("_f_sqrt("), 1)
+        self.assertAlmostEqual(expr.evaluate(3, 4), 5 / 6)
+
+        expr = compile("rand(1, 1000000) - rand(1, 1000000) + x*2 + x*2", native=True)
+        self.assertEqual(expr.generated.deduplicated, 1)
+        self.assertEqual(expr.generated.source.count("_f_rand("), 2)
+        self.assertNotEqual(expr.evaluate(0), 0)
+        self.assertEqual(generate(expr.program, cse=False).deduplicated, 0)
+
+    def test_fused_kernels(self):
+        """Element wise vector chains run in one kernel with the same results and errors"""
+        expr = compile("[1, 2] * x + [3, 4] * x - 1", native=True)
+        self.assertEqual(expr.generated.fused, 4)
+        self.assertEqual(expr.evaluate(2).items, [7, 11])
+        # [c, b, a] could raise between [a, b, c] * 2 and the rest of the chain
+        expr = compile("[a, b, c] * 2 + [c, b, a] * 3 - 1", native=True)
+        self.assertEqual(expr.generated.fused, 3)
+        self.assertEqual(expr.generated.source.count("_literal("), 2)
+        self.assertEqual(expr.evaluate(1, 2, 3).items, [10, 9, 8])
+        self.assertEqual(compile("x * 2 - 1", native=True).evaluate(Vector([1, 2])).items, [1, 3])
+
+        expr = compile("sin(x * [1, 2]) + x", native=True)
+        self.assertEqual(expr.generated.fused, 3)
+        self.assertEqual(_plain(expr.evaluate(0)), [0, 0])
+        self.assertEqual(compile("c2v(x) * 2 + 1", native=True).generated.fused, 0)
+
+        # Unfused operations decide the error
+        expr = compile("x * [1, 2] + y", native=True)
+        with self.assertRaises(RuntimeError, msg="Vector lengths differ"):
+            expr.evaluate(1, Vector([1, 2, 3]))
+        with self.assertRaises(ZeroDivisionError):
+            compile("[1, 2] / x + 1", native=True).evaluate(0)
+        # Errors are raised in evaluation order, the first one wins
+        for expr in ["[x, 1] / y + x // y", "x // y - [x, 1] / y", "sin([x, 1] ^ y) + [1, 2] * (1 / y)"]:
+            errors = []
+            for native in (False, True):
+                with self.assertRaises(ZeroDivisionError) as cm:
+                    compile(expr, native=native).evaluate(1, 0)
+                errors.append(str(cm.exception))
+            self.assertEqual(errors[0], errors[1], msg=expr)
+
+        # Long chains are split between kernels
+        expr = compile(" + ".join(["[x, 1]"] * 200), native=True, optimize=False)
+        self.assertEqual(expr.evaluate(2).items, [400, 200])
+
+    def test_fallback(self):
+        """Programs with the wrong number of arguments raise like parse.evaluate() when evaluated"""
+        expr = compile("atan2(x)", native=True)
+        self.assertFalse(expr.generated.native)
+        with self.assertRaises(RuntimeError):
+            expr.evaluate(1)
+        with self.assertRaises(ZeroDivisionError):
+            compile("x / 0", native=True).evaluate(1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import os, sys
+import io
+from decimal import Decimal
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.parse import calc
+from calc.format import format, write, iter_format, MAX_EXACT_DIGITS
+from calc.vector import Vector, ArrayVector
+
+class TestFormat(unittest.TestCase):
+    def test_format(self):
+        self.assertEqual(format(calc("[1, 2] * 1.5")), "[1.5, 3]")
+        self.assertEqual(format(calc("1 / 3")), "0.333333333333333")
+        self.assertEqual(format(100, True), "100 (1s36)")
+
+    def test_max_items(self):
+        v = calc("[1, 2, 3, 4, 5, 6, 7, 8, 9, 10]")
+        self.assertEqual(format(v, max_items=3), "[1, 2, 3, … 7 more]")
+        self.assertEqual(format(v, max_items=0), "[… 10 more]")
+        self.assertEqual(format(v, max_items=10), format(v))
+
+    def test_max_length(self):
+        v = calc("[1, 2, 3, 4, 5, 6, 7, 8, 9, 10]")
+        self.assertEqual(format(v, max_length=20), "[1, 2, 3, … 7 more]")
+        self.assertEqual(format(v, max_length=30), "[1, 2, 3, 4, 5, 6, … 4 more]")
+        self.assertEqual(format(v, max_length=31), format(v)) # Fits without the marker
+        self.assertEqual(format(v, max_length=11), "[… 10 more]")
+        self.assertEqual(format(v, max_length=10), "[…]") # No room for the count
+        self.assertEqual(format(v, max_length=1), "…")
+        self.assertEqual(format(v, max_length=0), "")
+        self.assertEqual(format(v, max_length=5, max_items=0), "[…]")
+        for n in range(0, 40):
+            self.assertLessEqual(len(format(v, max_length=n)), n)
+        big = Vector(list(range(1000000)))
+        for n in range(0, 20):
+            self.assertLessEqual(len(format(big, max_length=n)), n)
+        self.assertEqual(format(123456, max_length=3), "123456") # Numbers are never cut
+
+    def test_lazy(self):
+        """Only the items that are shown get formatted"""
+        items = list(range(1000000))
+        v = Vector(items)
+        self.assertEqual(format(v, max_length=40), "[0, 1, 2, 3, 4, 5, 6, 7, … 999992 more]")
+        if isinstance(v, ArrayVector):
+            self.assertIsNone(v._items) # The array was never converted to a list
+        pieces = list(iter_format(v, max_items=2))
+        self.assertEqual(pieces, ["[", "0", ", 1", ", … 999998 more]"])
+        self.assertEqual(format(calc("[1, 2, 3, 4][::-1][1:]"), max_items=1), "[3, … 2 more]")
+
+    def test_huge_ints(self):
+        """Ints over MAX_EXACT_DIGITS digits are shown in scientific notation unless exact"""
+        self.assertEqual(format(10 ** MAX_EXACT_DIGITS - 1), "9" * MAX_EXACT_DIGITS)
+        self.assertEqual(format(10 ** MAX_EXACT_DIGITS), "1e+4300")
+        self.assertEqual(format(-123 * 10 ** 5000), "-1.23e+5002")
+        self.assertEqual(format(calc("2^100000")), "9.99002093014385e+30102")
+        self.assertEqual(format(Vector([1, 3 ** 50000])), "[1, 1.15540963049059e+23856]")
+        # Rounded from all the digits, not just the leading ones
+        self.assertEqual(format(999999999999999500 * 10 ** 5000), "1e+5018")
+        self.assertEqual(format(100000000000000500 * 10 ** 5000), "1e+5017") # Half to even
+        self.assertEqual(format(100000000000000500 * 10 ** 5000 + 1), "1.00000000000001e+5017")
+
+        n = calc("3^20000 * 7^3000")
+        exact = format(n, exact_ints=True)
+        self.assertEqual(len(exact), 12078)
+        self.assertEqual(exact, str(Decimal(n))) # Not limited like str(n)
+        self.assertEqual(format(-n, exact_ints=True), "-" + exact)
+
+    def test_write(self):
+        out = io.StringIO()
+        self.assertEqual(write(calc("[1, 2] * 1.5"), out), 8)
+        self.assertEqual(write(calc("[1, 2, 3]"), out, max_items=1), 13)
+        self.assertEqual(out.getvalue(), "[1.5, 3][1, … 2 more]")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import os, sys
+import subprocess
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.parse import calc
+
+# Modules that are slow to import and only needed by rarely used features
+DEFERRED = ["re", "string", "random"]
+
+class TestImport(unittest.TestCase):
+    def loaded(self, statement):
+        code = f"import sys\n{statement}\nprint(' '.join(m for m in {DEFERRED!r} if m in sys.modules))"
+        out = subprocess.run([sys.executable, "-E", "-s", "-c", code], cwd=os.path.dirname(current),
+            capture_output=True, text=True, check=True).stdout
+        return out.split()
+
+    def test_deferred_imports(self):
+        # -E and -s ignore PYTHON* env vars and user site-packages, which could import these
+        self.assertEqual(self.loaded("import calc.parse"), [])
+        self.assertEqual(self.loaded("import calc.parse; calc.parse.calc('sin(1) + 0x1f * 2')"), [])
+        self.assertIn("random", self.loaded("import calc.parse; calc.parse.calc('rand(5)')"))
+
+    def test_deferred_functions(self):
+        self.assertTrue(0 <= calc("rand(5)") <= 5)
+        self.assertTrue(0 <= calc("urand()") <= 1)
+        self.assertEqual(calc("prod(2, 3, 4)"), 24)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import os, sys
+import re
+import json
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.lexer import Tokenizer, START
+from calc.parse import shunting_yard
+
+def _test_corpus():
+    """Every expression string passed to calc() / compile() in the test files"""
+    corpus = []
+    for name in sorted(os.listdir(current)):
+        if name.endswith(".py"):
+            with open(os.path.join(current, name)) as f:
+                corpus += re.findall(r'(?:calc|compile)\("([^"]*)"\)', f.read())
+    return corpus
+
+EXTRA_CORPUS = [
+    "", ",", "-3^2", "-3**2", "2*-3^2", "-0x10^2", "-3.5e2^2", "1e5-3", "1e+5+3", "1.e5", "1e5.3",
+    "(-(1))", "(-", "-", "+", "1+", "0x", "-0x", "0b2", "0b", "2²", "ij", "1i+2j", "i^2",
+    "sqrt2*pi", "abc_1(2)", "max ( 1 , 2 )", "1 2", "1//2**3%4", "[1,[2]]", "((1)", "[1,2",
+    "1+(2)]", "*2", "2*", "+-+-1", "1+-2", "e^-2", "5 %% 2", "x", "sin", "sin 1", "0.5.5", "1..2",
+    "-(-(-(1)))", "3(4)", "[1]2", "cos(-[1, 2])", "1e-5i", "0xffj", "9" * 50,
+    "[1,2][-1]", "[1][0][0]", "x[1:]", "[1,2][::+1]", "[1][:", "[1]:", "[1][1,2]", "[1][[1]]",
+    "[1,2][1]:", "(1)[0]", "[[1][0]]", "[1,2][ -1 : ]", "sin[1]", "1 [0]",
+]
+
+# Expected (token type, consumed) pairs, or the error message
+EXPECTED_TOKENS = {
+    "-3^2": [("MinusOrPlusSignToken", "-"), ("NumberToken", "3"), ("BinOpToken", "^"), ("NumberToken", "2")],
+    "2*-3^2": [("NumberToken", "2"), ("BinOpToken", "*"), ("MinusOrPlusSignToken", "-"), ("NumberToken", "3"),
+        ("BinOpToken", "^"), ("NumberToken", "2")],
+    "-0x10^2": [("HexNumberToken", "-0x10"), ("BinOpToken", "^"), ("NumberToken", "2")],
+    "1e+5+3": [("NumberToken", "1e+5"), ("BinOpToken", "+"), ("NumberToken", "3")],
+    "1i+2j": [("NumberToken", "1i"), ("BinOpToken", "+"), ("NumberToken", "2j")],
+    "1+-2": [("NumberToken", "1"), ("BinOpToken", "+"), ("NumberToken", "-2")],
+    "e^-2": [("ConstantOrFunctionToken", "e"), ("BinOpToken", "^"), ("NumberToken", "-2")],
+    "1//2**3%4": [("NumberToken", "1"), ("BinOpToken", "//"), ("NumberToken", "2"), ("BinOpToken", "**"),
+        ("NumberToken", "3"), ("BinOpToken", "%"), ("NumberToken", "4")],
+    "0b101": [("BinNumberToken", "0b101")],
+    "[1,2][ -1 : ]": [("VectorToken", "["), ("NumberToken", "1"), ("CommaToken", ","), ("NumberToken", "2"),
+        ("VectorToken", "]"), ("IndexToken", "["), ("NumberToken", "-1"), ("ColonToken", ":"), ("IndexToken", "]")],
+    "[1,2][::+1]": [("VectorToken", "["), ("NumberToken", "1"), ("CommaToken", ","), ("NumberToken", "2"),
+        ("VectorToken", "]"), ("IndexToken", "["), ("ColonToken", ":"), ("ColonToken", ":"), ("NumberToken", "+1"),
+        ("IndexToken", "]")],
+    "0b2": "Unknown input at char 0: '0'",
+    "5 %% 2": "Unknown input at char 2: '%'",
+    "((1)": "Mismatched paren: Missing closing ')'",
+    "1+(2)]": "Extraneous ']' at position 5",
+    "[1][1,2]": "Unexpected ',' in index at position 5",
+    "[1]:": "Unknown input at char 3: ':'",
+}
+
+def _tokenize(expr):
+    """
+    :return: [(type, consumed)...], or the error message
+    """
+    t = Tokenizer(expr)
+    try:
+        t.tokenize()
+    except RuntimeError as e:
+        return str(e)
+    return [(type(token).__name__, token.consumed) for token in t.tokens]
+
+class TestTokenizer(unittest.TestCase):
+    def test_matches_reference_lexer(self):
+        """
+        lexer_corpus.json has random (and partly corrupted) expressions with the tokens, or
+        the error type, that the scan() based tokenizer this one replaced gave for them.
+        Its IndexError / KeyError crashes were bugs, the dispatch tokenizer raises RuntimeError
+        """
+        with open(os.path.join(current, "lexer_corpus.json")) as f:
+            corpus = json.load(f)
+        self.assertGreater(len(corpus), 100)
+        for expr, expected in corpus:
+            with self.subTest(expr=expr):
+                t = Tokenizer(expr)
+                try:
+                    t.tokenize()
+                    result = [[type(token).__name__, token.consumed] for token in t.tokens]
+                except (RuntimeError, ValueError) as e:
+                    result = type(e).__name__
+                if expected in ["IndexError", "KeyError"]:
+                    expected = "RuntimeError"
+                self.assertEqual(result, expected)
+
+    def test_expected_tokens(self):
+        for expr, expected in EXPECTED_TOKENS.items():
+            with self.subTest(expr=expr):
+                self.assertEqual(_tokenize(expr), expected)
+
+    def test_corpus(self):
+        """Every expression either tokenizes or raises RuntimeError"""
+        corpus = _test_corpus() + EXTRA_CORPUS
+        self.assertGreater(len(corpus), 100)
+        for expr in corpus:
+            with self.subTest(expr=expr):
+                try:
+                    Tokenizer(expr).tokenize()
+                except RuntimeError:
+                    pass
+
+    def test_token_stream(self):
+        t = Tokenizer("-3^2 + max(1, [2])")
+        t.tokenize()
+        self.assertEqual([token.consumed for token in t.tokens],
+            ["-", "3", "^", "2", "+", "max", "(", "1", ",", "[", "2", "]", ")"])
+
+    def test_index_tokens(self):
+        t = Tokenizer("[1, 2][-1:][0]")
+        t.tokenize()
+        self.assertEqual([type(token).__name__ for token in t.tokens], ["VectorToken", "NumberToken", "CommaToken",
+            "NumberToken", "VectorToken", "IndexToken", "NumberToken", "ColonToken", "IndexToken", "IndexToken",
+            "NumberToken", "IndexToken"])
+
+    def test_unbalanced(self):
+        with self.assertRaises(RuntimeError, msg="Mismatched paren"):
+            Tokenizer("(1 + 2").tokenize()
+        with self.assertRaises(RuntimeError, msg="Extraneous paren"):
+            Tokenizer("1 + 2]").tokenize()
+
+    def test_compact_tokens(self):
+        """Tokens are slotted, START is shared between programs"""
+        t = Tokenizer("sin(x) + [1, -2]^2", allow_variables=True)
+        t.tokenize()
+        self.assertFalse(any(hasattr(token, "__dict__") for token in t.tokens))
+        self.assertIs(shunting_yard(t)[0], START)
+        self.assertEqual([token.argc for token in t.tokens[:5]], [1, -1, 0, -1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
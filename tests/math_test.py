@@ -5,7 +5,8 @@ current = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.dirname(current))
 
 from calc.vector import Vector
-from calc.parse import calc
+from calc.parse import calc, compile, set_cache_size, clear_cache, cache_info, set_budget, DEFAULT_CACHE_SIZE
+from calc.budget import Budget, BudgetExceededError, DEFAULT_BUDGET
 
 i = (-1) ** 0.5
 
@@ -78,11 +79,48 @@ class TestParseMethods(unittest.TestCase):
         self.assertEqual(calc("+(1 + 2)"), 3)
         self.assertEqual(calc("1 + -(2 + 3)"), -4)
 
+    def test_start_tokens(self):
+        """Only function calls and vectors consume a START token"""
+        self.assertEqual(calc("5 + sum(1+2, 3)"), 11)
+        self.assertEqual(calc("sum(1, (sum(2,3)))"), 6)
+        self.assertEqual(calc("max((1), 2)"), 2)
+        self.assertEqual(calc("2*[1+2, 3]").items, [6, 6])
+
     def test_vector(self):
         self.assertArrayAlmostEqual(calc("[1, 2, 3] + 1").items, [2, 3, 4])
         self.assertArrayAlmostEqual(calc("[1, 2, 3] + [1, 2, 3]").items, [2, 4, 6])
         self.assertArrayAlmostEqual(calc("-[1, 2]").items, [-1, -2])
 
+    def test_index_and_slice(self):
+        self.assertEqual(calc("[1, 2, 3][0]"), 1)
+        self.assertEqual(calc("[1, 2, 3][-1] * 2 + 1"), 7)
+        self.assertEqual(calc("-[1, 2, 3][1]"), -2)
+        self.assertEqual(calc("2^[1, 2, 3][1 + 1]"), 8)
+        self.assertEqual(calc("[1, 2, 3, 4, 5][1:3]").items, [2, 3])
+        self.assertEqual(calc("[1, 2, 3, 4, 5][::2]").items, [1, 3, 5])
+        self.assertEqual(calc("[1, 2, 3, 4, 5][-2:]").items, [4, 5])
+        self.assertEqual(calc("[1, 2, 3, 4, 5][:-2:-2]").items, [5])
+        self.assertEqual(calc("[1, 2, 3, 4, 5][::-1][1:][::2]").items, [4, 2])
+        self.assertEqual(calc("sum([1, 2, 3, 4][1:]) + [1, 2][:1][0]"), 10)
+        self.assertEqual(calc("max([1, 2][0], 3)"), 3)
+
+        with self.assertRaises(RuntimeError, msg="Index out of range"):
+            calc("[1, 2, 3][3]")
+        with self.assertRaises(RuntimeError, msg="Empty slice"):
+            calc("[1, 2, 3][5:]")
+        with self.assertRaises(RuntimeError, msg="Empty index"):
+            calc("[1, 2, 3][]")
+        with self.assertRaises(RuntimeError, msg="Too many colons"):
+            calc("[1, 2, 3][1:2:3:4]")
+        with self.assertRaises(RuntimeError, msg="Zero step"):
+            calc("[1, 2, 3][::0]")
+        with self.assertRaises(RuntimeError, msg="Non int index"):
+            calc("[1, 2, 3][0.5]")
+        with self.assertRaises(RuntimeError, msg="Index of a number"):
+            calc("pi[1]")
+        with self.assertRaises(RuntimeError, msg="Colon outside an index"):
+            calc("1:2")
+
     def test_numbers(self):
         self.assertAlmostEqual(calc("-1"), -1)
         self.assertAlmostEqual(calc("-1.5e-5"), -1.5e-5)
@@ -203,7 +241,150 @@ class TestParseMethods(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             calc("cross([1,2,3,4],[1,2,3,4])")
         self.assertEqual(calc("cross([1,2,3],[4,5,6])").items, [-3, 6, -3])
-        
+
+    def test_compile(self):
+        expr = compile("1 + 2 * 3^5")
+        self.assertEqual(expr.evaluate(), 487)
+        self.assertEqual(expr.evaluate(), 487)
+        self.assertEqual(expr.expr, "1 + 2 * 3^5")
+        self.assertIsInstance(expr.program, tuple)
+        self.assertArrayAlmostEqual(compile("sqrt([1, 4, 16])").evaluate().items, [1, 2, 4])
+        with self.assertRaises(AttributeError):
+            expr.program = ()
+        with self.assertRaises(RuntimeError):
+            compile("(1+2))")
+
+    def test_constant_folding(self):
+        self.assertEqual(len(compile("shulker*27 + stack*3").program), 1)
+        self.assertEqual(compile("shulker*27 + stack*3").evaluate(), 1728 * 27 + 64 * 3)
+        self.assertAlmostEqual(compile("2*pi*sqrt2").evaluate(), 2 * 3.14159265358979 * 2 ** 0.5)
+
+        # rand() is impure so it is never folded, but its constant arguments are
+        expr = compile("rand(1, 3) + 2 * 3")
+        self.assertLess(len(expr.program), len(compile("rand(1, 3) + 2 * 3", optimize=False).program))
+        self.assertTrue(any(token.consumed == "rand" for token in expr.program))
+        self.assertIn(expr.evaluate(), [7, 8, 9])
+
+        # Errors are still raised at evaluation time
+        expr = compile("1 + 1/0")
+        with self.assertRaises(ZeroDivisionError):
+            expr.evaluate()
+        with self.assertRaises(RuntimeError):
+            compile("atan2(1)").evaluate()
+
+    def test_folded_results_not_shared(self):
+        """Changing a folded vector or matrix result doesn't change later results"""
+        result = calc("[1, 2, 3]")
+        result.items[0] = 99
+        self.assertEqual(calc("[1, 2, 3]").items, [1, 2, 3])
+        for native in (False, True):
+            for expr, value in [("[1, 2, 3]", [1, 2, 3]), ("[1, 2, 3][1:]", [2, 3]), ("[[1, 2], [3, 4]][0]", [1, 2])]:
+                compiled = compile(expr, native=native)
+                result = compiled.evaluate()
+                result.items[0] = 99
+                self.assertEqual(compiled.evaluate().items, value)
+            compiled = compile("[[1, 2], [x, 1]]", native=native)
+            compiled.evaluate(1).rows[0][0] = 99
+            self.assertEqual(compiled.evaluate(1).rows, [[1, 2], [1, 1]])
+
+    def test_variables(self):
+        expr = compile("x^2 + y")
+        self.assertEqual(expr.variables, ("x", "y"))
+        self.assertEqual(expr.evaluate(x=3, y=4), 13)
+        self.assertEqual(expr.evaluate(3, 4), 13)
+        self.assertEqual(expr.evaluate(3, y=-9), 0)
+        self.assertEqual([expr.evaluate(x, 1) for x in range(4)], [1, 2, 5, 10])
+        self.assertEqual(compile("max(x, 2 * 3) + pi_ish").evaluate(x=10, pi_ish=1), 11)
+        self.assertEqual(compile("x + [1, 2]").evaluate(x=1).items, [2, 3])
+        self.assertEqual(compile("-x^2").evaluate(3), -9)
+
+        with self.assertRaises(RuntimeError, msg="Missing variable"):
+            expr.evaluate(x=3)
+        with self.assertRaises(RuntimeError, msg="Unknown variable"):
+            expr.evaluate(x=3, y=4, z=5)
+        with self.assertRaises(RuntimeError, msg="Too many values"):
+            expr.evaluate(1, 2, 3)
+        with self.assertRaises(RuntimeError, msg="calc() has no variables"):
+            calc("x + 1")
+
+    def test_program_cache(self):
+        clear_cache()
+        set_cache_size(2)
+        try:
+            self.assertEqual(calc("64 * 27"), 1728)
+            self.assertEqual(calc("64*27"), 1728) # Same key once whitespace is removed
+            self.assertEqual(calc("shulker*3"), 5184)
+            self.assertEqual(calc("sqrt(4)"), 2)
+            info = cache_info()
+            self.assertEqual((info.hits, info.misses, info.evictions, info.size), (1, 3, 1, 2))
+
+            # Only the parsed program is cached, not the result
+            results = set(calc("urand()") for _ in range(10))
+            self.assertGreater(len(results), 1)
+
+            set_cache_size(0)
+            calc("1 + 1")
+            calc("1 + 1")
+            self.assertEqual(cache_info().size, 0)
+        finally:
+            set_cache_size(DEFAULT_CACHE_SIZE)
+            clear_cache()
+
+    def test_budget(self):
+        """Over budget expressions are rejected before they are evaluated"""
+        for expr in ["9^(9^9)", "10^(10^7)", "exp2(10^7)", "modpow(3, 10^5000, 10^5000 + 1)",
+                "prod(2^(2^19), 2^(2^19), 2)", "[1, 2^(2^19)] ** 4", "(2^(2^20)) * 2"]:
+            with self.assertRaises(BudgetExceededError, msg=expr):
+                calc(expr)
+        self.assertEqual(calc("9^9^9"), 9 ** 81) # Left associative
+        self.assertEqual(calc("modpow(3, 10^100, 10^9 + 7)"), pow(3, 10 ** 100, 10 ** 9 + 7))
+        self.assertEqual(calc("2.0 ^ 0.5"), 2 ** 0.5)
+        self.assertEqual(calc("(2 ^ (2^20)) % 7", budget=None), pow(2, 2 ** 20, 7))
+        with self.assertRaises(BudgetExceededError, msg="Exponent too large for a float"):
+            calc("2^(10^400)")
+
+        # The estimate is the exact bit length, so folding doesn't change what is accepted
+        for base, exponent in [(2, 2 ** 20 - 1), (3, 661577)]:
+            self.assertEqual(calc(f"{base}^{exponent}"), base ** exponent)
+            self.assertEqual(calc(f"{base}^({exponent} + floor(urand()))"), base ** exponent) # Not folded
+            for expr in [f"{base}^{exponent + 1}", f"{base}^({exponent + 1} + floor(urand()))"]:
+                with self.assertRaises(BudgetExceededError, msg=expr):
+                    calc(expr)
+
+        tight = Budget(max_bits=64, max_vector_length=3, max_steps=10)
+        self.assertEqual(calc("2^63", budget=tight), 2 ** 63)
+        with self.assertRaises(BudgetExceededError, msg="Folded value"):
+            calc("2^100", budget=tight)
+        with self.assertRaises(BudgetExceededError, msg="Vector length"):
+            calc("[1, 2, 3, 4]", budget=tight)
+        with self.assertRaises(BudgetExceededError, msg="Program length"):
+            calc("urand() + " * 5 + "1", budget=tight)
+        with self.assertRaises(BudgetExceededError, msg="Vector steps"):
+            calc("sin([1, 2, 3] * urand()) * 2", budget=tight)
+
+    def test_modpow_budget(self):
+        """modpow results are modulus sized, its time is charged as steps"""
+        self.assertEqual(calc("modpow(3, 2^2048 - 1, 2^2048 + 1)"), pow(3, 2 ** 2048 - 1, 2 ** 2048 + 1))
+        self.assertEqual(calc("modpow(3, 2^(2^16), 7)"), pow(3, 2 ** 2 ** 16, 7))
+        with self.assertRaises(BudgetExceededError, msg="Large exponent and modulus"):
+            calc("modpow(3, 2^20000, 2^20000 + 1)")
+        with self.assertRaises(BudgetExceededError, msg="Steps"):
+            calc("modpow(3, 2^2048 - floor(urand()), 2^2048 + 1)", budget=Budget(max_steps=1000))
+
+    def test_folding_budget(self):
+        """Constants are folded within the budget in use, not the default one"""
+        tight = Budget(max_bits=64)
+        clear_cache()
+        try:
+            set_budget(tight)
+            with self.assertRaises(BudgetExceededError):
+                calc("2^100")
+            self.assertEqual(compile("2^100 + x").evaluate(1), 2 ** 100 + 1) # Left unfolded
+            self.assertEqual(len(compile("2^100 + x").program), 5)
+        finally:
+            set_budget(DEFAULT_BUDGET)
+            clear_cache()
+        self.assertEqual(len(compile("2^100 + x").program), 3) # 2^100 folded to one token
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import os, sys
+import pickle
+import random
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.parse import calc, compile
+from calc.format import format
+from calc.matrix import Matrix
+from calc.vector import Vector
+from calc import matrix, nputil
+
+def _random_matrix(n, m, f):
+    return Matrix([[f() for _ in range(m)] for _ in range(n)])
+
+class TestMatrix(unittest.TestCase):
+    def assertRowsAlmostEqual(self, a, b):
+        self.assertEqual(len(a), len(b))
+        for row_a, row_b in zip(a, b):
+            self.assertEqual(len(row_a), len(row_b))
+            for x, y in zip(row_a, row_b):
+                self.assertAlmostEqual(x, y, places=7)
+
+    def test_literal(self):
+        m = calc("[[1, 2], [3, 4]]")
+        self.assertIsInstance(m, Matrix)
+        self.assertEqual(m.rows, [[1, 2], [3, 4]])
+        self.assertEqual(m.shape, (2, 2))
+        self.assertEqual(format(m), "[[1, 2], [3, 4]]")
+        self.assertEqual(format(calc("[[1, 2], [3, 4], [5, 6]]"), max_items=1), "[[1, 2], … 2 more]")
+        self.assertEqual(calc("[[1, 2], [3, 4]][1]").items, [3, 4])
+        self.assertEqual(calc("[[1, 2], [3, 4]][::-1]").rows, [[3, 4], [1, 2]])
+
+        with self.assertRaises(RuntimeError, msg="Ragged rows"):
+            calc("[[1, 2], [3]]")
+        with self.assertRaises(RuntimeError, msg="Vectors and numbers mixed"):
+            calc("[[1, 2], 3]")
+        with self.assertRaises(RuntimeError, msg="Matrices aren't items"):
+            calc("[[[1]]]")
+
+    def test_element_wise(self):
+        self.assertEqual(calc("[[1, 2], [3, 4]] * 2 + 1").rows, [[3, 5], [7, 9]])
+        self.assertEqual(calc("10 - [[1, 2], [3, 4]]").rows, [[9, 8], [7, 6]])
+        self.assertEqual(calc("-[[1, 2]]").rows, [[-1, -2]])
+        self.assertEqual(calc("[[1, 2], [3, 4]] - [[1, 1], [1, 1]]").rows, [[0, 1], [2, 3]])
+        self.assertEqual(calc("sqrt([[4, 9]])").rows, [[2, 3]])
+        self.assertEqual(calc("sum([[1, 2], [3, 4]])").items, [4, 6]) # Sum of the rows
+
+        with self.assertRaises(RuntimeError, msg="Shapes differ"):
+            calc("[[1, 2]] + [[1], [2]]")
+        with self.assertRaises(RuntimeError, msg="Matrix and vector"):
+            calc("[[1, 2]] + [1, 2]")
+
+    def test_reductions(self):
+        """Reducing functions take the rows, like len() and a vector of vectors"""
+        m = calc("[[1, 2], [3, 4], [5, 6]]")
+        self.assertEqual(calc("len([[1, 2], [3, 4], [5, 6]])"), len(m))
+        self.assertEqual(calc("len([[1, 2], [3, 4], [5, 6]])"), 3)
+        self.assertEqual(calc("prod([[1, 2], [3, 4], [5, 6]])").items, [15, 48])
+        self.assertEqual(calc("sum([[1, 2], [3, 4]])").items, calc("sum([1, 2], [3, 4])").items)
+        self.assertEqual(calc("len([[1, 2, 3]])"), 1)
+        big = Matrix([[1, 2]] * 40) # NumPy sized
+        self.assertEqual(compile("len(x)").evaluate(big), 40)
+        self.assertEqual(compile("sum(x)").evaluate(big).items, [40, 80])
+
+    def test_functions(self):
+        self.assertEqual(calc("matmul([[1, 2], [3, 4]], [[5, 6], [7, 8]])").rows, [[19, 22], [43, 50]])
+        self.assertEqual(calc("matmul([[1, 2], [3, 4]], [1, 1])").items, [3, 7])
+        self.assertEqual(calc("matmul([1, 1], [[1, 2], [3, 4]])").items, [4, 6])
+        self.assertEqual(calc("transpose([[1, 2, 3], [4, 5, 6]])").rows, [[1, 4], [2, 5], [3, 6]])
+        self.assertEqual(calc("transpose([1, 2])").rows, [[1], [2]])
+        self.assertEqual(calc("det([[1, 2], [3, 4]])"), -2)
+        self.assertEqual(calc("det([[0, 1, 2], [1, 0, 3], [4, -3, 8]])"), -2)
+        self.assertEqual(calc("det([[1, 2], [2, 4]])"), 0)
+        self.assertAlmostEqual(calc("det([[1.5, 2], [3, 5]])"), 1.5)
+        self.assertEqual(calc("inv([[1, 2], [3, 4]])").rows, [[-2, 1], [1.5, -0.5]]) # Exact for ints
+        self.assertRowsAlmostEqual(calc("inv([[4.0, 7], [2, 6]])").rows, [[0.6, -0.7], [-0.2, 0.4]])
+        self.assertRowsAlmostEqual([calc("solve([[2, 1], [1, 3]], [3, 5])").items], [[0.8, 1.4]])
+        self.assertRowsAlmostEqual(calc("solve([[2, 1], [1, 3]], [[3], [5]])").rows, [[0.8], [1.4]])
+
+        with self.assertRaises(RuntimeError, msg="Singular"):
+            calc("inv([[1, 2], [2, 4]])")
+        with self.assertRaises(RuntimeError, msg="Not square"):
+            calc("det([[1, 2, 3], [4, 5, 6]])")
+        with self.assertRaises(RuntimeError, msg="Shapes don't match"):
+            calc("matmul([[1, 2]], [[1, 2]])")
+        with self.assertRaises(RuntimeError, msg="Not a matrix"):
+            calc("det(2)")
+
+    def test_det_exact(self):
+        """Small int matrices give exact determinants even when floats would round"""
+        m = Matrix([[10 ** 20 + 1, 10 ** 20], [10 ** 20, 10 ** 20 - 1]])
+        self.assertEqual(matrix.det(m), -1)
+
+    def test_pickle(self):
+        m = calc("[[1, 2], [3, 4]]")
+        self.assertEqual(pickle.loads(pickle.dumps(m)).rows, m.rows)
+        self.assertFalse(hasattr(m, "__dict__"))
+
+@unittest.skipIf(nputil.numpy() is None, "numpy is not installed")
+class TestNumpyMatrix(unittest.TestCase):
+    """Large matrices run in NumPy and should match the pure Python results"""
+    n = matrix.NUMPY_THRESHOLD + 1
+
+    def assertSameResult(self, f):
+        threshold = matrix.NUMPY_THRESHOLD
+        try:
+            expected = f()
+            matrix.NUMPY_THRESHOLD = 10 ** 9
+            actual = f()
+        finally:
+            matrix.NUMPY_THRESHOLD = threshold
+        if isinstance(expected, Matrix):
+            expected, actual = expected.rows, actual.rows
+        elif isinstance(expected, Vector):
+            expected, actual = [expected.items], [actual.items]
+        else:
+            expected, actual = [[expected]], [[actual]]
+        for row_a, row_b in zip(expected, actual):
+            for x, y in zip(row_a, row_b):
+                self.assertLess(abs(x - y), 1e-6 * max(1, abs(y)))
+
+    def test_matches_python(self):
+        random.seed(0)
+        a = _random_matrix(self.n, self.n, random.random)
+        b = _random_matrix(self.n, self.n, lambda: random.randint(-9, 9))
+        v = Vector([random.random() for _ in range(self.n)])
+        self.assertSameResult(lambda: matrix.matmul(a, b))
+        self.assertSameResult(lambda: matrix.matmul(a, v))
+        self.assertSameResult(lambda: matrix.det(a))
+        self.assertSameResult(lambda: matrix.inv(a))
+        self.assertSameResult(lambda: matrix.solve(a, v))
+        self.assertSameResult(lambda: matrix.transpose(matrix.matmul(b, b)))
+        self.assertSameResult(lambda: matrix.matmul(a, b) * 2 + 1)
+
+    def test_int_overflow(self):
+        """Int products that don't fit in int64 are done with Python ints"""
+        m = _random_matrix(self.n, self.n, lambda: 2 ** 40)
+        self.assertEqual(matrix.matmul(m, m).rows[0][0], 2 ** 80 * self.n)
+
+    def test_singular(self):
+        with self.assertRaises(RuntimeError):
+            matrix.inv(_random_matrix(self.n, self.n, lambda: 1))
+
+if __name__ == '__main__':
+    unittest.main()
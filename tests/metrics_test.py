@@ -0,0 +1,63 @@
+import unittest
+import os, sys
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc import metrics
+from calc.parse import calc, clear_cache
+from calc.format import format
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        clear_cache()
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_disabled(self):
+        format(calc("sin(1)"))
+        snap = metrics.snapshot()
+        self.assertEqual(snap["calls"], 0)
+        self.assertEqual(snap["phases"]["format"].count, 0)
+
+    def test_enabled(self):
+        metrics.enable()
+        for expr in ["sin(1) + sin(2)", "sin(1)+sin(2)", "foo(1)", "bar(2)", "[1, 2, 3] * max(1, 2)"]:
+            try:
+                format(calc(expr))
+            except RuntimeError:
+                pass
+        snap = metrics.snapshot()
+        self.assertEqual((snap["calls"], snap["cache_hits"]), (5, 1))
+        self.assertEqual(snap["phases"]["tokenize"].count, 2) # Cache hit and errors aren't tokenized
+        self.assertEqual(snap["phases"]["format"].count, 3)
+        self.assertEqual(snap["tokens"].sum, 9 + 14)
+        self.assertEqual(snap["vector_lengths"].sum, 3)
+        self.assertEqual(snap["function_occurrences"], {}) # Constant calls are folded away
+        self.assertEqual(snap["errors"], {("RuntimeError", "Unknown function '?'"): 2})
+
+    def test_function_occurrences(self):
+        """Function tokens of the program are counted, not the text or each call"""
+        metrics.enable()
+        expr = "sum(sin([1, 2, 3] * urand())) + sin(1) + 2sin(urand())"
+        calc(expr)
+        calc(expr) # Cached program, still counted
+        self.assertEqual(metrics.snapshot()["function_occurrences"], {"sum": 2, "sin": 4, "urand": 4})
+        calc("max([1, 2]) * urand()")
+        self.assertEqual(metrics.snapshot()["function_occurrences"]["urand"], 5)
+        self.assertNotIn("max", metrics.snapshot()["function_occurrences"])
+
+    def test_prometheus(self):
+        metrics.enable()
+        calc("sin(urand())")
+        text = metrics.export_prometheus()
+        self.assertIn("# TYPE calc_phase_seconds histogram\n", text)
+        self.assertIn('calc_phase_seconds_bucket{phase="evaluate",le="+Inf"} 1\n', text)
+        self.assertIn('calc_function_occurrences_total{function="sin"} 1\n', text)
+        self.assertIn("calc_calls_total 1\n", text)
+
+if __name__ == '__main__':
+    unittest.main()
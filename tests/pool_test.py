@@ -0,0 +1,88 @@
+import unittest
+import os, sys
+import time
+import threading
+from unittest import mock
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.pool import WorkerPool, EvaluationTimeoutError
+from calc.budget import BudgetExceededError
+
+class TestWorkerPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = WorkerPool(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_results(self):
+        self.assertEqual(self.pool.calc("1 + 1", 10), 2)
+        self.assertEqual(self.pool.calc("[1, 2] * 3", 10).items, [3, 6])
+
+    def test_errors(self):
+        with self.assertRaises(RuntimeError, msg="Unknown function"):
+            self.pool.calc("foo(1)", 10)
+        with self.assertRaises(BudgetExceededError):
+            self.pool.calc("9^(9^9)", 10)
+
+    def test_timeout(self):
+        """The worker is killed and replaced, the pool keeps working"""
+        start = time.perf_counter()
+        with self.assertRaises(EvaluationTimeoutError):
+            self.pool.calc("3^(10^8)", 0.2, budget=None)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(self.pool.calc("2 + 2", 10), 4)
+
+class TestWorkerPoolReplace(unittest.TestCase):
+    def test_replacement_fails(self):
+        """A killed worker that can't be replaced is not returned to the pool"""
+        pool = WorkerPool(2)
+        try:
+            with mock.patch("calc.pool._Worker", side_effect=OSError("Too many processes")):
+                with self.assertRaises(EvaluationTimeoutError):
+                    pool.calc("3^(10^8)", 0.2, budget=None)
+            self.assertEqual(pool.size, 1)
+            self.assertEqual(pool.calc("2 + 2", 10), 4)
+            with mock.patch("calc.pool._Worker", side_effect=OSError("Too many processes")):
+                with self.assertRaises(EvaluationTimeoutError):
+                    pool.calc("3^(10^8)", 0.2, budget=None)
+            self.assertEqual(pool.size, 0)
+            with self.assertRaises(RuntimeError) as cm: # Instead of waiting forever
+                pool.calc("2 + 2", 10)
+            self.assertEqual(str(cm.exception), "Worker pool has no workers left")
+        finally:
+            pool.close()
+
+class TestWorkerPoolClose(unittest.TestCase):
+    def test_close_wakes_waiters(self):
+        """Callers waiting for a busy worker raise instead of waiting forever"""
+        pool = WorkerPool(1)
+        errors = []
+        def wait_for_worker():
+            try:
+                pool.calc("1 + 1", 10)
+            except RuntimeError as e:
+                errors.append(e)
+        busy = threading.Thread(target=lambda: self.assertRaises(EvaluationTimeoutError,
+            pool.calc, "3^(10^8)", 2, budget=None))
+        busy.start()
+        time.sleep(0.5)
+        waiters = [threading.Thread(target=wait_for_worker, daemon=True) for _ in range(3)]
+        for thread in waiters:
+            thread.start()
+        time.sleep(0.2)
+        pool.close()
+        for thread in waiters:
+            thread.join(1)
+            self.assertFalse(thread.is_alive())
+        busy.join()
+        self.assertEqual([str(e) for e in errors], ["Worker pool is closed"] * 3)
+        with self.assertRaises(RuntimeError):
+            pool.calc("1 + 1", 10)
+
+if __name__ == '__main__':
+    unittest.main()
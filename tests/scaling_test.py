@@ -0,0 +1,50 @@
+import unittest
+import os, sys
+import time
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.lexer import Tokenizer
+from calc.parse import shunting_yard, evaluate, compile, calc, clear_cache
+
+def workloads(n):
+    return {
+        "long sum": "+".join("1" for _ in range(n // 2)),
+        "deep parens": "(" * (n // 2) + "1" + ")" * (n // 2),
+        "nested sums": "(1+" * (n // 4) + "1" + ")" * (n // 4),
+        "vector literal": "[" + ",".join("1" for _ in range(n // 2)) + "]",
+    }
+
+def time_calc(expr):
+    start = time.perf_counter()
+    t = Tokenizer(expr)
+    t.tokenize()
+    evaluate(shunting_yard(t))
+    return time.perf_counter() - start
+
+def time_compile(n):
+    """compile() and calc() with constant folding, whose unfolded subtrees grow with n"""
+    start = time.perf_counter()
+    compile("+".join("x" for _ in range(n // 2)))
+    clear_cache()
+    calc("rand(1)" + "+1" * (n // 2), budget=None)
+    return time.perf_counter() - start
+
+class TestScaling(unittest.TestCase):
+    def test_linear_time(self):
+        """10x more tokens should take about 10x as long (a quadratic path would be ~100x)"""
+        small, large = workloads(10_000), workloads(100_000)
+        for name in small:
+            with self.subTest(workload=name):
+                t_small = min(time_calc(small[name]) for _ in range(3))
+                t_large = time_calc(large[name])
+                self.assertLess(t_large / t_small, 30)
+
+    def test_linear_folding(self):
+        t_small = min(time_compile(10_000) for _ in range(3))
+        t_large = time_compile(100_000)
+        self.assertLess(t_large / t_small, 30)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os, sys
+import pickle
+import tracemalloc
+
+current = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.dirname(current))
+
+from calc.parse import calc, compile
+from calc.format import format
+from calc.budget import Budget, BudgetExceededError
+from calc.sequence import Arithmetic, Mapped
+
+class TestSequence(unittest.TestCase):
+    def test_range(self):
+        self.assertEqual(calc("range(5)").items, [0, 1, 2, 3, 4])
+        self.assertEqual(calc("range(1, 10, 3)").items, [1, 4, 7])
+        self.assertEqual(calc("range(10, 0, -3)").items, [10, 7, 4, 1])
+        self.assertEqual(calc("range(0, 1, 0.25)").items, [0, 0.25, 0.5, 0.75])
+        self.assertEqual(calc("range(1e3)").items, list(range(1000))) # Integral floats act as ints
+        self.assertEqual(calc("linspace(0, 1, 5)").items, [0, 0.25, 0.5, 0.75, 1])
+        self.assertEqual(calc("linspace(2, 2, 1)").items, [2])
+        self.assertEqual(format(calc("range(3)")), "[0, 1, 2]")
+        self.assertIsInstance(calc("range(3)"), Arithmetic)
+
+        with self.assertRaises(RuntimeError, msg="Empty range"):
+            calc("range(0)")
+        with self.assertRaises(RuntimeError, msg="Zero step"):
+            calc("range(1, 5, 0)")
+        with self.assertRaises(RuntimeError, msg="Complex argument"):
+            calc("range(1 + i)")
+        with self.assertRaises(RuntimeError, msg="Too many arguments"):
+            calc("range(1, 2, 3, 4)")
+        with self.assertRaises(RuntimeError, msg="Fractional count"):
+            calc("linspace(0, 1, 2.5)")
+
+    def test_lazy_operations(self):
+        self.assertIsInstance(calc("range(5) * 2 + 1"), Arithmetic)
+        self.assertEqual(calc("range(5) * 2 + 1").items, [1, 3, 5, 7, 9])
+        self.assertEqual(calc("10 - range(3)").items, [10, 9, 8])
+        self.assertEqual(calc("-range(3)").items, [0, -1, -2])
+        self.assertEqual(calc("range(3) + range(3)").items, [0, 2, 4])
+        self.assertEqual(calc("range(4) / 2").items, [0, 0.5, 1, 1.5])
+        self.assertEqual(calc("range(3) ^ 2").items, [0, 1, 4])
+        self.assertEqual(calc("range(3) + [1, 1, 1]").items, [1, 2, 3])
+        self.assertIsInstance(calc("sqrt(range(3))"), Mapped)
+        self.assertEqual(calc("floor(range(0, 2, 0.5))").items, [0, 0, 1, 1])
+        self.assertEqual(calc("range(100)[10:20:5]").items, [10, 15])
+        self.assertEqual(calc("(range(10) ^ 2)[::-3]").items, [81, 36, 9, 0])
+        self.assertEqual(calc("range(10)[-1]"), 9)
+
+        with self.assertRaises(RuntimeError, msg="Lengths differ"):
+            calc("range(3) + range(4)")
+        with self.assertRaises(RuntimeError, msg="Non-numeric results"):
+            calc("c2v(range(2))")
+
+    def test_reductions(self):
+        self.assertEqual(calc("sum(range(1, 101))"), 5050)
+        self.assertEqual(calc("sum(range(1e7))"), sum(range(10 ** 7))) # Closed form
+        self.assertEqual(calc("len(range(1, 1e12, 7))"), len(range(1, 10 ** 12, 7)))
+        self.assertEqual(calc("max(range(1, 1e9) * -1)"), -1)
+        self.assertEqual(calc("min(range(10, 0, -3))"), 1)
+        self.assertEqual(calc("prod(range(1, 11))"), 3628800)
+        self.assertEqual(calc("sum(range(0, 1, 0.25))"), 1.5)
+        self.assertEqual(calc("sum(range(5) ^ 2)"), 30)
+        self.assertAlmostEqual(calc("abs(range(3))"), 5 ** 0.5)
+
+    def test_constant_memory(self):
+        """Streaming reductions don't store the items"""
+        tracemalloc.start()
+        try:
+            self.assertEqual(calc("max(range(1e6) % 1000)", budget=None), 999)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 100000)
+
+    def test_budget(self):
+        with self.assertRaises(BudgetExceededError, msg="Result too long to print"):
+            calc("range(1e7)")
+        with self.assertRaises(BudgetExceededError, msg="Too many items to go through"):
+            calc("sum(sqrt(range(1e7)))")
+        with self.assertRaises(BudgetExceededError, msg="Bits estimated from the range bounds"):
+            calc("range(2, 4) ^ (9 ^ 9)")
+        self.assertEqual(calc("sum(sqrt(range(1e3)) * 0)", budget=Budget(max_steps=3000)), 0)
+        self.assertEqual(len(calc("range(1e7)", budget=None)), 10 ** 7)
+
+    def test_compiled(self):
+        for native in (False, True):
+            compiled = compile("sum(range(1, x)) + len(sin(range(x)))", native=native)
+            self.assertEqual(compiled.evaluate(10), 55)
+
+    def test_pickle(self):
+        for expr in ["range(3) * 2", "sin(range(3))"]:
+            value = calc(expr)
+            self.assertEqual(pickle.loads(pickle.dumps(value)).items, value.items)
+        self.assertFalse(hasattr(calc("range(3)"), "__dict__"))
+
+if __name__ == '__main__':
+    unittest.main()
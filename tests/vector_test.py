@@ -1,10 +1,13 @@
 import unittest
 import os, sys
+import pickle
 
 current = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.dirname(current))
 
-from calc.vector import Vector
+from calc.vector import Vector, ArrayVector, VectorView, ARRAY_THRESHOLD, _from_list
+from calc import maths, nputil
+from calc.parse import compile
 
 # Should be in setUp() but whatever
 i = (-1) ** 0.5
@@ -94,6 +97,30 @@ class TestVectorMethods(unittest.TestCase):
         self.assertEqual(b.items, [1, 2, 3])
         self.assertEqual(c.items, [2, 4, 6])
 
+    def test_from_list(self):
+        """The unchecked constructor used for results of element wise operations"""
+        self.assertEqual(_from_list([1, 2.5]).items, [1, 2.5])
+        self.assertIs(type(_from_list([1, 2])), Vector)
+        self.assertEqual(len(_from_list([1] * ARRAY_THRESHOLD)), ARRAY_THRESHOLD)
+
+    def test_slice(self):
+        """Slices are views sharing the parent's items"""
+        v = Vector(list(range(10)))
+        s = v.slice(1, None, 2)
+        self.assertIsInstance(s, VectorView)
+        self.assertIs(s._base, v.items)
+        self.assertEqual(len(s), 5)
+        self.assertEqual(s[-1], 9)
+        self.assertEqual(s.items, [1, 3, 5, 7, 9])
+        self.assertEqual(s.slice(None, None, -2).items, [9, 5, 1])
+        self.assertIs(s.slice(None, None, -2)._base, v.items)
+        self.assertEqual(v.slice(-1, -4, -1).items, [9, 8, 7])
+        self.assertEqual(v.slice(3, None, -1).items, [3, 2, 1, 0])
+        self.assertEqual((s + 1).items, [2, 4, 6, 8, 10])
+        self.assertEqual(pickle.loads(pickle.dumps(s)).items, s.items)
+        with self.assertRaises(RuntimeError):
+            v.slice(5, 5, None)
+
     def test_abs(self):
         self.assertAlmostEqual(abs(a), (1 + 2 ** 2 + 3 ** 2) ** 0.5)
         self.assertAlmostEqual(abs(Vector([-1, -2, -3])), (1 + 2 ** 2 + 3 ** 2) ** 0.5)
@@ -112,5 +139,93 @@ class TestVectorMethods(unittest.TestCase):
         
         self.assertEqual((Vector([1, 2, 3]).cross(Vector([4, 5, 6]))).items, [-3, 6, -3])
 
+    def test_slots_and_pickle(self):
+        self.assertFalse(hasattr(a, "__dict__"))
+        self.assertEqual(pickle.loads(pickle.dumps(a)).items, a.items)
+
+@unittest.skipIf(nputil.numpy() is None, "numpy is not installed")
+class TestArrayVectorMethods(unittest.TestCase):
+    """Large vectors are NumPy backed and should behave like list based ones"""
+    n = ARRAY_THRESHOLD
+
+    def assertArrayAlmostEqual(self, a, b):
+        assert len(a) == len(b)
+        assert all([abs(a[i] - b[i]) < 1e-7 for i in range(len(a))])
+
+    def test_selected_by_size(self):
+        self.assertIsInstance(Vector(list(range(self.n))), ArrayVector)
+        self.assertNotIsInstance(Vector(list(range(self.n - 1))), ArrayVector)
+        self.assertNotIsInstance(Vector([2 ** 70] * self.n), ArrayVector) # Doesn't fit in int64
+        # Mixed with floats, ints over 2^53 would lose digits in a float64 array
+        v = Vector([2 ** 53 + 1] + [0.5] * self.n)
+        self.assertNotIsInstance(v, ArrayVector)
+        self.assertEqual(v[0], 2 ** 53 + 1)
+        self.assertEqual((v - 2 ** 53)[0], 1)
+        self.assertIsInstance(Vector([2 ** 53] + [0.5] * self.n), ArrayVector)
+        self.assertIsInstance(Vector([2 ** 62] * self.n), ArrayVector)
+
+    def test_abs_large_ints(self):
+        """Squares of ints that overflow int64 are computed in float64"""
+        for n in [self.n - 1, self.n]:
+            v = Vector([2 ** 40] * n)
+            self.assertAlmostEqual(abs(v) / (2 ** 40 * n ** 0.5), 1)
+            self.assertAlmostEqual(compile("abs(x)").evaluate(v).real / (2 ** 40 * n ** 0.5), 1)
+        with self.assertRaises(OverflowError): # Same as the list based Vector
+            abs(Vector([1e200] * self.n))
+
+    def test_pickle(self):
+        v = pickle.loads(pickle.dumps(Vector(list(range(self.n)))))
+        self.assertIsInstance(v, ArrayVector)
+        self.assertEqual(v.items, list(range(self.n)))
+
+    def test_element_wise(self):
+        items = list(range(1, self.n + 1))
+        v = Vector(items)
+        c = Vector([x * 1j for x in items])
+        self.assertEqual((v + 1).items, [x + 1 for x in items])
+        self.assertEqual((2 - v).items, [2 - x for x in items])
+        self.assertEqual((v * v).items, [x * x for x in items])
+        self.assertArrayAlmostEqual((v / 3).items, [x / 3 for x in items])
+        self.assertEqual((v // 3).items, [x // 3 for x in items])
+        self.assertEqual((-7 % v).items, [-7 % x for x in items])
+        self.assertArrayAlmostEqual((v ** -1).items, [x ** -1 for x in items])
+        self.assertArrayAlmostEqual((c + v).items, [x * 1j + x for x in items])
+        self.assertIsInstance(v + 1, ArrayVector)
+
+    def test_slice(self):
+        v = Vector(list(range(self.n)))
+        s = v.slice(1, None, 2)
+        self.assertIsInstance(s, ArrayVector)
+        self.assertTrue(nputil.numpy().shares_memory(s._array, v._array))
+        self.assertEqual(s.items, list(range(1, self.n, 2)))
+        self.assertEqual(s.slice(None, None, -1)[0], self.n - 1)
+
+    def test_int_overflow(self):
+        v = Vector([2 ** 40] * self.n)
+        self.assertEqual((v * v)[0], 2 ** 80)
+        self.assertEqual(maths.FUNCTIONS["sum"]([v * v]), 2 ** 80 * self.n)
+
+    def test_errors(self):
+        v = Vector(list(range(self.n)))
+        with self.assertRaisesRegex(RuntimeError, "Vector lengths differ"):
+            v + Vector([1, 2])
+        with self.assertRaises(ZeroDivisionError):
+            1 / v
+        with self.assertRaises(TypeError):
+            maths.FUNCTIONS["max"]([v * 1j])
+
+    def test_functions(self):
+        items = [x / 7 for x in range(self.n)]
+        v = Vector(items)
+        self.assertArrayAlmostEqual(maths.FUNCTIONS["sin"]([v]).items, [maths.FUNCTIONS["sin"]([x]) for x in items])
+        self.assertArrayAlmostEqual(maths.FUNCTIONS["sort"]([v * -1]).items, sorted([-x for x in items]))
+        self.assertAlmostEqual(maths.FUNCTIONS["sum"]([v]), sum(items))
+        self.assertAlmostEqual(maths.FUNCTIONS["max"]([v]), max(items))
+        self.assertAlmostEqual(maths.FUNCTIONS["abs"]([v]), sum(x * x for x in items) ** 0.5)
+        self.assertEqual(maths.FUNCTIONS["len"]([v]), self.n)
+        self.assertAlmostEqual(v.dot(v) / sum(x * x for x in items), 1)
+        self.assertAlmostEqual(v[-1], items[-1])
+        self.assertEqual(str(Vector([1] * self.n)), "[" + ", ".join(["1"] * self.n) + "]")
+
 if __name__ == '__main__':
     unittest.main()